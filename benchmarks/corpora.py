@@ -0,0 +1,126 @@
+# Synthetic inputs for the benchmarks
+import os
+import random
+
+PROJECT_TEMPLATE = """\
+<?xml version="1.0" encoding="utf-8"?>
+<Project DefaultTargets="Build" ToolsVersion="15.0" xmlns="http://schemas.microsoft.com/developer/msbuild/2003">
+  <ItemGroup>
+{items}
+  </ItemGroup>
+</Project>
+"""
+
+
+def mock_header(count):
+    lines = ["class MockFoo : public Foo {", "public:"]
+    for i in range(count):
+        if i % 3 == 0:
+            lines.append("    MOCK_CONST_METHOD0(GetValue{}, float());"
+                         .format(i))
+        elif i % 3 == 1:
+            lines.append("    MOCK_METHOD2(SetValue{}, void(int index,\n"
+                         "                 const std::vector<int>& values));"
+                         .format(i))
+        else:
+            lines.append("    MOCK_METHOD1(Lookup{}, std::map<int, int>("
+                         "const std::map<int, std::pair<int, int>>& m));"
+                         .format(i))
+    lines.append("};")
+    return "\n".join(lines) + "\n"
+
+
+def mock_declarations(count):
+    return ["MOCK_METHOD2(SetValue{}, void(int index, "
+            "std::map<int, std::vector<int>>& values));".format(i)
+            for i in range(count)]
+
+
+def cpp_source(lines, seed=1):
+    rng = random.Random(seed)
+    out = ["#include <string>", "#include <vector>", ""]
+    for i in range(lines):
+        r = rng.random()
+        if r < 0.02:
+            out.append("    string name{} = GetName(\"{}\");".format(i, i))
+        elif r < 0.04:
+            out.append("    vector<int> values{}; // values".format(i))
+        elif r < 0.06:
+            out.append("    std::map<int, std::string> lookup{};".format(i))
+        elif r < 0.08:
+            out.append("    /* block comment {} */".format(i))
+        else:
+            out.append("    int value{0} = Compute(a, b, {0}) + offset;"
+                       .format(i))
+    return "\n".join(out) + "\n"
+
+
+def bld_tree(root, libraries, sources_per_library=20):
+    # Creates Lib<n>/src/*.cpp with Lib<n>/bld/VS2017/Lib<n>(Tester).vcxproj
+    # and returns the source file names
+    sources = []
+    for i in range(libraries):
+        name = "Lib{}".format(i)
+        src_dir = os.path.join(root, name, "src")
+        bld_dir = os.path.join(root, name, "bld", "VS2017")
+        os.makedirs(src_dir)
+        os.makedirs(bld_dir)
+
+        items = []
+        for j in range(sources_per_library):
+            source = os.path.join(src_dir, "File{}.cpp".format(j))
+            open(source, "w").close()
+            sources.append(source)
+            items.append('    <ClCompile Include="..\\..\\src\\File{}.cpp" />'
+                         .format(j))
+
+        for project in (name, name + "Tester"):
+            with open(os.path.join(bld_dir, project + ".vcxproj"), "w") as f:
+                f.write(PROJECT_TEMPLATE.format(items="\n".join(items)))
+
+    return sources
+
+
+def class_tree(root, classes, classes_per_dir=30):
+    # Creates Dir<n>/Class<i>.h, .cpp and Tester.cpp files and returns the
+    # header file names
+    headers = []
+    for i in range(classes):
+        directory = os.path.join(root, "Dir{}".format(i // classes_per_dir))
+        if i % classes_per_dir == 0:
+            os.makedirs(directory)
+        name = os.path.join(directory, "Class{}".format(i))
+        for suffix in (".h", ".cpp", "Tester.cpp"):
+            open(name + suffix, "w").close()
+        headers.append(name + ".h")
+    return headers
+
+
+def include_tree(root, classes, includes_per_header=3, classes_per_dir=30,
+                 seed=1):
+    # Like class_tree, every header includes a few of the earlier headers
+    # and a standard header, returns the header file names
+    rng = random.Random(seed)
+    headers = []
+    for i in range(classes):
+        directory = os.path.join(root, "Dir{}".format(i // classes_per_dir))
+        if i % classes_per_dir == 0:
+            os.makedirs(directory)
+        name = "Class{}".format(i)
+        includes = ["#include <vector>"]
+        for j in sorted(set(rng.randrange(i) for _ in
+                            range(includes_per_header if i else 0))):
+            includes.append('#include "Dir{}/Class{}.h"'.format(
+                j // classes_per_dir, j))
+        body = "class {} {{\n    int value_;\n}};\n".format(name) * 20
+        files = {
+            ".h": "\n".join(includes) + "\n" + body,
+            ".cpp": '#include "{}.h"\n'.format(name) + body,
+            "Tester.cpp": '#include "gmock/gmock.h"\n#include "{}.h"\n'
+                          .format(name),
+        }
+        for suffix, text in files.items():
+            with open(os.path.join(directory, name + suffix), "w") as f:
+                f.write(text)
+        headers.append(os.path.join(directory, name + ".h"))
+    return headers
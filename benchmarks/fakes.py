@@ -0,0 +1,127 @@
+# Headless views, panels and windows for the benchmarks
+import threading
+
+import sublime
+
+_next_id = [1]
+
+
+def _new_id():
+    _next_id[0] += 1
+    return _next_id[0]
+
+
+class FakeView:
+    """A text buffer with the parts of the sublime.View API Moog uses.
+
+    Edits are collected and applied in one go the next time the text is
+    read, so the cost measured is that of the command, not of a naive
+    string based buffer.
+    """
+
+    def __init__(self, text="", file_name=None):
+        self._text = text
+        self._edits = []
+        self._file_name = file_name
+        self._id = _new_id()
+        self._change_count = 0
+        self._settings = sublime.Settings()
+
+    def _apply_edits(self):
+        if not self._edits:
+            return
+        pieces = []
+        pos = 0
+        for begin, end, text in sorted(self._edits, key=lambda e: e[0]):
+            pieces.append(self._text[pos:begin])
+            pieces.append(text)
+            pos = end
+        pieces.append(self._text[pos:])
+        self._text = "".join(pieces)
+        self._edits = []
+
+    def id(self):
+        return self._id
+
+    def file_name(self):
+        return self._file_name
+
+    def change_count(self):
+        return self._change_count
+
+    def settings(self):
+        return self._settings
+
+    def size(self):
+        self._apply_edits()
+        return len(self._text)
+
+    def substr(self, region):
+        self._apply_edits()
+        return self._text[region.begin():region.end()]
+
+    def replace(self, edit, region, text):
+        # Commands edit back to front, offsets refer to the original text
+        self._edits.append((region.begin(), region.end(), text))
+        self._change_count += 1
+
+    def insert(self, edit, point, text):
+        self.replace(edit, sublime.Region(point, point), text)
+        return len(text)
+
+    def run_command(self, command, args=None):
+        if command == "append":
+            self._apply_edits()
+            self._text += args["characters"]
+            self._change_count += 1
+
+
+class FakePanel(FakeView):
+    """Output panel that only counts what is appended to it."""
+
+    def __init__(self):
+        super().__init__()
+        self.appends = 0
+        self.characters = 0
+        self.finished = threading.Event()
+
+    def run_command(self, command, args=None):
+        if command == "append":
+            self.appends += 1
+            self.characters += len(args["characters"])
+            if "[Finished]" in args["characters"] or \
+                    "[Cancelled]" in args["characters"]:
+                self.finished.set()
+
+
+class FakeWindow:
+    def __init__(self, folders=(), view=None):
+        self._folders = list(folders)
+        self._view = view or FakeView()
+        self.panel = FakePanel()
+
+    def id(self):
+        return 1
+
+    def folders(self):
+        return self._folders
+
+    def active_view(self):
+        return self._view
+
+    def views(self):
+        return [self._view]
+
+    def create_output_panel(self, name):
+        self.panel = FakePanel()
+        return self.panel
+
+    def run_command(self, command, args=None):
+        pass
+
+    def show_input_panel(self, caption, initial, on_done, on_change,
+                         on_cancel):
+        on_done(initial)
+
+    def project_data(self):
+        return {}
@@ -0,0 +1,457 @@
+"""Headless benchmarks for Moog's commands and helpers.
+
+Runs on plain Python, Sublime's API is replaced by the stubs in
+benchmarks/stubs. Results are written as json, pass an earlier result
+file to --compare to spot regressions between commits:
+
+    python benchmarks/run.py --output new.json --compare old.json
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import types
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+PACKAGE_DIR = os.path.dirname(HERE)
+PACKAGE_NAME = "Moog"
+PLUGINS = ("build", "clang-tidy", "navigation", "performance", "utils")
+
+
+def load_package():
+    # Makes the package importable as 'Moog', whatever its directory name
+    sys.path.insert(0, os.path.join(HERE, "stubs"))
+    sys.path.insert(0, HERE)
+    if PACKAGE_NAME not in sys.modules:
+        package = types.ModuleType(PACKAGE_NAME)
+        package.__path__ = [PACKAGE_DIR]
+        sys.modules[PACKAGE_NAME] = package
+
+
+class Case:
+    def __init__(self, run, items, unit, cleanup=None, repeat=3):
+        self.run = run
+        self.items = items
+        self.unit = unit
+        self.cleanup = cleanup
+        self.repeat = repeat
+
+
+BENCHMARKS = []
+
+
+def benchmark(function):
+    BENCHMARKS.append((function.__name__[len("bench_"):], function))
+    return function
+
+
+@benchmark
+def bench_update_mock_method(scale):
+    from Moog.utils import UpdateMockCommand
+    declarations = corpora.mock_declarations(int(10000 * scale))
+
+    def run():
+        for declaration in declarations:
+            UpdateMockCommand.update_mock_method(declaration)
+
+    return Case(run, len(declarations), "mocks")
+
+
+@benchmark
+def bench_update_mock_command(scale):
+    from Moog.utils import UpdateMockCommand
+    count = int(10000 * scale)
+    text = corpora.mock_header(count)
+
+    def run():
+        UpdateMockCommand(fakes.FakeView(text)).run(None)
+
+    return Case(run, count, "mocks")
+
+
+@benchmark
+def bench_standardize_command(scale):
+    from Moog.utils import StandardizeCommand
+    lines = int(100000 * scale)
+    text = corpora.cpp_source(lines)
+
+    def run():
+        StandardizeCommand(fakes.FakeView(text)).run(None)
+
+    return Case(run, lines, "lines")
+
+
+def _bld_tree(scale):
+    root = tempfile.mkdtemp(prefix="moog-bench-bld-")
+    sources = corpora.bld_tree(root, max(int(200 * scale), 1))
+    return root, sources
+
+
+@benchmark
+def bench_locator_uncached(scale):
+    from Moog.helpers import locator
+    root, sources = _bld_tree(scale)
+
+    def run():
+        for source in sources:
+            locator.get_vc_project(source)
+            locator.get_vc_test_project(source)
+
+    return Case(run, len(sources), "files", lambda: shutil.rmtree(root))
+
+
+@benchmark
+def bench_locator_cache_warm(scale):
+    from Moog.helpers.locator_cache import LocatorCache
+    root, sources = _bld_tree(scale)
+    cache = LocatorCache()
+    for source in sources:
+        cache.get_vc_project(source)
+        cache.get_vc_test_project(source)
+
+    def run():
+        for source in sources:
+            cache.get_vc_project(source)
+            cache.get_vc_test_project(source)
+
+    return Case(run, len(sources), "files", lambda: shutil.rmtree(root))
+
+
+@benchmark
+def bench_project_index_build(scale):
+    from Moog.helpers.project_index import ProjectIndex
+    root, sources = _bld_tree(scale)
+
+    def run():
+        ProjectIndex().update([root])
+
+    return Case(run, len(sources), "files", lambda: shutil.rmtree(root))
+
+
+@benchmark
+def bench_project_index_lookup(scale):
+    from Moog.helpers.project_index import ProjectIndex
+    root, sources = _bld_tree(scale)
+    index = ProjectIndex()
+    index.update([root])
+
+    def run():
+        for source in sources:
+            index.get_vc_project(source)
+            index.get_vc_test_project(source)
+
+    return Case(run, len(sources), "files", lambda: shutil.rmtree(root))
+
+
+def _class_tree(scale):
+    # 100k files at scale 1
+    root = tempfile.mkdtemp(prefix="moog-bench-classes-")
+    headers = corpora.class_tree(root, max(int(33333 * scale), 1))
+    return root, headers
+
+
+@benchmark
+def bench_sibling_index_build(scale):
+    from Moog.helpers.sibling_index import SiblingIndex
+    root, headers = _class_tree(scale)
+
+    def run():
+        SiblingIndex().update([root])
+
+    return Case(run, len(headers) * 3, "files", lambda: shutil.rmtree(root))
+
+
+@benchmark
+def bench_sibling_index_poll(scale):
+    from Moog.helpers.sibling_index import SiblingIndex
+    root, headers = _class_tree(scale)
+    index = SiblingIndex()
+    index.update([root])
+
+    def run():
+        index.update([root])
+
+    return Case(run, len(headers) * 3, "files", lambda: shutil.rmtree(root))
+
+
+@benchmark
+def bench_sibling_lookup(scale):
+    from Moog.helpers.sibling_index import SiblingIndex
+    root, headers = _class_tree(scale)
+    index = SiblingIndex()
+    index.update([root])
+
+    def run():
+        for header in headers:
+            index.next_sibling(header)
+
+    return Case(run, len(headers), "files", lambda: shutil.rmtree(root))
+
+
+def _include_tree(scale):
+    # 60k files at scale 1
+    root = tempfile.mkdtemp(prefix="moog-bench-includes-")
+    headers = corpora.include_tree(root, max(int(20000 * scale), 1))
+    return root, headers
+
+
+@benchmark
+def bench_include_scan(scale):
+    from Moog.helpers.include_graph import IncludeGraph
+    root, headers = _include_tree(scale)
+
+    def run():
+        IncludeGraph().update([root])
+
+    return Case(run, len(headers) * 3, "files", lambda: shutil.rmtree(root))
+
+
+@benchmark
+def bench_include_hotspots(scale):
+    from Moog.helpers import include_hotspots
+    from Moog.helpers.include_graph import IncludeGraph
+    root, headers = _include_tree(scale)
+    graph = IncludeGraph()
+    graph.update([root])
+
+    def run():
+        include_hotspots.format_report(
+            include_hotspots.analyze(*graph.include_tree()), [root])
+
+    return Case(run, len(headers) * 3, "files", lambda: shutil.rmtree(root))
+
+
+@benchmark
+def bench_settings_value(scale):
+    from Moog.helpers import settings
+    count = int(100000 * scale)
+
+    def run():
+        for _ in range(count):
+            settings.value("build_jobs")
+
+    return Case(run, count, "lookups")
+
+
+STARTUP_SCRIPT = """\
+import importlib, sys, time, types
+sys.path[:0] = [{stubs!r}]
+import sublime, sublime_plugin
+package = types.ModuleType({name!r})
+package.__path__ = [{package_dir!r}]
+sys.modules[{name!r}] = package
+
+start = time.perf_counter()
+plugins = [importlib.import_module({name!r} + "." + plugin)
+           for plugin in {plugins!r}]
+loaded = time.perf_counter()
+for plugin in plugins:
+    if hasattr(plugin, "plugin_loaded"):
+        plugin.plugin_loaded()
+print(loaded - start, time.perf_counter() - loaded)
+"""
+
+
+def _plugin_load_times():
+    # A fresh interpreter for every load, the stubs stand in for the
+    # modules Sublime has loaded before the plugins
+    script = STARTUP_SCRIPT.format(stubs=os.path.join(HERE, "stubs"),
+                                   name=PACKAGE_NAME, package_dir=PACKAGE_DIR,
+                                   plugins=PLUGINS)
+    output = subprocess.check_output([sys.executable, "-c", script],
+                                     stderr=subprocess.DEVNULL)
+    return [float(value) for value in output.split()]
+
+
+@benchmark
+def bench_plugin_import(scale):
+    # Measured in the child, without the interpreter start around it
+    return Case(lambda: _plugin_load_times()[0], len(PLUGINS), "plugins",
+                repeat=5)
+
+
+@benchmark
+def bench_plugin_loaded(scale):
+    return Case(lambda: _plugin_load_times()[1], len(PLUGINS), "plugins",
+                repeat=5)
+
+
+@benchmark
+def bench_view_construction(scale):
+    # Sublime creates every text command and view listener for every view
+    # it opens
+    import importlib
+    import sublime_plugin
+    modules = [importlib.import_module(PACKAGE_NAME + "." + plugin)
+               for plugin in PLUGINS]
+    classes = [value for module in modules for value in vars(module).values()
+               if isinstance(value, type) and value.__module__ ==
+               module.__name__ and issubclass(
+                   value, (sublime_plugin.TextCommand,
+                           sublime_plugin.ViewEventListener))]
+    views = [fakes.FakeView("", "view{}.cpp".format(i))
+             for i in range(int(10000 * scale))]
+
+    def run():
+        for view in views:
+            for cls in classes:
+                cls(view)
+
+    return Case(run, len(views), "views")
+
+
+CHILD_SCRIPT = """\
+import sys
+line = b"  Compiling foo.cpp with a reasonably long command line /Zi /EHsc\\r\\n"
+warning = b"c:\\\\src\\\\foo.cpp(12,5): warning C4100: 'x': unreferenced\\r\\n"
+chunk = (line * 99 + warning) * 64
+remaining = int(sys.argv[1])
+while remaining > 0:
+    sys.stdout.buffer.write(chunk[:remaining])
+    remaining -= len(chunk)
+"""
+
+
+@benchmark
+def bench_build_output(scale):
+    from Moog import build
+    from Moog.helpers import build_jobs
+    size = int(100 * 2 ** 20 * scale)
+
+    def run():
+        window = fakes.FakeWindow()
+        command = build.MoogBuildCommand(window)
+        command.create_output_panel()
+        build._scheduler = build_jobs.BuildScheduler(1)
+        command.submit("bench", "bench", os.path.abspath("bench.vcxproj"),
+                       [sys.executable, "-c", CHILD_SCRIPT, str(size)])
+        if not window.panel.finished.wait(60):
+            raise RuntimeError("Output was never completely written")
+        if window.panel.characters < size * 0.95:
+            raise RuntimeError("Output went missing")
+
+    return Case(run, size / 2 ** 20, "MB", repeat=1)
+
+
+@benchmark
+def bench_build_log_search(scale):
+    from Moog.helpers.build_log import BuildLog
+    directory = tempfile.mkdtemp(prefix="moog-bench-log-")
+    log = BuildLog(directory, max_bytes=2 ** 24, max_files=64)
+    line = "  Compiling foo.cpp with a reasonably long command line /Zi\n"
+    chunk = line * 1000
+    size = int(100 * 2 ** 20 * scale)
+    writer = log.writer()
+    for _ in range(max(size // len(chunk), 1)):
+        writer.write(chunk)
+
+    def run():
+        log.search("error C4100")
+        log.search("warning C\\d+")
+
+    def cleanup():
+        log.close()
+        shutil.rmtree(directory)
+
+    return Case(run, size / 2 ** 20, "MB", cleanup)
+
+
+def run_case(name, function, scale):
+    case = function(scale)
+    try:
+        timings = []
+        for _ in range(case.repeat):
+            start = time.perf_counter()
+            elapsed = case.run()
+            # A run may time itself, e.g. the part of a child process
+            if elapsed is None:
+                elapsed = time.perf_counter() - start
+            timings.append(elapsed)
+    finally:
+        if case.cleanup is not None:
+            case.cleanup()
+
+    best = min(timings)
+    return {
+        "best": best,
+        "mean": sum(timings) / len(timings),
+        "runs": timings,
+        "items": case.items,
+        "unit": case.unit,
+        "per_second": case.items / best if best else None,
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"],
+                                       cwd=PACKAGE_DIR,
+                                       stderr=subprocess.DEVNULL) \
+            .decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline):
+    lines = []
+    for name, result in sorted(results["benchmarks"].items()):
+        previous = baseline.get("benchmarks", {}).get(name)
+        if previous is None:
+            continue
+        ratio = result["best"] / previous["best"]
+        verdict = "slower" if ratio > 1.1 else \
+            "faster" if ratio < 0.9 else "same"
+        lines.append("{:28} {:8.3f}s -> {:8.3f}s  x{:.2f}  {}".format(
+            name, previous["best"], result["best"], ratio, verdict))
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", type=float, default=1.0,
+                        help="corpus size factor, e.g. 0.1 for a quick run")
+    parser.add_argument("--filter", default="",
+                        help="only run benchmarks containing this text")
+    parser.add_argument("--output", help="write the json results here")
+    parser.add_argument("--compare", help="earlier json results to compare")
+    options = parser.parse_args(argv)
+
+    results = {
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "scale": options.scale,
+        "benchmarks": {},
+    }
+    for name, function in BENCHMARKS:
+        if options.filter not in name:
+            continue
+        result = run_case(name, function, options.scale)
+        results["benchmarks"][name] = result
+        sys.stderr.write("{:28} {:8.3f}s  {:12.0f} {}/s\n".format(
+            name, result["best"], result["per_second"] or 0, result["unit"]))
+
+    text = json.dumps(results, indent=2, sort_keys=True)
+    if options.output:
+        with open(options.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        sys.stdout.write(text + "\n")
+
+    if options.compare:
+        with open(options.compare) as f:
+            sys.stderr.write(compare(results, json.load(f)) + "\n")
+    return 0
+
+
+load_package()
+import corpora  # noqa: E402
+import fakes  # noqa: E402
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,111 @@
+# Minimal stand-in for Sublime's API, enough to run the plugin headless
+import tempfile
+import threading
+
+LAYOUT_INLINE = 0
+LAYOUT_BELOW = 1
+LAYOUT_BLOCK = 2
+DRAW_NO_FILL = 32
+DRAW_NO_OUTLINE = 256
+DRAW_SQUIGGLY_UNDERLINE = 4096
+ENCODED_POSITION = 1
+TRANSIENT = 4
+
+_cache_dir = tempfile.mkdtemp(prefix="moog-bench-cache-")
+
+
+class Region:
+    def __init__(self, a, b=None):
+        self.a = a
+        self.b = a if b is None else b
+
+    def begin(self):
+        return min(self.a, self.b)
+
+    def end(self):
+        return max(self.a, self.b)
+
+    def size(self):
+        return abs(self.b - self.a)
+
+
+class Settings:
+    def __init__(self, values=None):
+        self._values = dict(values or {})
+
+    def get(self, key, default=None):
+        return self._values.get(key, default)
+
+    def set(self, key, value):
+        self._values[key] = value
+
+    def add_on_change(self, tag, callback):
+        pass
+
+    def clear_on_change(self, tag):
+        pass
+
+
+class Phantom:
+    def __init__(self, region, content, layout, on_navigate=None):
+        self.region = region
+        self.content = content
+
+
+class PhantomSet:
+    def __init__(self, view, key=""):
+        self.phantoms = []
+
+    def update(self, phantoms):
+        self.phantoms = phantoms
+
+
+_settings = {}
+
+
+def load_settings(name):
+    return _settings.setdefault(name, Settings())
+
+
+def set_timeout(callback, delay=0):
+    # Like Sublime, callbacks run later and on another thread than the caller
+    timer = threading.Timer(delay / 1000.0, callback)
+    timer.daemon = True
+    timer.start()
+
+
+set_timeout_async = set_timeout
+
+
+def status_message(message):
+    pass
+
+
+def cache_path():
+    return _cache_dir
+
+
+def packages_path():
+    return _cache_dir
+
+
+def windows():
+    return []
+
+
+class _Window:
+    def id(self):
+        return 1
+
+    def project_data(self):
+        return {}
+
+    def folders(self):
+        return []
+
+
+_active_window = _Window()
+
+
+def active_window():
+    return _active_window
@@ -1,17 +1,237 @@
 import sublime
 import sublime_plugin
+import functools
+import logging
 import os
-import subprocess
+import re
 import threading
-from .helpers import locator
+from html import escape
+from .helpers import lazy, settings
+from .helpers.diagnostics import DiagnosticParser, DiagnosticStore
+from .helpers.locator_cache import LocatorCache
+from .helpers.output_stream import OutputStream
+from .helpers.project_index import ProjectIndex
+from .helpers.telemetry import timed
 
-# todo: MAke these settings
-MSBUILD = {
-    "VS2015": r"C:\Program Files (x86)\MSBuild\14.0\Bin\amd64\MSBuild.exe",
-    "VS2017": r"C:\Program Files (x86)\Microsoft Visual Studio\2017\Professional\MSBuild\15.0\Bin\MSBuild.exe"
+# Imported on first use, the first build pays for them instead of every
+# start of Sublime
+build_backends = lazy.import_module(".helpers.build_backends", __package__)
+build_history = lazy.import_module(".helpers.build_history", __package__)
+build_jobs = lazy.import_module(".helpers.build_jobs", __package__)
+build_log = lazy.import_module(".helpers.build_log", __package__)
+gtest = lazy.import_module(".helpers.gtest", __package__)
+include_graph = lazy.import_module(".helpers.include_graph", __package__)
+include_hotspots = lazy.import_module(".helpers.include_hotspots",
+                                      __package__)
+modified_files = lazy.import_module(".helpers.modified_files", __package__)
+multiprocessing = lazy.import_module("multiprocessing")
+
+_locator_cache = None
+_test_durations = None
+_test_results = None
+_scheduler = None
+_compile_stamps = None
+_include_graph = None
+_build_log = None
+_build_history = None
+_timings_dir = None
+
+TRIMMED_NOTE = "[Earlier output: Moog: Search build log]\n"
+project_index = ProjectIndex()
+diagnostics = DiagnosticStore()
+_phantom_sets = {}
+
+DIAGNOSTIC_STYLES = {
+    "error": ("moog_errors", "region.redish"),
+    "warning": ("moog_warnings", "region.yellowish"),
 }
 
 
+def plugin_loaded():
+    # Loading the caches waits for the worker thread, not for Sublime
+    sublime.set_timeout_async(_warm_up, 0)
+
+
+def _warm_up():
+    refresh_project_index()
+    get_include_graph().update_async(_all_folders())
+    # Looks for the installed MSBuild versions before the first build
+    threading.Thread(target=settings.msbuild).start()
+
+
+def _all_folders():
+    return [folder
+            for window in sublime.windows()
+            for folder in window.folders()]
+
+
+def refresh_project_index():
+    project_index.update_async(_all_folders())
+
+
+def get_backend():
+    name = settings.value("build_backend")
+    jobs = settings.value("build_parallelism")
+    if name != build_backends.MsBuildBackend.name:
+        try:
+            return build_backends.create_backend(name, jobs)
+        except ValueError as e:
+            logging.error(e)
+
+    timings_dir = get_timings_dir() if settings.value("build_timings") \
+        else None
+    return build_backends.MsBuildBackend(jobs, msbuild=settings.msbuild(),
+                                         project_index=project_index,
+                                         locator=get_locator_cache(),
+                                         timings_dir=timings_dir)
+
+
+def get_timings_dir():
+    global _timings_dir
+    if _timings_dir is None:
+        timings_dir = os.path.join(sublime.cache_path(), "Moog", "timings")
+        os.makedirs(timings_dir, exist_ok=True)
+        _timings_dir = timings_dir
+    return _timings_dir
+
+
+def get_locator_cache():
+    global _locator_cache
+    if _locator_cache is None:
+        cache_file = os.path.join(sublime.cache_path(), "Moog",
+                                  "locator_cache.json")
+        _locator_cache = LocatorCache(cache_file)
+    return _locator_cache
+
+
+def get_scheduler():
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = build_jobs.BuildScheduler(settings.value("build_jobs"))
+    return _scheduler
+
+
+def get_include_graph():
+    global _include_graph
+    if _include_graph is None:
+        graph_file = os.path.join(sublime.cache_path(), "Moog",
+                                  "include_graph.json")
+        _include_graph = include_graph.IncludeGraph(graph_file)
+    return _include_graph
+
+
+def get_build_log():
+    global _build_log
+    if _build_log is None:
+        _build_log = build_log.BuildLog(
+            os.path.join(sublime.cache_path(), "Moog", "logs"))
+    return _build_log
+
+
+def get_build_history():
+    # None when the sqlite3 module is not available
+    global _build_history
+    if _build_history is None:
+        _build_history = build_history.open_history(
+            os.path.join(sublime.cache_path(), "Moog", "build_history.db"))
+    return _build_history
+
+
+def record_build(job, variant, project_file, backend):
+    history = get_build_history()
+    if history is None or job.started is None:
+        return
+
+    try:
+        history.record(job.started, job.ended, project_file, variant,
+                       job.returncode, job.cancelled,
+                       backend.unit_times(project_file))
+    except build_history.DatabaseError as e:
+        logging.warning("Cannot record {} in the build history: {}"
+                        .format(job.name, e))
+
+
+def get_compile_stamps():
+    global _compile_stamps
+    if _compile_stamps is None:
+        stamps_file = os.path.join(sublime.cache_path(), "Moog",
+                                   "compile_stamps.json")
+        _compile_stamps = modified_files.CompileStamps(stamps_file)
+    return _compile_stamps
+
+
+def get_test_durations():
+    global _test_durations
+    if _test_durations is None:
+        durations_file = os.path.join(sublime.cache_path(), "Moog",
+                                      "test_durations.json")
+        _test_durations = gtest.TestDurations(durations_file)
+    return _test_durations
+
+
+def get_test_results():
+    global _test_results
+    if _test_results is None:
+        results_file = os.path.join(sublime.cache_path(), "Moog",
+                                    "test_results.json")
+        _test_results = gtest.TestResults(results_file)
+    return _test_results
+
+
+def _diagnostic_region(view, diagnostic):
+    point = view.text_point(diagnostic.line - 1, max(diagnostic.column - 1, 0))
+    return view.line(point)
+
+
+def update_view_diagnostics(view):
+    filename = view.file_name()
+    items = diagnostics.for_file(filename) if filename else []
+
+    phantoms = []
+    regions = dict((key, []) for key, _ in DIAGNOSTIC_STYLES.values())
+    for diagnostic in items:
+        region = _diagnostic_region(view, diagnostic)
+        key, _ = DIAGNOSTIC_STYLES.get(diagnostic.severity,
+                                       DIAGNOSTIC_STYLES["warning"])
+        regions[key].append(region)
+
+        html = "<body id=\"moog-diagnostic\"><div>{} {}: {}</div></body>" \
+            .format(escape(diagnostic.severity), escape(diagnostic.code),
+                    escape(diagnostic.message))
+        phantoms.append(sublime.Phantom(region, html, sublime.LAYOUT_BELOW))
+
+    for key, scope in DIAGNOSTIC_STYLES.values():
+        view.add_regions(key, regions[key], scope, "",
+                         sublime.DRAW_NO_FILL | sublime.DRAW_NO_OUTLINE |
+                         sublime.DRAW_SQUIGGLY_UNDERLINE)
+
+    phantom_set = _phantom_sets.get(view.id())
+    if phantom_set is None:
+        phantom_set = sublime.PhantomSet(view, "moog_diagnostics")
+        _phantom_sets[view.id()] = phantom_set
+    phantom_set.update(phantoms)
+
+
+def show_diagnostics(files=None):
+    # Only touches the views of files that are (or were) diagnosed
+    if files is not None:
+        files = set(os.path.normcase(f) for f in files)
+
+    for window in sublime.windows():
+        for view in window.views():
+            filename = view.file_name()
+            if files is None or \
+                    (filename and os.path.normcase(filename) in files):
+                update_view_diagnostics(view)
+
+
+def clear_diagnostics():
+    files = diagnostics.files()
+    diagnostics.clear()
+    if files:
+        show_diagnostics(files)
+
+
 class PanelWriter:
     def __init__(self, panel):
         self.lock = threading.Lock()
@@ -27,24 +247,26 @@ class PanelWriter:
 class MoogBuildCommand(sublime_plugin.WindowCommand):
     encoding = 'utf-8'
     killed = False
-    proc = None
+    jobs = ()
+    test_runs = ()
     panel_lock = threading.Lock()
     panel = None
+    panel_chars = 0
+    max_panel_chars = 2 ** 19
     test_args = "--gtest_filter=*"
 
-    def is_enabled(self, lint=False, integration=False, kill=False):
+    def is_enabled(self, lint=False, integration=False, kill=False,
+                   failed_only=False, modified=False, background=False,
+                   affected=False):
         # The Cancel build option should only be available
         # when the process is still running
         if kill:
-            return self.proc is not None and self.proc.poll() is None
+            return self.building() or \
+                any(run.is_running() for run in self.test_runs)
         return True
 
     def get_project_file(self, filename, test):
-        if test:
-            project_file = locator.get_vc_test_project(filename)
-        else:
-            project_file = locator.get_vc_project(filename)
-
+        project_file = self.find_project_file(filename, test)
         if not project_file:
             self.write_to_panel("Cannot find project for '{}'\n"
                                 .format(filename))
@@ -55,49 +277,39 @@ class MoogBuildCommand(sublime_plugin.WindowCommand):
 
         return project_file
 
-    def get_arguments(self, filename, test, compile_):
-        project_file = self.get_project_file(filename, test)
-        if not project_file:
-            return None
-
-        vs_version = "VS2015" if "VS2015" in project_file else "VS2017"
-        args = ["cmd", "/C", MSBUILD[vs_version]]
-        args.extend([
-            project_file,
-            '/p:Configuration=Debug',
-            '/maxcpucount',
-            '/v:q'  # q, only warnings and errors
-        ])
+    def find_project_file(self, filename, test=False):
+        project_file = get_backend().find_project_file(filename, test)
+        get_locator_cache().save()
+        return project_file
 
+    def get_arguments(self, project_file, files, test, compile_):
+        backend = get_backend()
         if compile_:
-            args.append('/t:ClCompile')
-            args.append('/p:SelectedFile={}'
-                        .format(os.path.basename(filename)))
-        elif test:
-            tester, working_dir = \
-                locator.get_tester_and_working_dir(project_file)
-            args.extend([
-                '&&', 'cd', working_dir, '&&', tester, self.test_args
-            ])
-
-            self.write_to_panel("Tester {}\n"
-                                "Test arguments {}\n"
-                                .format(tester, self.test_args))
-
-        return args
+            return backend.compile_args(project_file, files)
+        return backend.build_args(project_file)
 
     def run_test(self, test_args: str) -> None:
         self.test_args = test_args
         self.run_impl(True, False)
 
-    def run(self, test=False, kill=False, compile_=False):
+    @timed("moog_build")
+    def run(self, test=False, kill=False, compile_=False, failed_only=False,
+            modified=False, background=False, affected=False):
         if kill:
-            if self.proc:
+            for job in self.jobs:
+                get_scheduler().cancel(job)
+            if self.test_runs:
                 self.killed = True
-                self.proc.terminate()
+                self.cancel_test_runs()
             return
 
-        if test:
+        if modified:
+            self.compile_modified(background)
+        elif test and affected:
+            self.run_affected()
+        elif test and failed_only:
+            self.run_impl(True, False, failed_only=True)
+        elif test:
             self.window.show_input_panel("Test arguments",
                                          self.test_args,
                                          self.run_test,
@@ -105,38 +317,216 @@ class MoogBuildCommand(sublime_plugin.WindowCommand):
         else:
             self.run_impl(False, compile_)
 
-    def run_impl(self, test=False, compile_=False):
-        self.create_output_panel()
+    @timed("moog_build.run_impl")
+    def run_impl(self, test=False, compile_=False, failed_only=False):
+        self.prepare_output_panel()
 
-        if self.proc is not None:
-            self.proc.terminate()
-            self.proc = None
+        if test:
+            self.cancel_test_runs()
+        self.killed = False
 
         filename = self.window.active_view().file_name()
-        args = self.get_arguments(filename, test, compile_)
-        if not args:
+        project_file = self.get_project_file(filename, test)
+        if not project_file:
             return
 
-        project_file = self.get_project_file(filename, test)
-        self.proc = subprocess.Popen(
-            args,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-            cwd=os.path.dirname(project_file)
-        )
+        refresh_project_index()
+
+        args = self.get_arguments(project_file, [filename], test, compile_)
+        project_name = os.path.basename(project_file)
+        on_success = None
+        if compile_:
+            key = ("compile", project_file, filename)
+            name = "Compile {}".format(os.path.basename(filename))
+        elif test:
+            key = ("test", project_file)
+            name = "Test {}".format(project_name)
+            on_success = functools.partial(self.run_tests, project_file,
+                                           failed_only)
+        else:
+            key = ("build", project_file)
+            name = "Build {}".format(project_name)
+
+        self.submit(key, name, project_file, args, on_success,
+                    continued=test)
+
+    def prepare_output_panel(self, show=True):
+        # Builds of this window share the panel, it is only cleared when
+        # none of them are left
+        if self.panel is not None and self.building():
+            if show:
+                self.window.run_command('show_panel',
+                                        {'panel': 'output.exec'})
+        else:
+            self.create_output_panel(show)
+            clear_diagnostics()
+
+    def compile_modified(self, background=False):
+        self.prepare_output_panel(not background)
+        threading.Thread(target=self.submit_modified).start()
+
+    @timed("moog_build.submit_modified")
+    def submit_modified(self):
+        # One compile per project for all sources changed since their last
+        # successful compile
+        stamps = get_compile_stamps()
+        files = modified_files.modified_sources(self.window.folders(), stamps)
+        projects = modified_files.group_by_project(files,
+                                                   self.find_project_file)
+        if not projects:
+            self.write_to_panel("No modified files to compile\n")
+            return
+
+        refresh_project_index()
+        for project_file, project_files in sorted(projects.items()):
+            self.write_to_panel("Compiling {} file(s) of {}\n".format(
+                len(project_files), os.path.basename(project_file)))
+            args = self.get_arguments(project_file, project_files, False,
+                                      True)
+            on_success = functools.partial(self.mark_compiled,
+                                           stamps.snapshot(project_files))
+            self.submit(("compile", project_file, tuple(project_files)),
+                        "Compile {}".format(os.path.basename(project_file)),
+                        project_file, args, on_success)
+
+    def mark_compiled(self, snapshot):
+        stamps = get_compile_stamps()
+        stamps.mark(snapshot)
+        try:
+            stamps.save()
+        except OSError as e:
+            logging.warning("Cannot save compile stamps: {}".format(e))
+
+    def building(self):
+        return any(job.state in (build_jobs.QUEUED, build_jobs.RUNNING)
+                   for job in self.jobs)
+
+    def submit(self, key, name, project_file, args, on_success=None,
+               continued=False):
+        # A continued job leaves the output open for on_success to write to
+        base_dir = os.path.dirname(project_file)
+        stream = self.create_output_stream(base_dir)
+        backend = get_backend()
+
+        def on_done(job):
+            record_build(job, key[0], project_file, backend)
+            if on_success is not None and not job.cancelled and \
+                    job.returncode == 0:
+                if continued:
+                    stream.close()
+                    on_success()
+                    return
+                on_success()
+
+            msg = 'Cancelled' if job.cancelled else 'Finished'
+            stream.close('\n[%s]' % msg)
+
+        job, created = get_scheduler().submit(key, name, args, base_dir,
+                                              stream.feed, on_done,
+                                              resource=project_file,
+                                              env=backend.build_env(
+                                                  project_file))
+        if created:
+            self.jobs = [j for j in self.jobs
+                         if j.state in (build_jobs.QUEUED,
+                                        build_jobs.RUNNING)] + [job]
+        else:
+            self.write_to_panel("{} is already queued\n".format(name))
+        return job
+
+    def cancel_test_runs(self):
+        for test_run in self.test_runs:
+            test_run.cancel()
+        self.test_runs = []
+
+    def run_affected(self):
+        self.prepare_output_panel()
+        self.cancel_test_runs()
         self.killed = False
+        filename = self.window.active_view().file_name()
+        threading.Thread(target=self.submit_affected,
+                         args=(filename,)).start()
+
+    @timed("moog_build.submit_affected")
+    def submit_affected(self, filename):
+        # Builds and runs every test project that depends on filename,
+        # limited to the test cases that depend on it where possible
+        # The indexes are shared by every window, updating them with the
+        # folders of one window would drop those of the others
+        folders = _all_folders()
+        project_index.update(folders)
+        graph = get_include_graph()
+        if graph.update(folders):
+            graph.save()
+
+        affected = include_graph.affected_tests(
+            graph, filename, project_index.get_projects,
+            lambda project_file: project_file.endswith("Tester.vcxproj"))
+        if not affected:
+            self.write_to_panel("No indexed test project depends on '{}'\n"
+                                .format(filename))
+            project_file = self.get_project_file(filename, True)
+            if not project_file:
+                return
+            affected = {project_file: None}
+
+        for project_file, patterns in sorted(affected.items()):
+            name = os.path.basename(project_file)
+            self.write_to_panel("Testing {} ({})\n".format(
+                name, "all tests" if patterns is None
+                else "{} test(s)".format(len(patterns))))
+            args = self.get_arguments(project_file, [filename], True, False)
+            on_success = functools.partial(self.run_tests, project_file,
+                                           False, patterns)
+            self.submit(("test", project_file), "Test {}".format(name),
+                        project_file, args, on_success, continued=True)
+
+    def run_tests(self, project_file, failed_only=False, patterns=None):
+        # Runs the freshly built tester as several processes, each with its
+        # own share of the tests
+        backend = get_backend()
+        tester, working_dir = backend.get_tester_and_working_dir(project_file)
+        if tester is None:
+            self.write_to_panel("The {} backend cannot run tests\n[Finished]"
+                                .format(backend.name))
+            return
+
+        shards = settings.value("test_shards") or \
+            multiprocessing.cpu_count()
+        stream = self.create_output_stream(working_dir)
+
+        test_args = self.test_args
+        if failed_only:
+            failed = get_test_results().failed(tester)
+            if not failed:
+                stream.close("No failed tests to rerun\n[Finished]")
+                return
+            test_args = gtest.with_filter(test_args, failed)
+        elif patterns:
+            test_args = gtest.with_filter(test_args, patterns)
+
+        stream.write("Tester {}\n"
+                     "Test arguments {}\n"
+                     .format(tester, test_args))
+
+        def on_done(run):
+            msg = 'Cancelled' if self.killed else 'Finished'
+            stream.close('[%s]' % msg)
 
-        threading.Thread(
-            target=self.read_handle,
-            args=(self.proc.stdout,)
-        ).start()
+        test_run = gtest.ShardedTestRun(
+            tester, working_dir, test_args, shards,
+            get_test_durations(), stream.write, on_done, get_test_results())
+        self.test_runs = [run for run in self.test_runs
+                          if run.is_running()] + [test_run]
+        test_run.start()
 
-    def create_output_panel(self):
+    def create_output_panel(self, show=True):
         # A lock is used to ensure only one thread is
         # touching the output panel at a time
         with self.panel_lock:
             # Creating the panel implicitly clears any previous contents
             self.panel = self.window.create_output_panel('exec')
+            self.panel_chars = 0
 
             # Enable result navigation. The result_file_regex does
             # the primary matching, but result_line_regex is used
@@ -147,53 +537,301 @@ class MoogBuildCommand(sublime_plugin.WindowCommand):
             settings = self.panel.settings()
 
             #  ...\foo.cpp(234): warning C4100: bar message
+            #  .../foo.cpp:234:5: warning: bar message
             settings.set(
                 'result_file_regex',
-                r'^\s*(.+)\((\d+)\):\s(.+)'
+                get_backend().result_file_regex
             )
             settings.set(
                 'result_line_regex',
                 r'^\s+line (\d+) col (\d+)'
             )
 
-            self.window.run_command('show_panel', {'panel': 'output.exec'})
-
-    def read_handle(self, handle):
-        chunk_size = 2 ** 13
-        out = b''
-        while True:
-            try:
-                data = os.read(handle.fileno(), chunk_size)
-                # If exactly the requested number of bytes was
-                # read, there may be more data, and the current
-                # data may contain part of a multibyte char
-                out += data
-                if len(data) == chunk_size:
-                    continue
-                if data == b'' and out == b'':
-                    raise IOError('EOF')
-                # We pass out to a function to ensure the
-                # timeout gets the value of out right now,
-                # rather than a future (mutated) version
-                self.async_write_to_panel(out.decode(self.encoding))
-                if data == b'':
-                    raise IOError('EOF')
-                out = b''
-            except (UnicodeDecodeError) as e:
-                msg = 'Error decoding output using %s - %s'
-                self.async_write_to_panel(msg % (self.encoding, str(e)))
-                break
-            except (IOError):
-                if self.killed:
-                    msg = 'Cancelled'
-                else:
-                    msg = 'Finished'
-                self.async_write_to_panel('\n[%s]' % msg)
-                break
-
-    def async_write_to_panel(self, text):
-        sublime.set_timeout(lambda: self.write_to_panel(text.replace("\r", "")), 1)
+            if show:
+                self.window.run_command('show_panel',
+                                        {'panel': 'output.exec'})
+
+    def create_output_stream(self, base_dir):
+        # The build log parses the complete lines, the trailing '[Finished]'
+        # line is never a diagnostic
+        log_writer = get_build_log().writer(
+            DiagnosticParser(base_dir).parse_line)
+
+        def log_output(text):
+            # On the thread reading the output, only the views are updated
+            # on the UI thread
+            changed_files = diagnostics.add(log_writer.write(text))
+            if changed_files:
+                sublime.set_timeout(lambda: show_diagnostics(changed_files),
+                                    0)
+
+        return OutputStream(self.append_to_panel, sublime.set_timeout,
+                            self.encoding, observe=log_output)
 
     def write_to_panel(self, text):
+        get_build_log().append(text.encode(self.encoding))
+        self.append_to_panel(text)
+
+    def append_to_panel(self, text):
+        # Only the tail of the output stays in the panel, all of it is in
+        # the build log
         with self.panel_lock:
             self.panel.run_command('append', {'characters': text})
+            self.panel_chars += len(text)
+            if self.panel_chars > self.max_panel_chars * 5 // 4:
+                self.panel.run_command('moog_trim_panel',
+                                       {'size': self.max_panel_chars})
+                self.panel_chars = self.max_panel_chars
+
+
+class MoogLocatorCacheStatsCommand(sublime_plugin.WindowCommand):
+    @timed("moog_locator_cache_stats")
+    def run(self, clear=False):
+        cache = get_locator_cache()
+        if clear:
+            cache.clear()
+            cache.save()
+
+        stats = cache.stats()
+        sublime.status_message(
+            "Moog locator cache: {hits} hits, {misses} misses "
+            "({hit_rate:.0%}), {entries} entries".format(**stats))
+
+
+class MoogBuildJobsCommand(sublime_plugin.WindowCommand):
+    def is_enabled(self):
+        return get_scheduler().active()
+
+    @timed("moog_build_jobs")
+    def run(self):
+        jobs = get_scheduler().jobs()
+        items = [[job.name, "{} {:.0f} s".format(job.state, job.elapsed())]
+                 for job in jobs]
+
+        def on_done(index):
+            if index >= 0:
+                get_scheduler().cancel(jobs[index])
+                sublime.status_message("Cancelled {}".format(jobs[index].name))
+
+        self.window.show_quick_panel(items, on_done)
+
+
+class MoogBuildHistoryCommand(sublime_plugin.WindowCommand):
+    @timed("moog_build_history")
+    def run(self, report="units", clear=False):
+        history = get_build_history()
+        if history is None:
+            sublime.status_message("Moog: the build history needs the "
+                                   "sqlite3 module")
+            return
+
+        if clear:
+            history.clear()
+            sublime.status_message("Moog: build history cleared")
+        elif report == "projects":
+            self.show_projects(history)
+        else:
+            self.show_units(history)
+
+    def show_units(self, history):
+        units = history.slowest_units()
+        if not units:
+            sublime.status_message("Moog: no compile times recorded, enable "
+                                   "build_timings")
+            return
+
+        items = [[os.path.basename(unit.file), build_history.format_unit(unit)]
+                 for unit in units]
+
+        def on_done(index):
+            if index >= 0:
+                self.window.open_file(units[index].file)
+
+        self.window.show_quick_panel(items, on_done)
+
+    def show_projects(self, history):
+        trends = history.project_trends()
+        if not trends:
+            sublime.status_message("Moog: no builds recorded")
+            return
+
+        items = [["{} ({})".format(os.path.basename(trend.project),
+                                   trend.variant),
+                  build_history.format_trend(trend.durations)]
+                 for trend in trends]
+
+        def on_done(index):
+            if index >= 0:
+                self.window.open_file(trends[index].project)
+
+        self.window.show_quick_panel(items, on_done)
+
+
+class MoogIncludeHotspotsCommand(sublime_plugin.WindowCommand):
+    @timed("moog_include_hotspots")
+    def run(self):
+        sublime.status_message("Moog: scanning includes")
+        threading.Thread(target=self.analyze,
+                         args=(self.window.folders(),)).start()
+
+    def analyze(self, folders):
+        try:
+            graph = get_include_graph()
+            if graph.update(folders):
+                graph.save()
+
+            report = include_hotspots.analyze(*graph.include_tree())
+            text = include_hotspots.format_report(report, folders)
+        except Exception:
+            # Nothing else would report what went wrong on this thread
+            logging.exception("Include hotspot analysis failed")
+            sublime.set_timeout(lambda: sublime.status_message(
+                "Moog: include analysis failed, see the console"), 0)
+            return
+        sublime.set_timeout(lambda: self.show_report(text), 0)
+
+    def show_report(self, text):
+        view = self.window.new_file()
+        view.set_name("Include hotspots")
+        view.set_scratch(True)
+        view.run_command("append", {"characters": text})
+
+
+class MoogCompileOnSaveListener(sublime_plugin.EventListener):
+    # Saves in quick succession are compiled together once they stop
+    generation = 0
+
+    def on_post_save(self, view):
+        filename = view.file_name() or ""
+        if not filename.lower().endswith(modified_files.SOURCE_EXTENSIONS):
+            return
+        if not settings.value("compile_on_save"):
+            return
+
+        MoogCompileOnSaveListener.generation += 1
+        generation = MoogCompileOnSaveListener.generation
+
+        def compile_if_idle():
+            if generation != MoogCompileOnSaveListener.generation:
+                return
+            # None when the view was closed during the delay
+            window = view.window()
+            if window is not None:
+                window.run_command("moog_build",
+                                   {"modified": True, "background": True})
+
+        sublime.set_timeout(compile_if_idle,
+                            settings.value("compile_on_save_delay_ms"))
+
+
+class MoogTrimPanelCommand(sublime_plugin.TextCommand):
+    def run(self, edit, size):
+        cut = self.view.size() - size
+        if cut <= 0:
+            return
+        cut = self.view.full_line(cut).end()
+        self.view.replace(edit, sublime.Region(0, cut), TRIMMED_NOTE)
+
+
+def show_build_log(window, line, context=20):
+    # Shows the lines around line of the build log in a panel
+    lines = get_build_log().lines(max(line - context, 0), 2 * context + 1)
+    panel = window.create_output_panel('moog_log')
+    panel.settings().set('result_file_regex',
+                         get_backend().result_file_regex)
+    panel.run_command('append', {'characters': "\n".join(
+        text for _, text in lines)})
+    window.run_command('show_panel', {'panel': 'output.moog_log'})
+
+    for row, (number, _) in enumerate(lines):
+        if number == line:
+            point = panel.text_point(row, 0)
+            panel.sel().clear()
+            panel.sel().add(panel.line(point))
+            panel.show(point)
+
+
+class MoogSearchBuildLogCommand(sublime_plugin.WindowCommand):
+    def run(self, pattern=None):
+        if pattern is None:
+            self.window.show_input_panel("Search build log (regex)", "",
+                                         self.search, None, None)
+        else:
+            self.search(pattern)
+
+    @timed("moog_search_build_log")
+    def search(self, pattern):
+        try:
+            matches = get_build_log().search(pattern)
+        except re.error as e:
+            sublime.status_message("Invalid pattern: {}".format(e))
+            return
+
+        if not matches:
+            sublime.status_message("'{}' is not in the build log"
+                                   .format(pattern))
+            return
+
+        items = [[text.strip() or " ", "line {}".format(line + 1)]
+                 for line, text in matches]
+
+        def on_done(index):
+            if index >= 0:
+                show_build_log(self.window, matches[index][0])
+
+        self.window.show_quick_panel(items, on_done)
+
+
+class MoogBuildLogDiagnosticsCommand(sublime_plugin.WindowCommand):
+    @timed("moog_build_log_diagnostics")
+    def run(self):
+        logged = get_build_log().diagnostics()
+        if not logged:
+            sublime.status_message("No diagnostics in the build log")
+            return
+
+        items = [["{}: {}".format(d.severity, d.message),
+                  "{}:{}  (log line {})".format(d.file, d.line, line + 1)]
+                 for line, d in logged]
+
+        def on_done(index):
+            if index >= 0:
+                _, d = logged[index]
+                self.window.open_file(
+                    "{}:{}:{}".format(d.file, d.line, max(d.column, 1)),
+                    sublime.ENCODED_POSITION)
+
+        self.window.show_quick_panel(items, on_done)
+
+
+class MoogNextDiagnosticCommand(sublime_plugin.WindowCommand):
+    def is_enabled(self, forward=True):
+        return len(diagnostics) > 0
+
+    @timed("moog_next_diagnostic")
+    def run(self, forward=True):
+        diagnostic = diagnostics.next(forward)
+        if diagnostic is None:
+            return
+
+        self.window.open_file(
+            "{}:{}:{}".format(diagnostic.file, diagnostic.line,
+                              max(diagnostic.column, 1)),
+            sublime.ENCODED_POSITION)
+        sublime.status_message("{}: {}".format(diagnostic.severity,
+                                               diagnostic.message))
+
+
+class MoogClearDiagnosticsCommand(sublime_plugin.WindowCommand):
+    @timed("moog_clear_diagnostics")
+    def run(self):
+        clear_diagnostics()
+
+
+class MoogDiagnosticsListener(sublime_plugin.EventListener):
+    def on_load(self, view):
+        if diagnostics.for_file(view.file_name() or ""):
+            update_view_diagnostics(view)
+
+    def on_close(self, view):
+        _phantom_sets.pop(view.id(), None)
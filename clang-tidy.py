@@ -1,49 +1,159 @@
 import logging
 import os
-import subprocess
+import threading
+import sublime
 import sublime_plugin
+from .helpers import lazy
+from .helpers import settings
+from .helpers.compile_commands import FlagIndex
+from .helpers.result_cache import ResultCache
+from .helpers.telemetry import timed
+
+clang_tidy = lazy.import_module(".helpers.clang_tidy", __package__)
+
+_result_cache = None
+flag_index = FlagIndex()
+
+
+def get_result_cache():
+    global _result_cache
+    if _result_cache is None:
+        cache_dir = os.path.join(sublime.cache_path(), "Moog", "clang_tidy")
+        max_mb = settings.value("clang_tidy_cache_size_mb")
+        _result_cache = ResultCache(cache_dir, max_mb * 2 ** 20)
+    return _result_cache
 
 
 class ClangTidyCommand(sublime_plugin.WindowCommand):
     previous_command = "--fix-errors -checks=-*,modernize-use-override,modernize-replace-auto-ptr"
+    runner = None
+    panel = None
 
-    def run(self):
+    def is_enabled(self, scope="file", paths=None, cancel=False):
+        running = self.runner is not None and not self.runner.cancelled \
+            and self.runner.finished < self.runner.total
+        if cancel:
+            return running
+        return True
+
+    @timed("clang_tidy")
+    def run(self, scope="file", paths=None, cancel=False):
+        if cancel:
+            if ClangTidyCommand.runner is not None:
+                ClangTidyCommand.runner.cancel()
+                sublime.status_message("clang-tidy cancelled")
+            return
+
+        self.scope = scope
+        self.paths = paths
         self.window.show_input_panel("Arguments",
                                      ClangTidyCommand.previous_command,
                                      self.run_clang_tidy,
                                      None, None)
 
+    def get_files(self):
+        if self.scope == "open_files":
+            return [view.file_name() for view in self.window.views()
+                    if view.file_name()]
+        if self.scope == "folder":
+            return list(clang_tidy.find_sources(self.paths or []))
+        if self.scope == "project":
+            return list(clang_tidy.find_sources(self.window.folders()))
+
+        filename = self.window.active_view().file_name()
+        return [filename] if filename else []
+
+    def get_tasks(self, cmd, files, skipped=None):
+        # The files that cannot be checked are added to skipped
+        for filename in files:
+            root_dir = self.get_root_dir(filename)
+            if root_dir is None:
+                if skipped is not None:
+                    skipped.append((filename, "not in a project folder"))
+                continue
+
+            flags = flag_index.get_flags(root_dir, filename)
+            if flags is None:
+                logging.error("No compile_commands.json or .clang_complete "
+                              "flags for " + filename)
+                if skipped is not None:
+                    skipped.append((filename, "no compile_commands.json or "
+                                              ".clang_complete flags"))
+                continue
+
+            relative_path = os.path.relpath(filename, root_dir)
+            args = clang_tidy.build_args(cmd, relative_path, flags)
+            yield filename, args, root_dir
+
+    @timed("clang_tidy.run_clang_tidy")
     def run_clang_tidy(self, cmd: str):
         ClangTidyCommand.previous_command = cmd
+        # Walking the project and resolving the flags, which may parse a
+        # large compilation database, is kept off the UI thread
+        thread = threading.Thread(target=self.prepare, args=(cmd,))
+        thread.daemon = True
+        thread.start()
 
-        flags = None
-        root_dir = self.get_root_dir()
-        if root_dir is not None:
-            flags = self.get_clang_complete_flags(root_dir)
-
-        if flags is not None:
-            relative_path = os.path.relpath(
-                self.window.active_view().file_name(), root_dir)
-            args = ["clang-tidy.exe"]
-            args += cmd.split(" ")
-            args.append(relative_path)
-            args.append("--")
-            args += flags
-
-            try:
-                output = subprocess.check_output(
-                    args,
-                    stderr=subprocess.STDOUT,
-                    shell=True,
-                    cwd=root_dir)
-                logging.info(output.decode())
-            except subprocess.CalledProcessError as e:
-                output = e.output.decode()
-                if "error: invalid argument '-std=c++17' not allowed with 'C' [clang-diagnostic-error]" not in output:
-                    logging.error(output)
-
-    def get_root_dir(self):
-        filename = self.window.active_view().file_name()
+    def prepare(self, cmd):
+        skipped = []
+        tasks = list(self.get_tasks(cmd, self.get_files(), skipped))
+        sublime.set_timeout(lambda: self.start(tasks, skipped), 0)
+
+    def start(self, tasks, skipped=()):
+        if not tasks:
+            # A running check keeps its panel
+            sublime.status_message(
+                "clang-tidy: nothing to check" if not skipped else
+                "clang-tidy: nothing to check, skipped {} file(s), see the "
+                "console".format(len(skipped)))
+            return
+
+        if ClangTidyCommand.runner is not None:
+            ClangTidyCommand.runner.cancel()
+
+        self.create_output_panel()
+        runner = clang_tidy.ClangTidyRunner(settings.value("clang_tidy_jobs"),
+                                            get_result_cache())
+        ClangTidyCommand.runner = runner
+        self.write_to_panel("Running clang-tidy on {} file(s) using {} jobs\n"
+                            .format(len(tasks), runner.jobs))
+        for filename, reason in skipped:
+            self.write_to_panel("Skipped {}: {}\n".format(filename, reason))
+        runner.run(tasks,
+                   lambda result: self.on_result(runner, result),
+                   self.on_done)
+
+    def on_result(self, runner, result):
+        if result.failed:
+            logging.error(result.output)
+        text = "[{}/{}] {}{}\n".format(runner.finished, runner.total,
+                                       result.filename,
+                                       " (cached)" if result.cached else "")
+        if result.output.strip() and \
+                clang_tidy.C_STD_ERROR not in result.output:
+            text += result.output.replace("\r", "") + "\n"
+
+        sublime.set_timeout(lambda: self.write_to_panel(text), 0)
+        sublime.set_timeout(lambda: sublime.status_message(
+            "clang-tidy {}/{}".format(runner.finished, runner.total)), 0)
+
+    def on_done(self, runner):
+        msg = "Cancelled" if runner.cancelled else "Finished"
+        rate = runner.cached / runner.finished if runner.finished else 0.0
+        text = "[{}] cache: {} of {} files ({:.0%} hit rate)\n".format(
+            msg, runner.cached, runner.finished, rate)
+        sublime.set_timeout(lambda: self.write_to_panel(text), 0)
+
+    def create_output_panel(self):
+        ClangTidyCommand.panel = self.window.create_output_panel("clang_tidy")
+        settings = self.panel.settings()
+        settings.set("result_file_regex", r"^(.+?):(\d+):(\d+): (.+)$")
+        self.window.run_command("show_panel", {"panel": "output.clang_tidy"})
+
+    def write_to_panel(self, text):
+        self.panel.run_command("append", {"characters": text})
+
+    def get_root_dir(self, filename):
         root_dir = None
         for folder in self.window.folders():
             if os.path.commonprefix([filename, folder]) == folder:
@@ -55,18 +165,3 @@ class ClangTidyCommand(sublime_plugin.WindowCommand):
             return None
 
         return root_dir
-
-    def get_clang_complete_flags(self, root_dir):
-        clang_complete_file = os.path.join(root_dir, ".clang_complete")
-        if not os.path.exists(clang_complete_file):
-            logging.error("Could not find clang compile commands file " + clang_complete_file)
-            return None
-
-        def process_flag(flag):
-            flag = flag.strip()
-            return flag
-
-        flags = ["-std=c++17"]
-        flags += list(map(process_flag, open(clang_complete_file)))
-
-        return flags
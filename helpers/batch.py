@@ -0,0 +1,46 @@
+import multiprocessing
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+CPP_EXTENSIONS = (".h", ".hh", ".hpp", ".hxx", ".cpp", ".cc", ".cxx")
+
+
+def find_sources(paths, extensions=CPP_EXTENSIONS):
+    for path in paths:
+        if os.path.isfile(path):
+            yield path
+            continue
+
+        for dirpath, dirnames, filenames in os.walk(path):
+            dirnames[:] = [d for d in dirnames if not d.startswith(".")]
+            for filename in filenames:
+                if filename.lower().endswith(extensions):
+                    yield os.path.join(dirpath, filename)
+
+
+def map_unordered(function, tasks, jobs=None, processes=True):
+    """Yields function(task) for every task, in completion order.
+
+    Uses a pool of worker processes, function has to be a picklable module
+    level function then. Python worker processes cannot be started from
+    the Sublime plugin host, commands pass processes=False to use threads.
+    """
+    tasks = list(tasks)
+    if jobs == 1 or len(tasks) < 2:
+        for task in tasks:
+            yield function(task)
+        return
+
+    if not processes:
+        with ThreadPoolExecutor(jobs or multiprocessing.cpu_count()) as pool:
+            for result in pool.map(function, tasks):
+                yield result
+        return
+
+    pool = multiprocessing.Pool(jobs)
+    try:
+        for result in pool.imap_unordered(function, tasks, 16):
+            yield result
+    finally:
+        pool.close()
+        pool.join()
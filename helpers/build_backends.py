@@ -0,0 +1,319 @@
+import hashlib
+import multiprocessing
+import os
+import shlex
+from .compile_commands import iter_json_array
+from . import lazy
+from . import locator
+
+MSVC_RESULT_REGEX = r'^\s*(.+)\((\d+)\):\s(.+)'
+GCC_RESULT_REGEX = r'^((?:[A-Za-z]:)?[^:\n]+):(\d+):(?:(\d+):)?\s*(.+)$'
+
+# cl.exe /Bt+ prints the time of every compiler pass per translation unit,
+#   time(C:\...\c1xx.dll)=0.52105s < 1234 - 5678 > BB [C:\src\foo.cpp]
+CL_TIME_RE = lazy.compile(r'time\(.+\)=(\d+(?:\.\d+)?)s .*\[(.+)\]\s*$')
+
+# bld\VS2017\Foo.vcxproj
+VS_VERSION_RE = lazy.compile(r"VS\d{4}")
+
+
+def parse_cl_times(lines):
+    # Returns {translation unit: seconds}, summed over the compiler passes
+    times = {}
+    for line in lines:
+        match = CL_TIME_RE.search(line)
+        if match:
+            filename = match.group(2)
+            times[filename] = times.get(filename, 0.0) + \
+                float(match.group(1))
+    return times
+
+
+class BuildBackend:
+    """Turns a build request into the command line of a build tool.
+
+    A project file identifies what to build, its directory is the working
+    directory of the build and the base of relative paths in its output.
+    """
+    name = None
+    result_file_regex = GCC_RESULT_REGEX
+
+    def __init__(self, jobs=0):
+        self.jobs = jobs or multiprocessing.cpu_count()
+
+    def find_project_file(self, filename, test=False):
+        raise NotImplementedError
+
+    def build_args(self, project_file):
+        raise NotImplementedError
+
+    def compile_args(self, project_file, files):
+        raise NotImplementedError
+
+    def get_tester_and_working_dir(self, project_file):
+        # Backends without a notion of test projects cannot run tests
+        return None, None
+
+    def build_env(self, project_file):
+        # Environment of the build process, None inherits it
+        return None
+
+    def unit_times(self, project_file):
+        # {translation unit: seconds} of the last build of project_file
+        return {}
+
+
+class MsBuildBackend(BuildBackend):
+    name = "msbuild"
+    result_file_regex = MSVC_RESULT_REGEX
+
+    def __init__(self, jobs=0, msbuild=None, project_index=None,
+                 locator=locator, timings_dir=None):
+        super().__init__(jobs)
+        # {'VS2017': path to MSBuild.exe}, MSBuild.exe is looked up on the
+        # PATH when no version can build the project
+        self.msbuild = msbuild or {}
+        self.project_index = project_index
+        self.locator = locator
+        # Records compile times in a normal verbosity log next to the quiet
+        # console output when set
+        self.timings_dir = timings_dir
+
+    def find_project_file(self, filename, test=False):
+        # Prefer the exact owner from the indexed project files and only
+        # fall back to the directory layout heuristics when it is unknown
+        project_file = None
+        if self.project_index is not None:
+            if test:
+                project_file = self.project_index.get_vc_test_project(
+                    filename)
+            else:
+                project_file = self.project_index.get_vc_project(filename)
+
+        if not project_file:
+            if test:
+                project_file = self.locator.get_vc_test_project(filename)
+            else:
+                project_file = self.locator.get_vc_project(filename)
+        return project_file
+
+    def msbuild_path(self, project_file):
+        # The version the project was generated for, else the newest one
+        # that is at least as recent
+        versions = VS_VERSION_RE.findall(project_file)
+        wanted = versions[-1] if versions else None
+        if wanted in self.msbuild:
+            return self.msbuild[wanted]
+        newer = [version for version in self.msbuild
+                 if wanted is None or version > wanted]
+        return self.msbuild[max(newer)] if newer else "MSBuild.exe"
+
+    def build_args(self, project_file):
+        args = ["cmd", "/C", self.msbuild_path(project_file),
+                project_file,
+                '/p:Configuration=Debug',
+                '/maxcpucount:{}'.format(self.jobs),
+                '/v:q']  # q, only warnings and errors
+        if self.timings_dir is not None:
+            args.append('/flp:LogFile={};Verbosity=normal;PerformanceSummary'
+                        .format(self.timings_log(project_file)))
+        return args
+
+    def compile_args(self, project_file, files):
+        return self.build_args(project_file) + [
+            '/t:ClCompile',
+            '/p:SelectedFiles={}'.format(";".join(os.path.basename(f)
+                                                  for f in files))
+        ]
+
+    def timings_log(self, project_file):
+        digest = hashlib.md5(os.path.normcase(project_file).encode("utf-8"))
+        return os.path.join(self.timings_dir, "{}-{}.log".format(
+            os.path.splitext(os.path.basename(project_file))[0],
+            digest.hexdigest()[:8]))
+
+    def build_env(self, project_file):
+        if self.timings_dir is None:
+            return None
+        # cl.exe appends the options in _CL_ to its command line
+        env = dict(os.environ)
+        env["_CL_"] = (env.get("_CL_", "") + " /Bt+").strip()
+        return env
+
+    def unit_times(self, project_file):
+        if self.timings_dir is None:
+            return {}
+        filename = self.timings_log(project_file)
+        try:
+            with open(filename, encoding="utf-8", errors="replace") as f:
+                times = parse_cl_times(f)
+            os.remove(filename)
+        except OSError:
+            return {}
+        return times
+
+    def get_tester_and_working_dir(self, project_file):
+        return self.locator.get_tester_and_working_dir(project_file)
+
+
+def _source_key(filename):
+    return os.path.normcase(os.path.normpath(filename))
+
+
+def object_outputs(build_dir):
+    # {source: object file} from compile_commands.json, only CMake 3.20 and
+    # newer record the output of every entry
+    outputs = {}
+    filename = os.path.join(build_dir, "compile_commands.json")
+    try:
+        with open(filename, "r") as f:
+            for entry in iter_json_array(f):
+                if "output" not in entry:
+                    continue
+                directory = entry.get("directory", build_dir)
+                source = os.path.join(directory, entry["file"])
+                outputs[_source_key(source)] = os.path.normpath(
+                    os.path.join(directory, entry["output"]))
+    except (OSError, ValueError, KeyError):
+        pass
+    return outputs
+
+
+def cmake_make_target(output):
+    # <dir>/CMakeFiles/<target>.dir/src/a.cpp.o -> (<dir>, 'src/a.cpp.o'),
+    # the Makefile CMake generates in <dir> has a rule for the object
+    parts = output.split(os.sep)
+    for i in range(len(parts) - 3, -1, -1):
+        if parts[i] == "CMakeFiles" and parts[i + 1].endswith(".dir"):
+            return os.sep.join(parts[:i]), "/".join(parts[i + 2:])
+    return None
+
+
+class GeneratorBackend(BuildBackend):
+    """Backends for build directories made by a build file generator.
+
+    The project file is the generated build file in the build directory,
+    which is looked for in the build_dirs of every directory above the
+    source.
+    """
+    build_file = None
+
+    def __init__(self, jobs=0, build_dirs=("build", ".")):
+        super().__init__(jobs)
+        self.build_dirs = build_dirs
+
+    def find_project_file(self, filename, test=False):
+        directory = os.path.dirname(os.path.abspath(filename))
+        while True:
+            for build_dir in self.build_dirs:
+                candidate = os.path.normpath(os.path.join(
+                    directory, build_dir, self.build_file))
+                if os.path.isfile(candidate):
+                    return candidate
+
+            parent = os.path.dirname(directory)
+            if parent == directory:
+                return None
+            directory = parent
+
+
+class NinjaBackend(GeneratorBackend):
+    name = "ninja"
+    build_file = "build.ninja"
+
+    def build_args(self, project_file):
+        return ["ninja", "-C", os.path.dirname(project_file),
+                "-j", str(self.jobs)]
+
+    def compile_args(self, project_file, files):
+        build_dir = os.path.dirname(project_file)
+        return self.build_args(project_file) + \
+            self.object_targets(build_dir, files)
+
+    def object_targets(self, build_dir, files):
+        # Every output is a target of the one build.ninja, the first output
+        # that has the file as input otherwise
+        outputs = object_outputs(build_dir)
+        targets = []
+        for filename in files:
+            output = outputs.get(_source_key(filename))
+            if output is not None:
+                targets.append(os.path.relpath(output, build_dir))
+            else:
+                targets.append(os.path.relpath(filename, build_dir) + "^")
+        return targets
+
+
+class MakeBackend(GeneratorBackend):
+    name = "make"
+    build_file = "Makefile"
+
+    def build_args(self, project_file):
+        return ["make", "-C", os.path.dirname(project_file),
+                "-j", str(self.jobs)]
+
+    def compile_args(self, project_file, files):
+        build_dir = os.path.dirname(project_file)
+        targets = self.object_targets(build_dir, files)
+        commands = [["make", "-C", directory, "-j", str(self.jobs)] + names
+                    for directory, names in sorted(targets.items())]
+        if len(commands) == 1:
+            return commands[0]
+        # Objects of several CMake directories, one make for each
+        return ["sh", "-c", " && ".join(
+            " ".join(shlex.quote(arg) for arg in command)
+            for command in commands)]
+
+    def object_targets(self, build_dir, files):
+        # {directory to run make in: object targets}. CMake only defines the
+        # object rules in the Makefile of the directory owning the target.
+        outputs = object_outputs(build_dir)
+        targets = {}
+        for filename in files:
+            output = outputs.get(_source_key(filename))
+            target = cmake_make_target(output) if output else None
+            if target is None:
+                target = (build_dir,
+                          self.default_object_target(build_dir, filename))
+            targets.setdefault(target[0], []).append(target[1])
+        return targets
+
+    def default_object_target(self, build_dir, filename):
+        return os.path.splitext(os.path.relpath(filename, build_dir))[0] + \
+            ".o"
+
+
+class CMakeBackend(GeneratorBackend):
+    """Builds CMake build directories with whichever generator made them."""
+    name = "cmake"
+    build_file = "CMakeCache.txt"
+
+    def generator(self, build_dir):
+        for backend in (NinjaBackend, MakeBackend):
+            if os.path.isfile(os.path.join(build_dir, backend.build_file)):
+                return backend(self.jobs, self.build_dirs)
+        return None
+
+    def build_args(self, project_file):
+        return ["cmake", "--build", os.path.dirname(project_file),
+                "--", "-j", str(self.jobs)]
+
+    def compile_args(self, project_file, files):
+        build_dir = os.path.dirname(project_file)
+        generator = self.generator(build_dir)
+        if generator is None:
+            return self.build_args(project_file)
+        return generator.compile_args(
+            os.path.join(build_dir, generator.build_file), files)
+
+
+BACKENDS = dict((backend.name, backend) for backend in
+                (MsBuildBackend, NinjaBackend, MakeBackend, CMakeBackend))
+
+
+def create_backend(name, jobs=0):
+    try:
+        return BACKENDS[name](jobs)
+    except KeyError:
+        raise ValueError("Unknown build backend '{}', use one of {}"
+                         .format(name, ", ".join(sorted(BACKENDS))))
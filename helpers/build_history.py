@@ -0,0 +1,189 @@
+import logging
+import os
+import threading
+from collections import namedtuple
+
+try:
+    import sqlite3
+except ImportError:
+    # Not every Sublime Text build ships the sqlite3 module
+    sqlite3 = None
+
+DatabaseError = getattr(sqlite3, "Error", OSError)
+
+SPARK_CHARS = "▁▂▃▄▅▆▇█"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    started REAL NOT NULL,
+    ended REAL NOT NULL,
+    project TEXT NOT NULL,
+    variant TEXT NOT NULL,
+    returncode INTEGER,
+    cancelled INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS units (
+    job_id INTEGER NOT NULL REFERENCES jobs(id),
+    file TEXT NOT NULL,
+    seconds REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_project ON jobs(project, variant, started);
+CREATE INDEX IF NOT EXISTS units_file ON units(file, job_id);
+"""
+
+Job = namedtuple("Job", "id started ended project variant returncode "
+                        "cancelled")
+UnitStats = namedtuple("UnitStats", "file runs average maximum last")
+ProjectTrend = namedtuple("ProjectTrend", "project variant durations")
+
+
+class BuildHistory:
+    """Keeps a record of every build job in a SQLite database.
+
+    A job is stored with its start and end time, project, variant (build,
+    compile or test), exit status and the compile time of every translation
+    unit the build tool reported.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self._lock = threading.Lock()
+        self._connection = None
+
+    @staticmethod
+    def available():
+        return sqlite3 is not None
+
+    def _connect(self):
+        # Jobs finish on the scheduler threads, reports are made on the main
+        # thread. The lock serializes all use of the connection.
+        if self._connection is None:
+            if self.filename != ":memory:":
+                os.makedirs(os.path.dirname(self.filename), exist_ok=True)
+            self._connection = sqlite3.connect(self.filename,
+                                               check_same_thread=False)
+            self._connection.executescript(SCHEMA)
+        return self._connection
+
+    def record(self, started, ended, project, variant, returncode,
+               cancelled=False, unit_times=None):
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                cursor = connection.execute(
+                    "INSERT INTO jobs (started, ended, project, variant, "
+                    "returncode, cancelled) VALUES (?, ?, ?, ?, ?, ?)",
+                    (started, ended, project, variant, returncode,
+                     int(cancelled)))
+                job_id = cursor.lastrowid
+                if unit_times:
+                    connection.executemany(
+                        "INSERT INTO units (job_id, file, seconds) "
+                        "VALUES (?, ?, ?)",
+                        [(job_id, filename, seconds)
+                         for filename, seconds in sorted(unit_times.items())])
+            return job_id
+
+    def jobs(self, limit=100):
+        # Most recent first
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT id, started, ended, project, variant, returncode, "
+                "cancelled FROM jobs ORDER BY started DESC, id DESC LIMIT ?",
+                (limit,)).fetchall()
+        return [Job(*row[:6] + (bool(row[6]),)) for row in rows]
+
+    def unit_times(self, job_id):
+        with self._lock:
+            return dict(self._connect().execute(
+                "SELECT file, seconds FROM units WHERE job_id = ?",
+                (job_id,)))
+
+    def slowest_units(self, limit=50):
+        # Slowest on average, with the time of the most recent compile
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT u.file, COUNT(*), AVG(u.seconds), MAX(u.seconds), "
+                "(SELECT l.seconds FROM units l WHERE l.file = u.file "
+                " ORDER BY l.job_id DESC LIMIT 1) "
+                "FROM units u GROUP BY u.file "
+                "ORDER BY AVG(u.seconds) DESC LIMIT ?", (limit,)).fetchall()
+        return [UnitStats(*row) for row in rows]
+
+    def project_trends(self, runs=10):
+        # Durations of the last runs that succeeded, oldest first, per
+        # project and variant. Projects that were built most recently first.
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT project, variant, ended - started FROM jobs "
+                "WHERE returncode = 0 AND cancelled = 0 "
+                "ORDER BY started, id").fetchall()
+
+        durations = {}
+        order = []
+        for project, variant, duration in rows:
+            key = (project, variant)
+            if key in durations:
+                order.remove(key)
+            else:
+                durations[key] = []
+            order.append(key)
+            durations[key] = (durations[key] + [duration])[-runs:]
+
+        return [ProjectTrend(project, variant, durations[project, variant])
+                for project, variant in reversed(order)]
+
+    def clear(self):
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                connection.execute("DELETE FROM units")
+                connection.execute("DELETE FROM jobs")
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+
+def sparkline(values):
+    if not values:
+        return ""
+    low = min(values)
+    span = max(values) - low
+    if span <= 0:
+        return SPARK_CHARS[0] * len(values)
+    last = len(SPARK_CHARS) - 1
+    return "".join(SPARK_CHARS[int(round((value - low) / span * last))]
+                   for value in values)
+
+
+def format_trend(durations):
+    # 'last 12.0 s, avg 10.0 s over 4 run(s) (+20%) ▁▂▄▂█'
+    if not durations:
+        return "no successful runs"
+
+    last = durations[-1]
+    text = "last {:.1f} s".format(last)
+    previous = durations[:-1]
+    if previous:
+        average = sum(previous) / len(previous)
+        text += ", avg {:.1f} s over {} run(s)".format(average,
+                                                       len(previous))
+        if average > 0:
+            text += " ({:+.0%})".format(last / average - 1)
+    return text + " " + sparkline(durations)
+
+
+def format_unit(stats):
+    return "avg {:.2f} s, last {:.2f} s, max {:.2f} s over {} compile(s)" \
+        .format(stats.average, stats.last, stats.maximum, stats.runs)
+
+
+def open_history(filename):
+    if not BuildHistory.available():
+        logging.warning("The build history needs the sqlite3 module")
+        return None
+    return BuildHistory(filename)
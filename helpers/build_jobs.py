@@ -0,0 +1,193 @@
+import multiprocessing
+import os
+import subprocess
+import threading
+import time
+
+QUEUED = "queued"
+RUNNING = "running"
+FINISHED = "finished"
+CANCELLED = "cancelled"
+
+IDLE_TIMEOUT = 60
+
+
+class BuildJob:
+    def __init__(self, key, name, args, cwd, on_output, on_done,
+                 resource=None, env=None):
+        self.key = key
+        self.name = name
+        self.args = args
+        self.cwd = cwd
+        self.on_output = on_output
+        self.on_done = on_done
+        self.resource = resource
+        self.env = env
+        self.state = QUEUED
+        self.proc = None
+        self.returncode = None
+        self.submitted = time.time()
+        self.started = None
+        self.ended = None
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self):
+        return self.state == CANCELLED
+
+    def elapsed(self):
+        if self.started is None:
+            return 0.0
+        return (self.ended or time.time()) - self.started
+
+    def _terminate(self):
+        with self._lock:
+            proc = self.proc
+        if proc is not None and proc.poll() is None:
+            proc.terminate()
+
+
+class BuildScheduler:
+    """Runs build processes from a queue, at most max_jobs at a time.
+
+    Submitting a job that is still queued returns the queued job instead of
+    adding another one. Jobs sharing a resource (e.g. a project file) never
+    run at the same time. Every worker thread runs one job at a time from
+    start to finish and reads its output; output is handed to on_output in
+    whole lines and on_done is called from the worker when the job ends.
+    """
+
+    def __init__(self, max_jobs=0, popen=subprocess.Popen):
+        self.max_jobs = max_jobs or multiprocessing.cpu_count()
+        self._popen = popen
+        self._cond = threading.Condition()
+        self._queue = []
+        self._running = []
+        self._workers = 0
+        self._idle = 0
+
+    def submit(self, key, name, args, cwd, on_output, on_done,
+               resource=None, env=None):
+        # Returns (job, created)
+        with self._cond:
+            for job in self._queue:
+                if job.key == key:
+                    return job, False
+
+            job = BuildJob(key, name, args, cwd, on_output, on_done,
+                           resource, env)
+            self._queue.append(job)
+            # A woken worker counts as idle until it takes a job, so every
+            # queued job beyond the idle workers needs a worker of its own
+            if len(self._queue) > self._idle and \
+                    self._workers < self.max_jobs:
+                self._workers += 1
+                worker = threading.Thread(target=self._work)
+                worker.daemon = True
+                worker.start()
+            self._cond.notify()
+        return job, True
+
+    def cancel(self, job):
+        with self._cond:
+            if job.state in (FINISHED, CANCELLED):
+                return
+            queued = job in self._queue
+            if queued:
+                self._queue.remove(job)
+            job.state = CANCELLED
+
+        if queued:
+            job.on_done(job)
+        else:
+            job._terminate()
+
+    def cancel_all(self):
+        for job in self.jobs():
+            self.cancel(job)
+
+    def jobs(self):
+        # Running jobs first, then the queue in order
+        with self._cond:
+            return self._running + self._queue
+
+    def active(self):
+        with self._cond:
+            return bool(self._running or self._queue)
+
+    def _next_job(self):
+        busy = set(job.resource for job in self._running
+                   if job.resource is not None)
+        for job in self._queue:
+            if job.resource is None or job.resource not in busy:
+                self._queue.remove(job)
+                self._running.append(job)
+                job.state = RUNNING
+                return job
+        return None
+
+    def _work(self):
+        while True:
+            with self._cond:
+                job = self._next_job()
+                while job is None:
+                    self._idle += 1
+                    self._cond.wait(IDLE_TIMEOUT)
+                    self._idle -= 1
+                    job = self._next_job()
+                    if job is None and not self._queue:
+                        self._workers -= 1
+                        return
+
+            try:
+                self._run(job)
+            finally:
+                with self._cond:
+                    self._running.remove(job)
+                    if job.state == RUNNING:
+                        job.state = FINISHED
+                    self._cond.notify_all()
+                job.on_done(job)
+
+    def _run(self, job):
+        job.started = time.time()
+        try:
+            proc = self._popen(job.args, stdout=subprocess.PIPE,
+                               stderr=subprocess.STDOUT, cwd=job.cwd,
+                               env=job.env)
+        except OSError as e:
+            job.on_output("Cannot start {}: {}\n".format(job.name, e)
+                          .encode())
+            job.returncode = -1
+            job.ended = time.time()
+            return
+
+        with job._lock:
+            job.proc = proc
+        if job.cancelled:
+            job._terminate()
+
+        fileno = proc.stdout.fileno()
+        partial = b""
+        while True:
+            try:
+                data = os.read(fileno, 2 ** 16)
+            except OSError:
+                data = b""
+            if not data:
+                break
+
+            # Only whole lines, so concurrent jobs do not interleave in the
+            # middle of a line
+            end = data.rfind(b"\n") + 1
+            if end == 0:
+                partial += data
+                continue
+            job.on_output(partial + data[:end])
+            partial = data[end:]
+
+        if partial:
+            job.on_output(partial)
+        proc.stdout.close()
+        job.returncode = proc.wait()
+        job.ended = time.time()
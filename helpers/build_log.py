@@ -0,0 +1,269 @@
+import bisect
+import collections
+import mmap
+import os
+import re
+import threading
+from array import array
+
+LOG_PREFIX = "build-"
+LOG_SUFFIX = ".log"
+REGEX_CHARACTERS = set(".^$*+?{}[]\\|()")
+
+
+class _Segment:
+    def __init__(self, filename, first_line):
+        self.filename = filename
+        self.first_line = first_line
+        self.offsets = array("Q")  # byte offset of every line start
+        self.size = 0
+
+
+class BuildLog:
+    """The complete build output of the session, kept on disk.
+
+    Output is appended to log files of at most max_bytes each, only the
+    newest max_files are kept. The start of every line is indexed, so
+    reading a line or searching the log maps the file instead of loading
+    it. Lines are numbered from the start of the session, lines of deleted
+    files are no longer available, nor are diagnostics beyond the newest
+    max_diagnostics.
+    """
+
+    def __init__(self, directory, max_bytes=2 ** 24, max_files=4,
+                 max_diagnostics=10000):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_files = max_files
+        self._lock = threading.Lock()
+        self._segments = []
+        self._file = None
+        self._sequence = 0
+        self._at_line_start = True
+        self._last_writer = None
+        # (line number, Diagnostic), the oldest drop off the front
+        self._diagnostics = collections.deque(maxlen=max_diagnostics)
+
+        os.makedirs(directory, exist_ok=True)
+        for name in os.listdir(directory):
+            if name.startswith(LOG_PREFIX) and name.endswith(LOG_SUFFIX):
+                os.remove(os.path.join(directory, name))
+        self._start_segment(0)
+
+    def _start_segment(self, first_line):
+        if self._file is not None:
+            self._file.close()
+        filename = os.path.join(self.directory, "{}{}{}".format(
+            LOG_PREFIX, self._sequence, LOG_SUFFIX))
+        self._sequence += 1
+        self._file = open(filename, "wb")
+        self._segments.append(_Segment(filename, first_line))
+
+        while len(self._segments) > self.max_files:
+            removed = self._segments.pop(0)
+            try:
+                os.remove(removed.filename)
+            except OSError:
+                pass
+        first_available = self._segments[0].first_line
+        while self._diagnostics and self._diagnostics[0][0] < first_available:
+            self._diagnostics.popleft()
+
+    def writer(self, parse_line=None):
+        return LogWriter(self, parse_line)
+
+    def append(self, data, writer=None):
+        # Returns the number of the line the data starts on
+        with self._lock:
+            if writer is not self._last_writer and not self._at_line_start:
+                # Terminate the partial line another writer left
+                self._write(b"\n")
+            self._last_writer = writer
+
+            segment = self._segments[-1]
+            if self._at_line_start and segment.size >= self.max_bytes:
+                self._start_segment(segment.first_line +
+                                    len(segment.offsets))
+                segment = self._segments[-1]
+
+            line = segment.first_line + len(segment.offsets)
+            if not self._at_line_start:
+                line -= 1
+            self._write(data)
+            return line
+
+    def _write(self, data):
+        if not data:
+            return
+        segment = self._segments[-1]
+        base = segment.size
+        offsets = segment.offsets
+        if self._at_line_start:
+            offsets.append(base)
+        end = len(data) - 1
+        pos = data.find(b"\n")
+        while pos != -1 and pos < end:
+            offsets.append(base + pos + 1)
+            pos = data.find(b"\n", pos + 1)
+
+        self._at_line_start = data.endswith(b"\n")
+        self._file.write(data)
+        segment.size += len(data)
+
+    def add_diagnostic(self, line, diagnostic):
+        with self._lock:
+            self._diagnostics.append((line, diagnostic))
+
+    def diagnostics(self):
+        with self._lock:
+            return list(self._diagnostics)
+
+    def line_range(self):
+        # (first available line, number of lines + 1)
+        with self._lock:
+            last = self._segments[-1]
+            return self._segments[0].first_line, \
+                last.first_line + len(last.offsets)
+
+    def _locate(self, line):
+        i = bisect.bisect_right([s.first_line for s in self._segments],
+                                line) - 1
+        if i < 0:
+            return None, None
+        segment = self._segments[i]
+        index = line - segment.first_line
+        if index >= len(segment.offsets):
+            return None, None
+        return segment, index
+
+    def lines(self, first, count=1):
+        # [(line number, text)] for up to count lines starting at first
+        result = []
+        with self._lock:
+            self._file.flush()
+            line = max(first, self._segments[0].first_line)
+            while len(result) < count:
+                segment, index = self._locate(line)
+                if segment is None:
+                    break
+                end_index = min(index + count - len(result),
+                                len(segment.offsets))
+                with _mapped(segment) as data:
+                    for i in range(index, end_index):
+                        start = segment.offsets[i]
+                        end = segment.offsets[i + 1] \
+                            if i + 1 < len(segment.offsets) else segment.size
+                        result.append((segment.first_line + i,
+                                       _decode(data[start:end])))
+                line = segment.first_line + end_index
+        return result
+
+    def search(self, pattern, max_results=1000, ignore_case=None):
+        # [(line number, text)] of the lines matching the regular
+        # expression, case is ignored when the pattern is all lower case
+        if ignore_case is None:
+            ignore_case = pattern == pattern.lower()
+        if not ignore_case and not any(c in REGEX_CHARACTERS
+                                       for c in pattern):
+            finditer = _literal_finditer(pattern.encode("utf-8"))
+        else:
+            flags = re.MULTILINE | (re.IGNORECASE if ignore_case else 0)
+            finditer = _regex_finditer(re.compile(pattern.encode("utf-8"),
+                                                  flags))
+
+        result = []
+        with self._lock:
+            self._file.flush()
+            for segment in self._segments:
+                if segment.size == 0:
+                    continue
+                offsets = segment.offsets
+                with _mapped(segment) as data:
+                    last_index = -1
+                    for start in finditer(data):
+                        index = bisect.bisect_right(offsets, start) - 1
+                        if index == last_index:
+                            continue
+                        last_index = index
+                        end = offsets[index + 1] \
+                            if index + 1 < len(offsets) else segment.size
+                        result.append((segment.first_line + index,
+                                       _decode(data[offsets[index]:end])))
+                        if len(result) >= max_results:
+                            return result
+        return result
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+def _regex_finditer(regex):
+    def finditer(data):
+        for m in regex.finditer(data):
+            yield m.start()
+    return finditer
+
+
+def _literal_finditer(literal):
+    # Yields the match offsets, find on the mapped file is a lot faster
+    # than the regular expression engine
+    def finditer(data):
+        pos = data.find(literal)
+        while pos != -1:
+            yield pos
+            pos = data.find(literal, pos + 1)
+    return finditer
+
+
+def _decode(data):
+    return data.decode("utf-8", errors="replace").rstrip("\r\n")
+
+
+class _mapped:
+    def __init__(self, segment):
+        self.segment = segment
+
+    def __enter__(self):
+        self._f = open(self.segment.filename, "rb")
+        self._map = mmap.mmap(self._f.fileno(), self.segment.size,
+                              access=mmap.ACCESS_READ)
+        return self._map
+
+    def __exit__(self, *exc_info):
+        self._map.close()
+        self._f.close()
+
+
+class LogWriter:
+    """Writes the output of one build to the log.
+
+    Complete lines are passed to parse_line, the diagnostics it returns
+    are indexed by their line number in the log.
+    """
+
+    def __init__(self, log, parse_line=None):
+        self._log = log
+        self._parse_line = parse_line
+        self._partial = ""
+        self._line = None
+
+    def write(self, text):
+        # Returns the diagnostics in the completed lines
+        line = self._log.append(text.encode("utf-8"), self)
+        if self._parse_line is None:
+            return []
+
+        if not self._partial:
+            self._line = line
+        lines = (self._partial + text).split("\n")
+        self._partial = lines.pop()
+
+        diagnostics = []
+        for i, complete in enumerate(lines):
+            diagnostic = self._parse_line(complete.rstrip("\r"))
+            if diagnostic is not None:
+                self._log.add_diagnostic(self._line + i, diagnostic)
+                diagnostics.append(diagnostic)
+        self._line += len(lines)
+        return diagnostics
@@ -0,0 +1,157 @@
+import logging
+import multiprocessing
+import os
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+SOURCE_EXTENSIONS = (".c", ".cc", ".cpp", ".cxx")
+C_STD_ERROR = "error: invalid argument '-std=c++17' not allowed with 'C' " \
+              "[clang-diagnostic-error]"
+
+
+def find_sources(folders, extensions=SOURCE_EXTENSIONS):
+    for folder in folders:
+        if os.path.isfile(folder):
+            yield folder
+            continue
+
+        for dirpath, dirnames, filenames in os.walk(folder):
+            dirnames[:] = [d for d in dirnames if not d.startswith(".")]
+            for filename in filenames:
+                if filename.lower().endswith(extensions):
+                    yield os.path.join(dirpath, filename)
+
+
+def build_args(cmd, relative_path, flags):
+    args = ["clang-tidy.exe"]
+    args += cmd.split(" ")
+    args.append(relative_path)
+    args.append("--")
+    args += flags
+    return args
+
+
+class TidyResult:
+    def __init__(self, filename, returncode, output, cached=False):
+        self.filename = filename
+        self.returncode = returncode
+        self.output = output
+        self.cached = cached
+
+    @property
+    def failed(self):
+        return self.returncode != 0 and C_STD_ERROR not in self.output
+
+
+class ClangTidyRunner:
+    """Runs clang-tidy for many files concurrently.
+
+    clang-tidy itself is the expensive part and runs in its own process,
+    so a thread per concurrent job is enough to keep every core busy.
+    Callbacks are invoked from the worker threads.
+    """
+
+    def __init__(self, jobs=None, cache=None):
+        self.cache = cache
+        self.jobs = jobs or multiprocessing.cpu_count()
+        self._lock = threading.Lock()
+        self._procs = set()
+        self._cancelled = threading.Event()
+        self.total = 0
+        self.finished = 0
+        self.cached = 0
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def run(self, tasks, on_result, on_done=None):
+        # tasks: iterable of (filename, args, cwd)
+        tasks = list(tasks)
+        self.total = len(tasks)
+        self.finished = 0
+        self.cached = 0
+
+        def run_all():
+            with ThreadPoolExecutor(max_workers=self.jobs) as executor:
+                for task in tasks:
+                    executor.submit(self._run_safely, task, on_result)
+            if on_done is not None:
+                on_done(self)
+
+        thread = threading.Thread(target=run_all)
+        thread.daemon = True
+        thread.start()
+        return thread
+
+    def cancel(self):
+        self._cancelled.set()
+        with self._lock:
+            procs = list(self._procs)
+        for proc in procs:
+            proc.terminate()
+
+    def _run_safely(self, task, on_result):
+        # The executor drops what its tasks raise, a file that cannot be
+        # checked (e.g. clang-tidy is not on the PATH) still has to be
+        # reported and counted
+        try:
+            self._run_one(task, on_result)
+        except Exception as e:
+            logging.exception("clang-tidy failed for {}".format(task[0]))
+            self._report(on_result, TidyResult(
+                task[0], -1, "Cannot run clang-tidy: {}".format(e)))
+
+    def _run_one(self, task, on_result):
+        if self.cancelled:
+            return
+
+        filename, args, cwd = task
+        key = stamps = None
+        if self.cache is not None:
+            try:
+                # The key is computed once, the store only checks that
+                # the files it was computed from did not change
+                key, stamps = self.cache.fingerprint(filename, args, cwd)
+            except OSError:
+                key = None
+
+        if key is not None:
+            entry = self.cache.get(key)
+            if entry is not None:
+                self._report(on_result, TidyResult(
+                    filename, entry["returncode"], entry["output"], True))
+                return
+
+        proc = subprocess.Popen(args,
+                                stdout=subprocess.PIPE,
+                                stderr=subprocess.STDOUT,
+                                shell=True,
+                                cwd=cwd)
+        with self._lock:
+            self._procs.add(proc)
+        try:
+            output, _ = proc.communicate()
+        finally:
+            with self._lock:
+                self._procs.discard(proc)
+
+        if self.cancelled:
+            return
+
+        result = TidyResult(filename, proc.returncode,
+                            output.decode(errors="replace"))
+        # A run that applied fixes changed the file, its result no longer
+        # belongs to the hashed contents
+        if key is not None and self.cache.unchanged(stamps):
+            self.cache.put(key, {"returncode": result.returncode,
+                                 "output": result.output})
+        self._report(on_result, result)
+
+    def _report(self, on_result, result):
+        with self._lock:
+            self.finished += 1
+            if result.cached:
+                self.cached += 1
+        on_result(result)
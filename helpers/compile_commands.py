@@ -0,0 +1,187 @@
+import json
+import logging
+import os
+import shlex
+import threading
+from . import lazy
+from .telemetry import timed
+
+C_EXTENSIONS = (".c",)
+WHITESPACE_RE = lazy.compile(r"\s*")
+SEPARATOR_RE = lazy.compile(r"[\s,]*")
+DATABASE_LOCATIONS = ("compile_commands.json",
+                      os.path.join("build", "compile_commands.json"))
+
+
+def _normalize(path):
+    return os.path.normcase(os.path.abspath(path))
+
+
+def iter_json_array(f, chunk_size=2 ** 16):
+    # Yields the elements of a top level json array one at a time, so a
+    # large compilation database never needs to be loaded as a whole
+    decoder = json.JSONDecoder()
+    buffer = ""
+    pos = 0
+    eof = False
+    started = False
+    while True:
+        pos = (SEPARATOR_RE if started else WHITESPACE_RE).match(
+            buffer, pos).end()
+        if pos == len(buffer) or started and buffer[pos] != "]":
+            if pos < len(buffer):
+                try:
+                    element, pos = decoder.raw_decode(buffer, pos)
+                    yield element
+                    continue
+                except ValueError:
+                    if eof:
+                        raise
+
+            if eof:
+                raise ValueError("Unexpected end of compilation database")
+            chunk = f.read(chunk_size)
+            eof = not chunk
+            buffer = buffer[pos:] + chunk
+            pos = 0
+            continue
+
+        if started:
+            return  # buffer[pos] == "]"
+
+        if buffer[pos] != "[":
+            raise ValueError("Compilation database is not a json array")
+        pos += 1
+        started = True
+
+
+def _split_command(command):
+    if os.name == "nt":
+        return [arg.strip('"') for arg in shlex.split(command, posix=False)]
+    return shlex.split(command)
+
+
+def extract_flags(entry):
+    directory = entry.get("directory", "")
+    if "arguments" in entry:
+        args = list(entry["arguments"])
+    else:
+        args = _split_command(entry.get("command", ""))
+
+    source = os.path.basename(entry.get("file", ""))
+    flags = []
+    skip_next = False
+    for arg in args[1:]:  # Skip the compiler
+        if skip_next:
+            skip_next = False
+            continue
+        if arg in ("-o", "-MF", "-MT", "-MQ"):
+            skip_next = True
+            continue
+        if arg in ("-c", "--") or arg.startswith(("/Fo", "-o")) or \
+                os.path.basename(arg) == source:
+            continue
+        if arg in ("-I", "-isystem", "-include"):
+            flags.append(arg)
+            continue
+        if flags and flags[-1] in ("-I", "-isystem", "-include"):
+            arg = os.path.join(directory, arg)
+        elif arg.startswith("-I") and len(arg) > 2:
+            arg = "-I" + os.path.join(directory, arg[2:])
+        flags.append(arg)
+
+    return flags
+
+
+class FlagIndex:
+    """Per-file compiler flags for clang-tidy.
+
+    Flags come from a compile_commands.json in the project root, falling back
+    to the .clang_complete file. Both are parsed once and re-read only when
+    their modification time changes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._databases = {}  # root dir -> (path, mtime, {file: flags})
+        self._clang_complete = {}  # root dir -> (mtime, flags)
+
+    @timed("flag_index.get_flags")
+    def get_flags(self, root_dir, filename):
+        database = self._get_database(root_dir)
+        if database is not None:
+            flags = database.get(_normalize(filename))
+            if flags is not None:
+                return list(flags)
+
+        flags = self._get_clang_complete_flags(root_dir)
+        if flags is None:
+            return None
+
+        if filename.lower().endswith(C_EXTENSIONS):
+            return list(flags)
+        return ["-std=c++17"] + list(flags)
+
+    def _get_database(self, root_dir):
+        for location in DATABASE_LOCATIONS:
+            path = os.path.join(root_dir, location)
+            try:
+                mtime = os.stat(path).st_mtime
+            except OSError:
+                continue
+
+            with self._lock:
+                cached = self._databases.get(root_dir)
+            if cached is not None and cached[0] == path and \
+                    cached[1] == mtime:
+                return cached[2]
+
+            try:
+                files = self._parse_database(path)
+            except (OSError, ValueError) as e:
+                # Half written by the build system, tried again once its
+                # modification time changes
+                logging.warning("Cannot read {}: {}".format(path, e))
+                files = None
+            with self._lock:
+                self._databases[root_dir] = (path, mtime, files)
+            return files
+
+        return None
+
+    @staticmethod
+    def _parse_database(path):
+        files = {}
+        shared = {}  # Identical flag lists share a single tuple
+        with open(path, "r") as f:
+            for entry in iter_json_array(f):
+                if not isinstance(entry, dict):
+                    raise ValueError("Compilation database entry is not an "
+                                     "object")
+                filename = os.path.join(entry.get("directory", ""),
+                                        entry.get("file", ""))
+                flags = tuple(extract_flags(entry))
+                files[_normalize(filename)] = shared.setdefault(flags, flags)
+        return files
+
+    def _get_clang_complete_flags(self, root_dir):
+        path = os.path.join(root_dir, ".clang_complete")
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            return None
+
+        with self._lock:
+            cached = self._clang_complete.get(root_dir)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+
+        try:
+            with open(path, "r") as f:
+                flags = tuple(line.strip() for line in f if line.strip())
+        except OSError as e:
+            logging.warning("Cannot read {}: {}".format(path, e))
+            return None
+        with self._lock:
+            self._clang_complete[root_dir] = (mtime, flags)
+        return flags
@@ -0,0 +1,188 @@
+import bisect
+import collections
+import re
+import threading
+from . import lazy
+
+Token = collections.namedtuple("Token", ["kind", "text", "start", "end"])
+
+IDENTIFIER = "identifier"
+NUMBER = "number"
+STRING = "string"
+CHAR = "char"
+COMMENT = "comment"
+PUNCT = "punct"
+
+TOKEN_RE = lazy.compile(r"""
+    \s*
+    (?: (?P<comment>//[^\n]*|/\*.*?(?:\*/|\Z))
+      | (?P<string>(?:u8|[uUL])?R"(?P<delim>[^(\s]{0,16})\(.*?(?:\)(?P=delim)"|\Z)
+                  |(?:u8|[uUL])?"(?:\\.|[^"\\\n])*"?)
+      | (?P<char>(?:u8|[uUL])?'(?:\\.|[^'\\\n])*'?)
+      | (?P<identifier>[A-Za-z_]\w*)
+      | (?P<number>\.?\d(?:[eEpP][+-]|[\w.'])*)
+      | (?P<punct>::|->\*?|<<=|>>=|<<|>>|\.\.\.|\.\*|&&|\|\||\+\+|--
+                  |[-+*/%&|^!=<>]=|\S)
+    )?
+""", re.DOTALL | re.VERBOSE)
+
+# Everything the tokenizer cannot restart in the middle of. Raw strings are
+# matched from their quote, the look-ahead keeps the scan over plain code
+# fast.
+OPAQUE_RE = lazy.compile(r"""
+    (?=[/"'\d])
+    (?: //[^\n]*
+      | /\*.*?(?:\*/|\Z)
+      | (?<=R)"(?P<delim>[^(\s]{0,16})\(.*?(?:\)(?P=delim)"|\Z)
+      | "(?:\\.|[^"\\\n])*"?
+      | '(?:\\.|[^'\\\n])*'?
+      | (?P<number>\b\d\w*'[\w']*)  # Digit separators, not char literals
+    )
+""", re.DOTALL | re.VERBOSE)
+
+OPENING = {"(": ")", "[": "]", "{": "}", "<": ">"}
+CLOSING = {")": 1, "]": 1, "}": 1, ">": 1, ">>": 2}
+
+
+class CppLexer:
+    """Tokenizes C++ source text on demand.
+
+    Comments, string and character literals are located once, which is
+    enough to answer whether an offset is code and to start tokenizing at
+    any line. Tokens themselves are only produced for the requested range.
+    """
+
+    def __init__(self, text):
+        self.text = text
+        spans = [m.span() for m in OPAQUE_RE.finditer(text)
+                 if m.lastgroup != "number"]
+        self._opaque_starts = [start for start, _ in spans]
+        self._opaque_ends = [end for _, end in spans]
+
+    def opaque_region(self, pos):
+        # Returns (start, end) of the comment or literal containing pos
+        i = bisect.bisect_right(self._opaque_starts, pos) - 1
+        if i >= 0 and pos < self._opaque_ends[i]:
+            return self._opaque_starts[i], self._opaque_ends[i]
+        return None
+
+    def is_code(self, pos):
+        return self.opaque_region(pos) is None
+
+    def tokens(self, begin=0, end=None, comments=False):
+        region = self.opaque_region(begin)
+        if region is not None:
+            begin = region[0]
+            # Raw string regions start at their quote, include the prefix
+            while begin > 0 and self.text[begin - 1] in "RuUL8":
+                begin -= 1
+
+        end = len(self.text) if end is None else end
+        pos = begin
+        text = self.text
+        match = TOKEN_RE.match
+        while pos < end:
+            m = match(text, pos)
+            kind = m.lastgroup
+            if kind is None:
+                return  # Only whitespace left
+            start = m.start(kind)
+            if start >= end:
+                return
+            pos = m.end()
+            if kind == COMMENT and not comments:
+                continue
+            yield Token(kind, text[start:pos], start, pos)
+
+
+def tokenize(text, comments=False):
+    return list(CppLexer(text).tokens(comments=comments))
+
+
+def join_tokens(tokens, text):
+    # Joins tokens with a single space wherever the source had whitespace or
+    # comments in between them
+    pieces = []
+    previous_end = None
+    for token in tokens:
+        if previous_end is not None and token.start != previous_end:
+            pieces.append(" ")
+        pieces.append(token.text)
+        previous_end = token.end
+    return "".join(pieces)
+
+
+def split_top_level(tokens, separator=","):
+    # Splits tokens at separators that are not nested in (), [], {} or <>
+    parts = [[]]
+    depth = 0
+    for token in tokens:
+        if token.kind == PUNCT:
+            if token.text in OPENING:
+                depth += 1
+            elif token.text in CLOSING:
+                depth = max(depth - CLOSING[token.text], 0)
+            elif token.text == separator and depth == 0:
+                parts.append([])
+                continue
+        parts[-1].append(token)
+    return parts
+
+
+def find_closing(tokens, index):
+    # Index of the token closing the bracket at tokens[index], or None
+    opening = tokens[index].text
+    closing = OPENING[opening]
+    depth = 0
+    for i in range(index, len(tokens)):
+        token = tokens[i]
+        if token.kind != PUNCT:
+            continue
+        if token.text == opening:
+            depth += 1
+        elif token.text == closing:
+            depth -= 1
+            if depth == 0:
+                return i
+    return None
+
+
+def find_opening(tokens, index):
+    # Index of the token opening the bracket closed by tokens[index], or None
+    closing = tokens[index].text
+    opening = dict((v, k) for k, v in OPENING.items())[closing]
+    depth = 0
+    for i in range(index, -1, -1):
+        token = tokens[i]
+        if token.kind != PUNCT:
+            continue
+        if token.text == closing:
+            depth += 1
+        elif token.text == opening:
+            depth -= 1
+            if depth == 0:
+                return i
+    return None
+
+
+class LexerCache:
+    """Keeps the lexer of each buffer until its change count changes."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._lexers = {}
+
+    def get(self, key, change_count, get_text):
+        with self._lock:
+            cached = self._lexers.get(key)
+            if cached is not None and cached[0] == change_count:
+                return cached[1]
+
+        lexer = CppLexer(get_text())
+        with self._lock:
+            self._lexers[key] = (change_count, lexer)
+        return lexer
+
+    def discard(self, key):
+        with self._lock:
+            self._lexers.pop(key, None)
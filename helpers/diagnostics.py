@@ -0,0 +1,156 @@
+import collections
+import os
+import threading
+from . import lazy
+
+Diagnostic = collections.namedtuple(
+    "Diagnostic", ["file", "line", "column", "severity", "code", "message"])
+
+#  1>c:\src\foo.cpp(234,5): warning C4100: 'bar': unreferenced parameter [c:\bld\Foo.vcxproj]
+MSBUILD_RE = lazy.compile(
+    r"^\s*(?:\d+>)?(?P<file>.+?)\((?P<line>\d+)(?:,(?P<column>\d+))?\)\s*:"
+    r"\s*(?P<severity>fatal error|error|warning|note)"
+    r"\s+(?P<code>[A-Za-z]+\d+)\s*:\s*(?P<message>.*?)"
+    r"(?:\s+\[[^\]]+\.vcxproj\])?\s*$"
+)
+
+#  /src/foo.cpp:12:5: warning: unused variable 'x' [-Wunused-variable]
+GCC_RE = lazy.compile(
+    r"^(?P<file>(?:[A-Za-z]:)?[^:\n]+?):(?P<line>\d+):(?:(?P<column>\d+):)?"
+    r"\s*(?P<severity>fatal error|error|warning|note):\s*(?P<message>.*?)"
+    r"(?:\s+\[(?P<code>-W[^\]]+)\])?\s*$"
+)
+
+#  c:\src\FooTester.cpp(12): error: Value of: foo.Bar()
+#  /src/FooTester.cpp:12: Failure
+GTEST_RE = lazy.compile(
+    r"^(?P<file>.+?)(?:\((?P<line>\d+)\): error:|:(?P<line2>\d+): Failure)"
+    r"\s*(?P<message>.*)$"
+)
+
+
+class DiagnosticParser:
+    """Turns build and test output into Diagnostic records.
+
+    Output can be fed in arbitrary pieces, a line split over two pieces is
+    only parsed once it is complete.
+    """
+
+    def __init__(self, base_dir=None):
+        self.base_dir = base_dir
+        self._partial = ""
+
+    def feed(self, text):
+        lines = (self._partial + text).split("\n")
+        self._partial = lines.pop()
+        return self._parse_lines(lines)
+
+    def flush(self):
+        lines = [self._partial] if self._partial else []
+        self._partial = ""
+        return self._parse_lines(lines)
+
+    def _parse_lines(self, lines):
+        diagnostics = []
+        for line in lines:
+            diagnostic = self.parse_line(line.rstrip("\r"))
+            if diagnostic is not None:
+                diagnostics.append(diagnostic)
+        return diagnostics
+
+    def parse_line(self, line):
+        m = MSBUILD_RE.match(line)
+        if m is not None:
+            severity = m.group("severity")
+            if severity == "fatal error":
+                severity = "error"
+            return Diagnostic(self._path(m.group("file")),
+                              int(m.group("line")),
+                              int(m.group("column") or 0),
+                              severity,
+                              m.group("code"),
+                              m.group("message"))
+
+        m = GCC_RE.match(line)
+        if m is not None:
+            severity = m.group("severity")
+            if severity == "fatal error":
+                severity = "error"
+            return Diagnostic(self._path(m.group("file")),
+                              int(m.group("line")),
+                              int(m.group("column") or 0),
+                              severity,
+                              m.group("code") or "",
+                              m.group("message"))
+
+        m = GTEST_RE.match(line)
+        if m is not None:
+            return Diagnostic(self._path(m.group("file")),
+                              int(m.group("line") or m.group("line2")),
+                              0,
+                              "error",
+                              "gtest",
+                              m.group("message") or "Failure")
+
+        return None
+
+    def _path(self, filename):
+        filename = filename.strip()
+        if self.base_dir and not os.path.isabs(filename):
+            filename = os.path.join(self.base_dir, filename)
+        return os.path.normpath(filename)
+
+
+class DiagnosticStore:
+    """Deduplicated diagnostics, indexed per file and in output order."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self._seen = set()
+            self._ordered = []
+            self._by_file = {}
+            self._cursor = -1
+
+    def add(self, diagnostics):
+        # Returns the files that received new diagnostics
+        changed_files = set()
+        with self._lock:
+            for diagnostic in diagnostics:
+                key = (os.path.normcase(diagnostic.file),) + diagnostic[1:]
+                if key in self._seen:
+                    continue
+
+                self._seen.add(key)
+                self._ordered.append(diagnostic)
+                self._by_file.setdefault(key[0], []).append(diagnostic)
+                changed_files.add(diagnostic.file)
+
+        return changed_files
+
+    def for_file(self, filename):
+        with self._lock:
+            return list(self._by_file.get(os.path.normcase(filename), ()))
+
+    def files(self):
+        with self._lock:
+            return [diagnostics[0].file
+                    for diagnostics in self._by_file.values()]
+
+    def next(self, forward=True, severities=("error", "warning")):
+        with self._lock:
+            candidates = len(self._ordered)
+            step = 1 if forward else -1
+            for _ in range(candidates):
+                self._cursor = (self._cursor + step) % candidates
+                diagnostic = self._ordered[self._cursor]
+                if diagnostic.severity in severities:
+                    return diagnostic
+        return None
+
+    def __len__(self):
+        with self._lock:
+            return len(self._ordered)
@@ -0,0 +1,504 @@
+import codecs
+import collections
+import hashlib
+import heapq
+import json
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+import xml.etree.ElementTree as ElementTree
+from . import lazy
+
+RESULT_RE = lazy.compile(
+    r"^\[\s+(OK|FAILED|SKIPPED)\s+\] (\S+) \((\d+) ms\)")
+RUN_PREFIX = "[ RUN      ]"
+FILTER_RE = lazy.compile(r"--gtest_filter=(\S*)")
+OUTPUT_RE = lazy.compile(r"--gtest_output=\S*")
+LOCATION_RE = lazy.compile(r"^(.+?):(\d+)$")
+
+PASSED = "passed"
+FAILED = "failed"
+SKIPPED = "skipped"
+
+TestResult = collections.namedtuple("TestResult", ["status", "time",
+                                                   "message"])
+
+# Windows limits a command line to 32767 characters
+MAX_FILTER_LENGTH = 30000
+DEFAULT_DURATION = 0.01
+
+
+def parse_test_list(output):
+    # Parses --gtest_list_tests output into ['Suite.Test', ...]
+    tests = []
+    suite = None
+    for line in output.splitlines():
+        if not line.strip():
+            continue
+        name = line.split("#", 1)[0].strip()
+        if not line.startswith(" "):
+            suite = name
+        elif suite is not None:
+            tests.append(suite + name)
+    return tests
+
+
+def split_filter(test_args):
+    # Returns (gtest filter, remaining arguments), the report destination is
+    # chosen by the runner
+    test_args = OUTPUT_RE.sub("", test_args)
+    m = FILTER_RE.search(test_args)
+    if m is None:
+        return "*", test_args.split()
+    remaining = (test_args[:m.start()] + test_args[m.end():]).split()
+    return m.group(1), remaining
+
+
+def with_filter(test_args, patterns):
+    # The test arguments with the filter replaced by the given patterns
+    _, remaining = split_filter(test_args)
+    return " ".join(remaining + ["--gtest_filter=" + ":".join(patterns)])
+
+
+def file_digest(filename):
+    sha1 = hashlib.sha1()
+    with open(filename, "rb") as f:
+        for block in iter(lambda: f.read(2 ** 20), b""):
+            sha1.update(block)
+    return sha1.hexdigest()
+
+
+def parse_xml_report(filename):
+    # Returns {'Suite.Test': TestResult} from a --gtest_output=xml report
+    results = {}
+    for testcase in ElementTree.parse(filename).iter("testcase"):
+        name = "{}.{}".format(testcase.get("classname"), testcase.get("name"))
+        failures = [failure.get("message") or failure.text or ""
+                    for failure in testcase.iter("failure")]
+        if failures:
+            status = FAILED
+        elif testcase.get("status") == "notrun" or \
+                testcase.get("result") == "skipped" or \
+                testcase.find("skipped") is not None:
+            status = SKIPPED
+        else:
+            status = PASSED
+        results[name] = TestResult(status, float(testcase.get("time", 0)),
+                                   "\n".join(failures))
+    return results
+
+
+def format_results(results):
+    # Renders stored results like the tester would have, failure locations
+    # are written so the build output parser recognizes them
+    lines = []
+    for name in sorted(results):
+        result = results[name]
+        if result.status != FAILED:
+            continue
+        lines.append("[ RUN      ] " + name)
+        for line in result.message.splitlines():
+            lines.append(LOCATION_RE.sub(r"\1:\2: Failure", line))
+        lines.append("[  FAILED  ] {} ({} ms)"
+                     .format(name, int(result.time * 1000)))
+
+    counts = collections.Counter(r.status for r in results.values())
+    lines.append("")
+    lines.append("[ Moog ] {} passed, {} failed, {} skipped (cached)"
+                 .format(counts[PASSED], counts[FAILED], counts[SKIPPED]))
+    lines += ["[ Moog ] FAILED {}".format(name) for name in sorted(results)
+              if results[name].status == FAILED]
+    return "\n".join(lines) + "\n"
+
+
+def partition(tests, durations, shards):
+    # Longest processing time first: hand the slowest remaining test to the
+    # shard with the least work so far
+    known = sorted(durations[test] for test in tests if test in durations)
+    default = known[len(known) // 2] if known else DEFAULT_DURATION
+
+    def duration(test):
+        return durations.get(test, default)
+
+    bins = [(0.0, i, []) for i in range(min(shards, len(tests)))]
+    heapq.heapify(bins)
+    for test in sorted(tests, key=duration, reverse=True):
+        load, index, assigned = heapq.heappop(bins)
+        assigned.append(test)
+        heapq.heappush(bins, (load + duration(test), index, assigned))
+
+    return [sorted(assigned) for _, _, assigned in sorted(bins, key=lambda b:
+                                                          b[1])]
+
+
+class TestDurations:
+    """Per tester, the duration in seconds of every test from earlier runs."""
+
+    def __init__(self, filename=None):
+        self.filename = filename
+        self._lock = threading.Lock()
+        self._testers = {}
+        if filename and os.path.exists(filename):
+            try:
+                with open(filename, "r") as f:
+                    self._testers = json.load(f)
+            except (OSError, ValueError) as e:
+                logging.warning("Discarding test durations {}: {}"
+                                .format(filename, e))
+
+    def get(self, tester):
+        with self._lock:
+            return dict(self._testers.get(tester, {}))
+
+    def update(self, tester, durations):
+        with self._lock:
+            self._testers.setdefault(tester, {}).update(durations)
+
+    def save(self):
+        if not self.filename:
+            return
+        with self._lock:
+            text = json.dumps(self._testers)
+        os.makedirs(os.path.dirname(self.filename), exist_ok=True)
+        with open(self.filename, "w") as f:
+            f.write(text)
+
+
+class TestResults:
+    """The results of the last run of every tester.
+
+    A run is identified by the digest of the tester binary and the test
+    arguments, running the same binary the same way again can show the
+    stored results instead.
+    """
+
+    def __init__(self, filename=None):
+        self.filename = filename
+        self._lock = threading.Lock()
+        self._runs = {}
+        if filename and os.path.exists(filename):
+            try:
+                with open(filename, "r") as f:
+                    self._runs = json.load(f)
+            except (OSError, ValueError) as e:
+                logging.warning("Discarding test results {}: {}"
+                                .format(filename, e))
+
+    def _results(self, run):
+        return dict((name, TestResult(*result))
+                    for name, result in run["results"].items())
+
+    def get(self, tester):
+        with self._lock:
+            run = self._runs.get(tester)
+        return self._results(run) if run else {}
+
+    def lookup(self, tester, digest, test_args):
+        with self._lock:
+            run = self._runs.get(tester)
+        if run and run["digest"] == digest and run["args"] == test_args:
+            return self._results(run)
+        return None
+
+    def record(self, tester, digest, test_args, results):
+        with self._lock:
+            self._runs[tester] = {
+                "digest": digest,
+                "args": test_args,
+                "results": dict((name, list(result))
+                                for name, result in results.items()),
+            }
+
+    def failed(self, tester):
+        return sorted(name for name, result in self.get(tester).items()
+                      if result.status == FAILED)
+
+    def save(self):
+        if not self.filename:
+            return
+        with self._lock:
+            text = json.dumps(self._runs)
+        os.makedirs(os.path.dirname(self.filename), exist_ok=True)
+        with open(self.filename, "w") as f:
+            f.write(text)
+
+
+class ShardOutput:
+    """Splits the output of one shard into blocks that are safe to merge.
+
+    Everything from '[ RUN      ]' up to the result line of that test is
+    held back and written in one go, other lines are written as soon as
+    they are complete.
+    """
+
+    def __init__(self, write, encoding="utf-8"):
+        self._write = write
+        self._decoder = codecs.getincrementaldecoder(encoding)(
+            errors="replace")
+        self._partial = ""
+        self._block = []
+        self.durations = {}
+        self.failed = []
+        self.passed = 0
+
+    def feed(self, data):
+        lines = (self._partial + self._decoder.decode(data)).split("\n")
+        self._partial = lines.pop()
+        self._process(lines)
+
+    def close(self):
+        text = self._partial + self._decoder.decode(b"", final=True)
+        self._partial = ""
+        self._process([text] if text else [])
+        if self._block:
+            self._flush_block()
+
+    def _process(self, lines):
+        out = []
+        for line in lines:
+            line = line.rstrip("\r") + "\n"
+            if line.startswith(RUN_PREFIX):
+                self._block = [line]
+                continue
+
+            m = RESULT_RE.match(line)
+            if self._block:
+                self._block.append(line)
+                if m is not None:
+                    out.append("".join(self._block))
+                    self._block = []
+            else:
+                out.append(line)
+
+            if m is not None:
+                status, test, ms = m.groups()
+                self.durations[test] = int(ms) / 1000.0
+                if status == "FAILED":
+                    self.failed.append(test)
+                elif status == "OK":
+                    self.passed += 1
+
+        if out:
+            self._write("".join(out))
+
+    def _flush_block(self):
+        self._write("".join(self._block))
+        self._block = []
+
+
+class ShardedTestRun:
+    """Runs a gtest executable as several concurrent processes.
+
+    Tests are listed and distributed over the shards by their durations in
+    earlier runs. When the resulting filters do not fit on a command line
+    gtest's own sharding is used instead. write is called from the reader
+    threads with complete lines or complete test blocks. With a results
+    store the XML reports of the shards are recorded, and an unchanged
+    tester run with the same arguments is not executed again.
+    """
+
+    def __init__(self, tester, working_dir, test_args, shards, durations,
+                 write, on_done=None, results=None):
+        self.tester = tester
+        self.working_dir = working_dir
+        self.test_args = test_args
+        self.shards = max(int(shards), 1)
+        self.durations = durations
+        self.write = write
+        self.on_done = on_done
+        self.results = results
+        self.cached = False
+        self.cancelled = False
+        self.done = False
+        self.procs = []
+        self.outputs = []
+        self._write_lock = threading.Lock()
+        self._lock = threading.Lock()
+
+    def list_tests(self, gtest_filter):
+        output = subprocess.check_output(
+            [self.tester, "--gtest_list_tests",
+             "--gtest_filter=" + gtest_filter],
+            cwd=self.working_dir, stderr=subprocess.STDOUT)
+        return parse_test_list(output.decode(errors="replace"))
+
+    def shard_commands(self, report_dir=None):
+        # Returns [(args, env)] with one entry per shard
+        commands = self._shard_commands()
+        if report_dir is not None:
+            for index, (args, _) in enumerate(commands):
+                args.append("--gtest_output=xml:" + os.path.join(
+                    report_dir, "shard_{}.xml".format(index)))
+        return commands
+
+    def _shard_commands(self):
+        gtest_filter, remaining = split_filter(self.test_args)
+        base = [self.tester] + remaining
+        if self.shards == 1:
+            return [(base + ["--gtest_filter=" + gtest_filter], None)]
+
+        try:
+            tests = self.list_tests(gtest_filter)
+        except (OSError, subprocess.CalledProcessError) as e:
+            logging.warning("Cannot list tests of {}: {}"
+                            .format(self.tester, e))
+            tests = None
+
+        if tests is not None:
+            parts = partition(tests, self.durations.get(self.tester),
+                              self.shards)
+            filters = [":".join(part) for part in parts]
+            if all(len(f) < MAX_FILTER_LENGTH for f in filters):
+                return [(base + ["--gtest_filter=" + f], None)
+                        for f in filters]
+
+        commands = []
+        for index in range(self.shards):
+            env = dict(os.environ)
+            env["GTEST_TOTAL_SHARDS"] = str(self.shards)
+            env["GTEST_SHARD_INDEX"] = str(index)
+            commands.append((base + ["--gtest_filter=" + gtest_filter], env))
+        return commands
+
+    def start(self):
+        thread = threading.Thread(target=self.run)
+        thread.daemon = True
+        thread.start()
+        return thread
+
+    def run(self):
+        digest = None
+        if self.results is not None:
+            try:
+                digest = file_digest(self.tester)
+            except OSError as e:
+                logging.warning("Cannot hash {}: {}".format(self.tester, e))
+
+        cached = None
+        if digest is not None:
+            cached = self.results.lookup(self.tester, digest, self.test_args)
+        if cached is not None:
+            self.cached = True
+            self._locked_write("[ Moog ] {} is unchanged, showing the "
+                               "results of the previous run\n"
+                               .format(os.path.basename(self.tester)))
+            self._locked_write(format_results(cached))
+        else:
+            report_dir = tempfile.mkdtemp(prefix="moog_gtest_")
+            try:
+                self._run(report_dir)
+                if digest is not None and not self.cancelled:
+                    self._record(report_dir, digest)
+            finally:
+                shutil.rmtree(report_dir, ignore_errors=True)
+
+        self.done = True
+        if self.on_done is not None:
+            self.on_done(self)
+
+    def _record(self, report_dir, digest):
+        results = {}
+        for index in range(len(self.procs)):
+            report = os.path.join(report_dir, "shard_{}.xml".format(index))
+            try:
+                results.update(parse_xml_report(report))
+            except (OSError, ElementTree.ParseError) as e:
+                # A crashed shard leaves no (complete) report, the run
+                # cannot stand in for a rerun then
+                logging.warning("Cannot read test report {}: {}"
+                                .format(report, e))
+                return
+
+        self.results.record(self.tester, digest, self.test_args, results)
+        try:
+            self.results.save()
+        except OSError as e:
+            logging.warning("Cannot save test results: {}".format(e))
+
+    def _run(self, report_dir):
+        start = time.time()
+        commands = self.shard_commands(report_dir)
+        threads = []
+        with self._lock:
+            if self.cancelled:
+                return
+            for args, env in commands:
+                try:
+                    proc = subprocess.Popen(args, stdout=subprocess.PIPE,
+                                            stderr=subprocess.STDOUT,
+                                            cwd=self.working_dir, env=env)
+                except OSError as e:
+                    self._locked_write("Cannot start {}: {}\n"
+                                       .format(self.tester, e))
+                    break
+                output = ShardOutput(self._locked_write)
+                self.procs.append(proc)
+                self.outputs.append(output)
+                thread = threading.Thread(target=self._read,
+                                          args=(proc, output))
+                thread.start()
+                threads.append(thread)
+
+        for thread in threads:
+            thread.join()
+
+        durations = {}
+        for output in self.outputs:
+            durations.update(output.durations)
+        self.durations.update(self.tester, durations)
+        try:
+            self.durations.save()
+        except OSError as e:
+            logging.warning("Cannot save test durations: {}".format(e))
+
+        self._locked_write(self.summary(time.time() - start))
+
+    def _read(self, proc, output):
+        fileno = proc.stdout.fileno()
+        while True:
+            try:
+                data = os.read(fileno, 2 ** 16)
+            except OSError:
+                data = b""
+            if not data:
+                break
+            output.feed(data)
+        output.close()
+        proc.wait()
+
+    def _locked_write(self, text):
+        with self._write_lock:
+            self.write(text)
+
+    @property
+    def failed(self):
+        return sorted(test for output in self.outputs
+                      for test in output.failed)
+
+    @property
+    def returncode(self):
+        codes = [proc.returncode for proc in self.procs]
+        return next((code for code in codes if code), 0)
+
+    def summary(self, elapsed):
+        passed = sum(output.passed for output in self.outputs)
+        failed = self.failed
+        lines = ["", "[ Moog ] {} shard(s), {} passed, {} failed in {:.1f} s"
+                 .format(len(self.procs), passed, len(failed), elapsed)]
+        lines += ["[ Moog ] FAILED {}".format(test) for test in failed]
+        return "\n".join(lines) + "\n"
+
+    def cancel(self):
+        with self._lock:
+            self.cancelled = True
+            procs = list(self.procs)
+        for proc in procs:
+            if proc.poll() is None:
+                proc.terminate()
+
+    def is_running(self):
+        return not self.done
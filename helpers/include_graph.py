@@ -0,0 +1,262 @@
+import json
+import logging
+import os
+import re
+import threading
+from . import batch
+from . import lazy
+from .project_index import SKIPPED_DIRS
+from .sibling_index import HEADER_EXTENSIONS
+from .telemetry import timed
+
+EXTENSIONS = batch.CPP_EXTENSIONS + (".c",)
+INCLUDE_RE = lazy.compile(
+    r'^[ \t]*#[ \t]*include[ \t]*[<"]([^>"\n]+)[>"]', re.MULTILINE)
+TEST_RE = lazy.compile(
+    r"^[ \t]*(TEST|TEST_F|TEST_P|TYPED_TEST|TYPED_TEST_P)"
+    r"\s*\(\s*(\w+)\s*,\s*(\w+)\s*\)", re.MULTILINE)
+
+# gtest filter patterns for the test macros, parameterized and typed tests
+# get an instantiation prefix or type suffix
+TEST_PATTERNS = {
+    "TEST": "{}.{}",
+    "TEST_F": "{}.{}",
+    "TEST_P": "*/{}.{}/*",
+    "TYPED_TEST": "{}/*.{}",
+    "TYPED_TEST_P": "*/{}/*.{}",
+}
+
+
+def scan_file(filename):
+    # Returns ([included names], [gtest patterns]) of filename
+    try:
+        with open(filename, "r", errors="replace") as f:
+            text = f.read()
+    except OSError:
+        return [], []
+
+    includes = INCLUDE_RE.findall(text) if "include" in text else []
+    tests = []
+    if "TEST" in text:
+        tests = [TEST_PATTERNS[macro].format(suite, name)
+                 for macro, suite, name in TEST_RE.findall(text)]
+    return includes, tests
+
+
+def _scan(task):
+    filename, mtime, size = task
+    includes, tests = scan_file(filename)
+    return filename, [mtime, includes, tests, size]
+
+
+def _include_key(name):
+    return os.path.normcase(os.path.normpath(name.replace("\\", "/")))
+
+
+class IncludeGraph:
+    """The #include dependencies between the C++ files of the folders.
+
+    Files are only scanned again when their mtime changed, the scans are
+    kept in cache_file between sessions. An include resolves to every
+    indexed file whose path ends with the included name, which errs on the
+    side of too many dependencies instead of missing one.
+    """
+
+    def __init__(self, cache_file=None):
+        self.cache_file = cache_file
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._files = {}  # file -> [mtime, includes, test patterns, size]
+        self._included_by = {}  # file -> set of files including it
+        self._paths = {}  # normcased file -> file
+        self.ready = False
+        self.load()
+
+    def load(self):
+        if not self.cache_file or not os.path.exists(self.cache_file):
+            return
+        try:
+            with open(self.cache_file, "r") as f:
+                self._files = json.load(f)
+        except (OSError, ValueError) as e:
+            logging.warning("Discarding include graph {}: {}"
+                            .format(self.cache_file, e))
+
+    def save(self):
+        if not self.cache_file:
+            return
+        with self._lock:
+            text = json.dumps(self._files)
+        os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
+        with open(self.cache_file, "w") as f:
+            f.write(text)
+
+    def _indexed_path(self, filename):
+        # The path as it was indexed, the name of a view may differ in case
+        filename = os.path.abspath(filename)
+        return self._paths.get(os.path.normcase(filename), filename)
+
+    def tests(self, filename):
+        with self._lock:
+            entry = self._files.get(self._indexed_path(filename))
+        return list(entry[2]) if entry else []
+
+    def dependents(self, filename):
+        # filename and every file that includes it, directly or not
+        with self._lock:
+            filename = self._indexed_path(filename)
+            seen = set([filename])
+            pending = [filename]
+            while pending:
+                for dependent in self._included_by.get(pending.pop(), ()):
+                    if dependent not in seen:
+                        seen.add(dependent)
+                        pending.append(dependent)
+        return seen
+
+    @timed("include_graph.update")
+    def update(self, folders):
+        with self._refresh_lock:
+            found = {}
+            for folder in folders:
+                for dirpath, dirnames, filenames in os.walk(folder):
+                    dirnames[:] = [d for d in dirnames
+                                   if d not in SKIPPED_DIRS]
+                    for name in filenames:
+                        if name.lower().endswith(EXTENSIONS):
+                            path = os.path.abspath(os.path.join(dirpath,
+                                                                name))
+                            try:
+                                stat = os.stat(path)
+                            except OSError:
+                                continue
+                            found[path] = (stat.st_mtime, stat.st_size)
+
+            with self._lock:
+                known = self._files
+
+            files = {}
+            changed = []
+            for path, (mtime, size) in found.items():
+                entry = known.get(path)
+                if entry is not None and entry[0] == mtime:
+                    files[path] = entry[:3] + [size]
+                else:
+                    changed.append((path, mtime, size))
+
+            for path, entry in batch.map_unordered(_scan, changed,
+                                                   processes=False):
+                files[path] = entry
+
+            modified = bool(changed) or len(files) != len(known)
+            if modified or not self.ready:
+                included_by = self._reverse(files)
+                paths = dict((os.path.normcase(path), path) for path in files)
+                with self._lock:
+                    self._files = files
+                    self._included_by = included_by
+                    self._paths = paths
+                    self.ready = True
+
+            return modified
+
+    def update_async(self, folders, on_done=None):
+        # A refresh that is already running will pick up the changes
+        if self._refresh_lock.locked():
+            return None
+
+        def update():
+            if self.update(folders):
+                try:
+                    self.save()
+                except OSError as e:
+                    logging.warning("Cannot save include graph: {}"
+                                    .format(e))
+            if on_done is not None:
+                on_done()
+
+        thread = threading.Thread(target=update)
+        thread.daemon = True
+        thread.start()
+        return thread
+
+    def include_tree(self):
+        """Returns ({file: size}, {file: [included files]}).
+
+        Includes that do not resolve to an indexed file, like the standard
+        headers, are listed by their name as written.
+        """
+        with self._lock:
+            files = self._files
+        resolve = self._resolver(files)
+
+        sizes = {}
+        edges = {}
+        for path, entry in files.items():
+            sizes[path] = entry[3] if len(entry) > 3 else 0
+            targets = []
+            for name in entry[1]:
+                targets.extend(resolve(path, name) or
+                               [name.replace("\\", "/")])
+            edges[path] = targets
+        return sizes, edges
+
+    @staticmethod
+    def _resolver(files):
+        # Index by file name first, an include is then matched against
+        # the path suffixes of the few files sharing its name. Paths are
+        # compared normcased, as the include key is.
+        by_path = {}
+        by_name = {}
+        for path in files:
+            by_path[os.path.normcase(path)] = path
+            key = os.path.normcase(os.path.basename(path))
+            by_name.setdefault(key, []).append(path)
+
+        def resolve(path, name):
+            key = _include_key(name)
+            local = by_path.get(os.path.normpath(os.path.join(
+                os.path.normcase(os.path.dirname(path)), key)))
+            if local is not None:
+                return [local]
+            suffix = os.sep + key
+            return [candidate for candidate in
+                    by_name.get(os.path.basename(key), ())
+                    if os.path.normcase(candidate).endswith(suffix)]
+
+        return resolve
+
+    @classmethod
+    def _reverse(cls, files):
+        resolve = cls._resolver(files)
+        included_by = {}
+        for path, entry in files.items():
+            for name in entry[1]:
+                for target in resolve(path, name):
+                    included_by.setdefault(target, set()).add(path)
+        return included_by
+
+
+def affected_tests(graph, filename, get_projects, is_test_project):
+    """Returns {test project: gtest patterns} for the tests that depend on
+    filename, None instead of patterns when the whole tester is affected.
+    """
+    owned = {}
+    for path in graph.dependents(filename):
+        for project_file in get_projects(path):
+            if is_test_project(project_file):
+                owned.setdefault(project_file, []).append(path)
+
+    affected = {}
+    for project_file, paths in owned.items():
+        patterns = set()
+        for path in paths:
+            tests = graph.tests(path)
+            if not tests and not path.lower().endswith(HEADER_EXTENSIONS):
+                # Code compiled into the tester changed, any of its tests
+                # may exercise it
+                patterns = None
+                break
+            patterns.update(tests)
+        affected[project_file] = sorted(patterns) if patterns else None
+    return affected
@@ -0,0 +1,215 @@
+import os
+from collections import namedtuple
+from .sibling_index import HEADER_EXTENSIONS
+from .telemetry import timed
+
+HeaderCost = namedtuple("HeaderCost", "header size preprocessed_size "
+                                      "includers units cost external")
+Report = namedtuple("Report", "units preprocessed_size headers")
+
+
+def _is_header(path):
+    return path.lower().endswith(HEADER_EXTENSIONS)
+
+
+def _mask_sums(items, size):
+    # sums[i] is the total weight of the (mask, weight) items that have bit
+    # i set. The sums are added up in bit planes, plane k holds bit k of
+    # every sum, which takes a few operations on whole masks per item.
+    planes = []
+    for mask, weight in items:
+        k = 0
+        while weight:
+            if weight & 1:
+                carry = mask
+                j = k
+                while carry:
+                    if j >= len(planes):
+                        planes.extend([0] * (j + 1 - len(planes)))
+                    plane = planes[j]
+                    planes[j] = plane ^ carry
+                    carry &= plane
+                    j += 1
+            weight >>= 1
+            k += 1
+
+    sums = [0] * size
+    for k, plane in enumerate(planes):
+        text = bin(plane)
+        last = len(text) - 1
+        index = text.find("1", 2)
+        while index >= 0:
+            sums[last - index] += 1 << k
+            index = text.find("1", index + 1)
+    return sums
+
+
+def _components(nodes, children):
+    # Tarjan's strongly connected components, without recursion. A
+    # component is yielded after every component reachable from it.
+    index = {}
+    low = {}
+    stack = []
+    on_stack = set()
+    counter = 0
+    for root in nodes:
+        if root in index:
+            continue
+        work = [(root, iter(children[root]))]
+        index[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack.add(root)
+        while work:
+            node, pending = work[-1]
+            for child in pending:
+                if child not in index:
+                    index[child] = low[child] = counter
+                    counter += 1
+                    stack.append(child)
+                    on_stack.add(child)
+                    work.append((child, iter(children[child])))
+                    break
+                if child in on_stack:
+                    low[node] = min(low[node], index[child])
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    low[parent] = min(low[parent], low[node])
+                if low[node] == index[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == node:
+                            break
+                    yield component
+
+
+def _reach(adjacency, width):
+    # masks[i] has bit j set for every node j < width that can be reached
+    # from i, i itself included. Members of a cycle share their mask.
+    masks = [0] * len(adjacency)
+    for component in _components(range(len(adjacency)), adjacency):
+        mask = 0
+        for member in component:
+            if member < width:
+                mask |= 1 << member
+            for other in adjacency[member]:
+                mask |= masks[other]
+        for member in component:
+            masks[member] = mask
+    return masks
+
+
+@timed("include_hotspots.analyze")
+def analyze(sizes, edges):
+    """Ranks the headers by what they cost the translation units.
+
+    sizes maps every scanned file to its size, edges maps it to the files
+    it includes. Includes missing from sizes are external headers of
+    unknown size. Every header counts once per translation unit, as if
+    guarded. The preprocessed size of a header is its own size plus that
+    of everything it includes, its cost is that size times the number of
+    translation units including it directly or not.
+    """
+    # Only included files get a bit in the masks, translation units that
+    # nothing includes sort after them
+    included = set().union(*edges.values())
+    width = len(included)
+    nodes = sorted(included) + sorted(set(sizes) - included)
+    position = dict((node, i) for i, node in enumerate(nodes))
+    children = [sorted(set(position[target]
+                           for target in edges.get(node, ())))
+                for node in nodes]
+    parents = [[] for _ in nodes]
+    for i, targets in enumerate(children):
+        for child in targets:
+            parents[child].append(i)
+
+    node_sizes = [sizes.get(node, 0) for node in nodes]
+    closures = _reach(children, width)
+    units = [i for i, node in enumerate(nodes)
+             if node in sizes and not _is_header(node)]
+    unit_counts = _mask_sums(((closures[i], 1) for i in units), width)
+
+    # A file adds its size to the preprocessed size of everything that
+    # includes it, directly or not
+    dependents = _reach(parents, width)
+    preprocessed_sizes = _mask_sums(
+        ((dependents[i], node_sizes[i]) for i in range(width)), width)
+
+    total_size = sum(count * size
+                     for count, size in zip(unit_counts, node_sizes)) + \
+        sum(node_sizes[i] for i in units if i >= width)
+
+    headers = []
+    for i, node in enumerate(nodes[:width]):
+        if node in sizes and not _is_header(node):
+            continue
+        headers.append(HeaderCost(node, node_sizes[i], preprocessed_sizes[i],
+                                  len(parents[i]), unit_counts[i],
+                                  unit_counts[i] * preprocessed_sizes[i],
+                                  node not in sizes))
+    return Report(len(units), total_size, headers)
+
+
+def pch_candidates(report, limit=25, min_units=2):
+    # The headers that cost the most, worth precompiling
+    headers = [header for header in report.headers
+               if header.units >= min_units and not header.external]
+    headers.sort(key=lambda header: (-header.cost, header.header))
+    return headers[:limit]
+
+
+def fan_in(report, limit=25, external=False):
+    # The headers included directly by the most files
+    headers = [header for header in report.headers
+               if header.external == external and header.includers]
+    headers.sort(key=lambda header: (-header.includers, -header.units,
+                                     header.header))
+    return headers[:limit]
+
+
+def _display_name(path, folders):
+    for folder in folders:
+        folder = os.path.join(folder, "")
+        if path.startswith(folder):
+            return path[len(folder):]
+    return path
+
+
+def format_report(report, folders=(), limit=25):
+    kb = 1024.0
+    lines = [
+        "Include hotspots: {} translation unit(s), {} header(s), "
+        "{:.1f} MB preprocessed (approximate)".format(
+            report.units, sum(1 for h in report.headers if not h.external),
+            report.preprocessed_size / kb / kb),
+        "",
+        "Precompiled header candidates, cost is the preprocessed size times "
+        "the translation units including it",
+        "{:>8} {:>10} {:>10} {:>10}  {}".format(
+            "units", "size KB", "pp KB", "cost MB", "header"),
+    ]
+    for h in pch_candidates(report, limit):
+        lines.append("{:>8} {:>10.1f} {:>10.1f} {:>10.1f}  {}".format(
+            h.units, h.size / kb, h.preprocessed_size / kb,
+            h.cost / kb / kb, _display_name(h.header, folders)))
+
+    lines += ["", "Worst fan-in, files including the header directly",
+              "{:>8} {:>8} {:>10}  {}".format("files", "units", "pp KB",
+                                              "header")]
+    for h in fan_in(report, limit):
+        lines.append("{:>8} {:>8} {:>10.1f}  {}".format(
+            h.includers, h.units, h.preprocessed_size / kb,
+            _display_name(h.header, folders)))
+
+    lines += ["", "Most included external headers",
+              "{:>8} {:>8}  {}".format("files", "units", "header")]
+    for h in fan_in(report, limit, external=True):
+        lines.append("{:>8} {:>8}  {}".format(h.includers, h.units,
+                                              h.header))
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,68 @@
+import os
+from . import lazy
+
+INCLUDE_RE = lazy.compile(r'^\s*#\s*include\s*([<"])([^>"]+)[>"]')
+
+
+def scan_lines(lines):
+    # Returns [(name, quoted)] for every #include directive in lines
+    includes = []
+    for line in lines:
+        if "include" not in line:
+            continue
+        m = INCLUDE_RE.match(line)
+        if m is not None:
+            includes.append((m.group(2), m.group(1) == '"'))
+    return includes
+
+
+def scan_includes(filename):
+    try:
+        with open(filename, "r", errors="replace") as f:
+            return scan_lines(f)
+    except OSError:
+        return []
+
+
+def resolve_include(name, from_dir, include_dirs, quoted=True):
+    search_dirs = [from_dir] + list(include_dirs) if quoted \
+        else include_dirs
+    for directory in search_dirs:
+        candidate = os.path.normpath(os.path.join(directory, name))
+        if os.path.isfile(candidate):
+            return candidate
+    return None
+
+
+def include_dirs_from_flags(flags, base_dir):
+    include_dirs = []
+    flags = list(flags)
+    for i, flag in enumerate(flags):
+        directory = None
+        if flag in ("-I", "-isystem") and i + 1 < len(flags):
+            directory = flags[i + 1]
+        elif flag.startswith("-I") and len(flag) > 2:
+            directory = flag[2:]
+        elif flag.startswith("-isystem") and len(flag) > len("-isystem"):
+            directory = flag[len("-isystem"):]
+
+        if directory:
+            include_dirs.append(os.path.normpath(
+                os.path.join(base_dir, directory.strip('"'))))
+    return include_dirs
+
+
+def transitive_includes(filename, include_dirs, scan=scan_includes):
+    # All files reachable through #include, excluding unresolved ones
+    seen = set()
+    pending = [filename]
+    while pending:
+        current = pending.pop()
+        from_dir = os.path.dirname(current)
+        for name, quoted in scan(current):
+            resolved = resolve_include(name, from_dir, include_dirs, quoted)
+            if resolved is not None and resolved not in seen \
+                    and resolved != filename:
+                seen.add(resolved)
+                pending.append(resolved)
+    return sorted(seen)
@@ -0,0 +1,56 @@
+import importlib
+import re
+
+
+class LazyModule:
+    """Stands in for a module, which is imported on first attribute access.
+
+    Attributes are looked up on the module every time, so patching the
+    module in tests works as usual.
+    """
+
+    def __init__(self, name, package=None):
+        self._name = name
+        self._package = package
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = importlib.import_module(self._name, self._package)
+        return getattr(self._module, attr)
+
+    def __repr__(self):
+        return "<lazy module {!r}>".format(self._name)
+
+
+class LazyPattern:
+    """A regular expression that is compiled the first time it is used.
+
+    The methods of the compiled pattern are stored on the instance on first
+    access, further calls cost no more than with the compiled pattern.
+    """
+
+    def __init__(self, pattern, flags=0):
+        self.pattern = pattern
+        self.flags = flags
+        self._compiled = None
+
+    def __getattr__(self, attr):
+        if attr.startswith("__"):
+            raise AttributeError(attr)
+        if self._compiled is None:
+            self._compiled = re.compile(self.pattern, self.flags)
+        value = getattr(self._compiled, attr)
+        setattr(self, attr, value)
+        return value
+
+    def __repr__(self):
+        return "<lazy pattern {!r}>".format(self.pattern)
+
+
+def import_module(name, package=None):
+    return LazyModule(name, package)
+
+
+def compile(pattern, flags=0):
+    return LazyPattern(pattern, flags)
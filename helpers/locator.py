@@ -1,5 +1,6 @@
 import glob
 import os
+from .telemetry import timed
 
 
 def _get_vs_project_dir(root_dir, relative_bld_dir):
@@ -19,6 +20,21 @@ def _get_project_files(filename):
     return project_files
 
 
+def get_project_dirs(filename):
+    # The directories a project lookup for filename depends on
+    dirname = os.path.dirname(filename)
+    bld_dirs = [os.path.join(dirname, "..", "bld")]
+    if "fos" in filename.lower():
+        bld_dirs.append(os.path.join(dirname, "..", "..", "Futil", "bld"))
+
+    project_dirs = []
+    for bld_dir in bld_dirs:
+        project_dirs.append(os.path.join(bld_dir, "VS2017"))
+        project_dirs.append(os.path.join(bld_dir, "VS2015"))
+    return project_dirs
+
+
+@timed("locator.get_vc_test_project")
 def get_vc_test_project(filename):
     if "fos" in filename.lower():
         dirname = os.path.dirname(filename)
@@ -41,6 +57,7 @@ def get_vc_test_project(filename):
     return None
 
 
+@timed("locator.get_vc_project")
 def get_vc_project(filename):
     if filename.endswith("Tester.cpp"):
         return get_vc_test_project(filename)
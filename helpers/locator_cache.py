@@ -0,0 +1,139 @@
+import json
+import logging
+import os
+import threading
+from . import locator
+from .telemetry import timed
+
+
+def _stamp(directories):
+    stamp = []
+    for directory in directories:
+        try:
+            stamp.append([directory, os.stat(directory).st_mtime])
+        except OSError:
+            stamp.append([directory, None])
+    return stamp
+
+
+class LocatorCache:
+    """Caches the locator lookups per source file.
+
+    An entry stays valid as long as the modification times of the bld
+    directories the lookup depends on are unchanged. Adding or removing a
+    project file changes the directory mtime and thereby invalidates it.
+    """
+    max_entries = 10000
+
+    def __init__(self, cache_file=None):
+        self.cache_file = cache_file
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._projects = {}
+        self._test_projects = {}
+        self._testers = {}
+        self._dirty = False
+        self.load()
+
+    @timed("locator_cache.get_vc_project")
+    def get_vc_project(self, filename):
+        return self._lookup(self._projects, filename, locator.get_vc_project)
+
+    @timed("locator_cache.get_vc_test_project")
+    def get_vc_test_project(self, filename):
+        return self._lookup(self._test_projects, filename,
+                            locator.get_vc_test_project)
+
+    def get_tester_and_working_dir(self, project_file):
+        with self._lock:
+            cached = self._testers.get(project_file)
+            if cached is not None:
+                self.hits += 1
+                return tuple(cached)
+            self.misses += 1
+
+        tester, working_dir = locator.get_tester_and_working_dir(project_file)
+        with self._lock:
+            self._testers[project_file] = [tester, working_dir]
+            self._dirty = True
+        return tester, working_dir
+
+    def _lookup(self, entries, filename, resolve):
+        stamp = _stamp(locator.get_project_dirs(filename))
+        with self._lock:
+            entry = entries.get(filename)
+            if entry is not None and entry["stamp"] == stamp:
+                self.hits += 1
+                return entry["project"]
+            self.misses += 1
+
+        project_file = resolve(filename)
+
+        # Without any bld directory there is nothing to validate a cached
+        # entry against, so only remember lookups that can be invalidated.
+        if any(mtime is not None for _, mtime in stamp):
+            with self._lock:
+                if len(entries) >= self.max_entries:
+                    entries.pop(next(iter(entries)))
+                entries[filename] = {"stamp": stamp, "project": project_file}
+                self._dirty = True
+        return project_file
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._projects) + len(self._test_projects),
+            }
+
+    def clear(self):
+        with self._lock:
+            self._projects.clear()
+            self._test_projects.clear()
+            self._testers.clear()
+            self.hits = 0
+            self.misses = 0
+            self._dirty = True
+
+    def load(self):
+        if not self.cache_file or not os.path.exists(self.cache_file):
+            return
+
+        try:
+            with open(self.cache_file, "r") as f:
+                data = json.load(f)
+            self._projects = data.get("projects", {})
+            self._test_projects = data.get("test_projects", {})
+            self._testers = data.get("testers", {})
+        except (OSError, ValueError) as e:
+            logging.warning("Discarding locator cache {}: {}"
+                            .format(self.cache_file, e))
+
+    def save(self):
+        if not self.cache_file:
+            return
+
+        with self._lock:
+            if not self._dirty:
+                return
+            data = {
+                "projects": self._projects,
+                "test_projects": self._test_projects,
+                "testers": self._testers,
+            }
+            text = json.dumps(data)
+            self._dirty = False
+
+        try:
+            os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
+            temp_file = self.cache_file + ".tmp"
+            with open(temp_file, "w") as f:
+                f.write(text)
+            os.replace(temp_file, self.cache_file)
+        except OSError as e:
+            logging.warning("Could not write locator cache {}: {}"
+                            .format(self.cache_file, e))
@@ -0,0 +1,202 @@
+"""Converts old style gmock MOCK_METHODn declarations to MOCK_METHOD.
+
+Usable from Sublime (see UpdateMockCommand) and from the command line, run
+from the package directory:
+
+    python -m helpers.mock_updater [--dry-run] [--jobs N] PATH...
+"""
+import argparse
+import difflib
+import re
+import sys
+from . import batch
+from . import cpp_lexer
+from . import lazy
+from .telemetry import timed
+
+OLD_MOCK_RE = lazy.compile(r"MOCK_(CONST_)?METHOD\d+(_T)?\b")
+PARENTHESES = {"(": 1, "[": 1, "{": 1, ")": -1, "]": -1, "}": -1}
+
+
+def cleanup_declaration(mock_declaration):
+    mock_declaration = mock_declaration.replace("\n", "")
+    mock_declaration = mock_declaration.replace("\r", "")
+    mock_declaration = re.sub(r"\s+", " ", mock_declaration)
+
+    return mock_declaration
+
+
+def _needs_parentheses(tokens):
+    # MOCK_METHOD splits its arguments at commas outside of parentheses,
+    # e.g. the one in std::map<int, int>
+    depth = 0
+    for token in tokens:
+        if token.kind == cpp_lexer.PUNCT:
+            if token.text == "," and depth == 0:
+                return True
+            depth += PARENTHESES.get(token.text, 0)
+    return False
+
+
+def _protect(tokens, text):
+    joined = cpp_lexer.join_tokens(tokens, text)
+    return "(" + joined + ")" if _needs_parentheses(tokens) else joined
+
+
+def parenthesize_arguments(arguments):
+    tokens = cpp_lexer.tokenize(arguments)
+    if not tokens:
+        return ""
+
+    return ", ".join(_protect(arg, arguments)
+                     for arg in cpp_lexer.split_top_level(tokens))
+
+
+def update_mock_method(mock_declaration):
+    return _convert_mock(cpp_lexer.tokenize(mock_declaration), mock_declaration)
+
+
+def _convert_mock(tokens, text):
+    if len(tokens) < 2 or not OLD_MOCK_RE.match(tokens[0].text) or \
+            tokens[1].text != "(":
+        return None
+
+    close = cpp_lexer.find_closing(tokens, 1)
+    if close is None:
+        return None
+
+    parts = cpp_lexer.split_top_level(tokens[2:close])
+    if len(parts) != 2 or len(parts[0]) != 1 or \
+            parts[0][0].kind != cpp_lexer.IDENTIFIER:
+        return None
+
+    # The signature is 'return_type(arguments)'
+    name, signature = parts[0][0].text, parts[1]
+    if not signature or signature[-1].text != ")":
+        return None
+    open_args = cpp_lexer.find_opening(signature, len(signature) - 1)
+    if not open_args:
+        return None
+
+    ret = _protect(signature[:open_args], text)
+    args = signature[open_args + 1:-1]
+    args = ", ".join(_protect(arg, text)
+                     for arg in cpp_lexer.split_top_level(args)) if args else ""
+    qualifiers = "const, override" if "_CONST_" in tokens[0].text else "override"
+    return "MOCK_METHOD ({}, {}, ({}), ({}));".format(ret, name, args,
+                                                      qualifiers)
+
+
+def find_old_mocks(text, lexer=None):
+    # Yields (begin, end, tokens) of every old style mock declaration
+    lexer = lexer or cpp_lexer.CppLexer(text)
+    pos = 0
+    while True:
+        m = OLD_MOCK_RE.search(text, pos)
+        if m is None:
+            return
+
+        pos = m.end()
+        if not lexer.is_code(m.start()):
+            continue
+
+        depth = 0
+        tokens = []
+        for token in lexer.tokens(m.start()):
+            tokens.append(token)
+            if token.kind != cpp_lexer.PUNCT:
+                continue
+            depth += PARENTHESES.get(token.text, 0)
+            if depth == 0 and token.text == ";":
+                yield m.start(), token.end, tokens
+                pos = token.end
+                break
+            if depth < 0:
+                break
+
+
+@timed("mock_updater.compute_replacements")
+def compute_replacements(text, lexer=None):
+    replacements = []
+    for begin, end, tokens in find_old_mocks(text, lexer):
+        replacement = _convert_mock(tokens, text)
+        if replacement is not None:
+            replacements.append((begin, end, replacement))
+    return replacements
+
+
+def apply_replacements(text, replacements):
+    pieces = []
+    pos = 0
+    for begin, end, replacement in replacements:
+        pieces.append(text[pos:begin])
+        pieces.append(replacement)
+        pos = end
+    pieces.append(text[pos:])
+    return "".join(pieces)
+
+
+def update_text(text):
+    return apply_replacements(text, compute_replacements(text))
+
+
+def convert_file(filename, dry_run=False):
+    # Returns (filename, number of converted mocks, unified diff)
+    with open(filename, "r", encoding="utf-8", errors="surrogateescape",
+              newline="") as f:
+        text = f.read()
+
+    replacements = compute_replacements(text)
+    if not replacements:
+        return filename, 0, ""
+
+    new_text = apply_replacements(text, replacements)
+    diff = "".join(difflib.unified_diff(text.splitlines(True),
+                                        new_text.splitlines(True),
+                                        filename, filename))
+    if not dry_run:
+        with open(filename, "w", encoding="utf-8", errors="surrogateescape",
+                  newline="") as f:
+            f.write(new_text)
+
+    return filename, len(replacements), diff
+
+
+def _convert_file_task(args):
+    return convert_file(*args)
+
+
+def convert_tree(paths, dry_run=False, jobs=None):
+    # Converts every source file under paths using a pool of worker
+    # processes, yields the convert_file result of each changed file
+    tasks = [(filename, dry_run) for filename in batch.find_sources(paths)]
+    for result in batch.map_unordered(_convert_file_task, tasks, jobs):
+        if result[1]:
+            yield result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("paths", nargs="+")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="print a diff instead of writing the files")
+    parser.add_argument("--jobs", type=int, default=None,
+                        help="number of worker processes (default: all cores)")
+    options = parser.parse_args(argv)
+
+    files = 0
+    mocks = 0
+    for filename, count, diff in convert_tree(options.paths, options.dry_run,
+                                              options.jobs):
+        files += 1
+        mocks += count
+        if options.dry_run:
+            sys.stdout.write(diff)
+
+    sys.stderr.write("{} mock(s) in {} file(s) {}\n".format(
+        mocks, files, "to convert" if options.dry_run else "converted"))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
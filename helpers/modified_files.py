@@ -0,0 +1,130 @@
+import json
+import logging
+import os
+import subprocess
+import threading
+import time
+from . import batch
+from .telemetry import timed
+
+SOURCE_EXTENSIONS = (".cpp", ".cc", ".cxx", ".c")
+
+
+def parse_git_status(output):
+    # Paths from 'git status --porcelain -z' output, renames and copies are
+    # followed by their original path which is skipped
+    paths = []
+    records = iter(output.split("\0"))
+    for record in records:
+        if len(record) < 4:
+            continue
+        status, path = record[:2], record[3:]
+        if "R" in status or "C" in status:
+            next(records, None)
+        if "D" not in status:
+            paths.append(path)
+    return paths
+
+
+def git_status_files(root):
+    # Absolute paths of the changed and untracked files below root, None
+    # when root is not in a git work tree
+    try:
+        top = subprocess.check_output(
+            ["git", "rev-parse", "--show-toplevel"], cwd=root,
+            stderr=subprocess.STDOUT).decode().strip()
+        output = subprocess.check_output(
+            ["git", "status", "--porcelain", "-z", "--untracked-files=all",
+             "--", root], cwd=top, stderr=subprocess.STDOUT)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+    return [os.path.normpath(os.path.join(top, path))
+            for path in parse_git_status(output.decode(errors="replace"))]
+
+
+class CompileStamps:
+    """The modification time of every source file at its last successful
+    compile.
+
+    Files without a stamp count as modified when git reports them, or, for
+    folders outside of git, when they changed after the stamps were
+    created.
+    """
+
+    def __init__(self, filename=None):
+        self.filename = filename
+        self._lock = threading.Lock()
+        self._stamps = {}
+        self.since = time.time()
+        if filename and os.path.exists(filename):
+            try:
+                with open(filename, "r") as f:
+                    data = json.load(f)
+                self._stamps = data["stamps"]
+                self.since = data["since"]
+            except (OSError, ValueError, KeyError) as e:
+                logging.warning("Discarding compile stamps {}: {}"
+                                .format(filename, e))
+
+    def is_modified(self, filename):
+        with self._lock:
+            stamp = self._stamps.get(filename)
+        try:
+            return os.path.getmtime(filename) != stamp
+        except OSError:
+            return False
+
+    def snapshot(self, files):
+        # The current mtimes, to be marked once the compile succeeded
+        snapshot = {}
+        for filename in files:
+            try:
+                snapshot[filename] = os.path.getmtime(filename)
+            except OSError:
+                pass
+        return snapshot
+
+    def mark(self, snapshot):
+        with self._lock:
+            self._stamps.update(snapshot)
+
+    def save(self):
+        if not self.filename:
+            return
+        with self._lock:
+            text = json.dumps({"since": self.since, "stamps": self._stamps})
+        os.makedirs(os.path.dirname(self.filename), exist_ok=True)
+        with open(self.filename, "w") as f:
+            f.write(text)
+
+
+@timed("modified_files.modified_sources")
+def modified_sources(roots, stamps):
+    files = set()
+    for root in roots:
+        changed = git_status_files(root)
+        if changed is None:
+            changed = []
+            for filename in batch.find_sources([root], SOURCE_EXTENSIONS):
+                try:
+                    if os.path.getmtime(filename) > stamps.since:
+                        changed.append(filename)
+                except OSError:
+                    pass
+
+        files.update(filename for filename in changed
+                     if filename.lower().endswith(SOURCE_EXTENSIONS))
+
+    return sorted(filename for filename in files
+                  if stamps.is_modified(filename))
+
+
+def group_by_project(files, get_project):
+    # {project file: [files]}, files without a project are left out
+    projects = {}
+    for filename in files:
+        project_file = get_project(filename)
+        if project_file:
+            projects.setdefault(project_file, []).append(filename)
+    return projects
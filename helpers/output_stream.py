@@ -0,0 +1,60 @@
+import codecs
+import threading
+
+
+class OutputStream:
+    """Decodes process output incrementally and coalesces writes.
+
+    Bytes are fed as they are read from the child process. A multibyte
+    character split over two reads is completed by the incremental
+    decoder instead of failing the stream. Decoded text is gathered and
+    handed to write at most once per interval (in milliseconds). observe
+    gets every piece of text right away, on the thread that feeds it.
+    """
+
+    def __init__(self, write, schedule, encoding="utf-8", interval=50,
+                 observe=None):
+        self._write = write
+        self._observe = observe
+        self._schedule = schedule
+        self._interval = interval
+        self._decoder = codecs.getincrementaldecoder(encoding)(
+            errors="replace")
+        self._lock = threading.Lock()
+        self._pending = []
+        self._flush_scheduled = False
+
+    def feed(self, data):
+        text = self._decoder.decode(data)
+        if text:
+            self._append(text)
+
+    def write(self, text):
+        # For already decoded text, e.g. merged from several processes
+        if text:
+            self._append(text)
+
+    def close(self, trailer=""):
+        text = self._decoder.decode(b"", final=True) + trailer
+        if text:
+            self._append(text)
+
+    def _append(self, text):
+        with self._lock:
+            if self._observe is not None:
+                self._observe(text.replace("\r", ""))
+            self._pending.append(text)
+            if self._flush_scheduled:
+                return
+            self._flush_scheduled = True
+
+        self._schedule(self.flush, self._interval)
+
+    def flush(self):
+        with self._lock:
+            text = "".join(self._pending)
+            self._pending = []
+            self._flush_scheduled = False
+
+        if text:
+            self._write(text.replace("\r", ""))
@@ -0,0 +1,135 @@
+import logging
+import os
+import threading
+from . import lazy
+from .telemetry import timed
+
+ElementTree = lazy.import_module("xml.etree.ElementTree")
+
+SOURCE_ITEMS = ("ClCompile", "ClInclude")
+SKIPPED_DIRS = (".git", ".svn", ".vs", "node_modules")
+
+
+def _normalize(path):
+    return os.path.normcase(os.path.abspath(path))
+
+
+def _local_name(tag):
+    # Strip the MSBuild xml namespace, '{ns}ClCompile' -> 'ClCompile'
+    return tag.rsplit("}", 1)[-1]
+
+
+def parse_project_sources(project_file):
+    project_dir = os.path.dirname(project_file)
+    sources = []
+    for _, element in ElementTree.iterparse(project_file):
+        if _local_name(element.tag) in SOURCE_ITEMS:
+            include = element.get("Include")
+            # Items using MSBuild properties or wildcards cannot be resolved
+            # without evaluating the project, skip them
+            if include and "$(" not in include and "*" not in include:
+                include = include.replace("\\", os.sep)
+                sources.append(_normalize(os.path.join(project_dir, include)))
+        element.clear()
+
+    return sources
+
+
+def find_project_files(folders):
+    for folder in folders:
+        for dirpath, dirnames, filenames in os.walk(folder):
+            dirnames[:] = [d for d in dirnames if d not in SKIPPED_DIRS]
+            for filename in filenames:
+                if filename.endswith(".vcxproj"):
+                    yield os.path.join(dirpath, filename)
+
+
+class ProjectIndex:
+    """Maps source files to the .vcxproj files that compile or include them.
+
+    The index is built from the ClCompile and ClInclude items of every
+    project file found under the given folders. Updating is incremental,
+    only project files with a changed mtime are parsed again.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._projects = {}  # project file -> (mtime, sources)
+        self._owners = {}  # normalized source file -> [project files]
+        self.ready = False
+
+    def get_projects(self, filename):
+        with self._lock:
+            return list(self._owners.get(_normalize(filename), ()))
+
+    def get_vc_project(self, filename):
+        if filename.endswith("Tester.cpp"):
+            return self.get_vc_test_project(filename)
+
+        for project_file in self.get_projects(filename):
+            if not project_file.endswith("Tester.vcxproj"):
+                return project_file
+        return None
+
+    def get_vc_test_project(self, filename):
+        for project_file in self.get_projects(filename):
+            if project_file.endswith("Tester.vcxproj"):
+                return project_file
+        return None
+
+    @timed("project_index.update")
+    def update(self, folders):
+        with self._refresh_lock:
+            found = {}
+            for project_file in find_project_files(folders):
+                try:
+                    found[project_file] = os.stat(project_file).st_mtime
+                except OSError:
+                    continue
+
+            with self._lock:
+                projects = dict(self._projects)
+
+            changed = False
+            for project_file in list(projects):
+                if project_file not in found:
+                    del projects[project_file]
+                    changed = True
+
+            for project_file, mtime in found.items():
+                known = projects.get(project_file)
+                if known is not None and known[0] == mtime:
+                    continue
+
+                try:
+                    sources = parse_project_sources(project_file)
+                except (OSError, ElementTree.ParseError) as e:
+                    logging.warning("Cannot index {}: {}"
+                                    .format(project_file, e))
+                    sources = []
+                projects[project_file] = (mtime, sources)
+                changed = True
+
+            if changed or not self.ready:
+                owners = {}
+                for project_file in sorted(projects):
+                    for source in projects[project_file][1]:
+                        owners.setdefault(source, []).append(project_file)
+
+                with self._lock:
+                    self._projects = projects
+                    self._owners = owners
+                    self.ready = True
+
+            return changed
+
+    def update_async(self, folders):
+        # A refresh that is already running will pick up the changes
+        if self._refresh_lock.locked():
+            return None
+
+        thread = threading.Thread(target=self.update, args=(list(folders),))
+        thread.daemon = True
+        thread.start()
+        return thread
@@ -0,0 +1,158 @@
+import json
+import logging
+import os
+import threading
+from . import include_scanner, lazy
+
+hashlib = lazy.import_module("hashlib")
+
+
+class ResultCache:
+    """On-disk, content addressed store for clang-tidy results.
+
+    Entries are keyed by a hash of the arguments and of the contents of the
+    source file and everything it includes. The least recently used entries
+    are evicted once the total size exceeds max_bytes.
+    """
+
+    def __init__(self, cache_dir, max_bytes=256 * 2 ** 20):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._files = {}  # path -> ((mtime, size), digest, includes)
+        self._sizes = {}
+        os.makedirs(cache_dir, exist_ok=True)
+        for name in os.listdir(cache_dir):
+            try:
+                self._sizes[name] = \
+                    os.path.getsize(os.path.join(cache_dir, name))
+            except OSError:
+                pass
+
+    def _file(self, filename):
+        # (stamp, content digest, includes) of filename, read again only
+        # when its modification time or size changed
+        try:
+            stat = os.stat(filename)
+        except OSError:
+            with self._lock:
+                self._files.pop(filename, None)
+            raise
+
+        stamp = (stat.st_mtime, stat.st_size)
+        with self._lock:
+            memo = self._files.get(filename)
+        if memo is not None and memo[0] == stamp:
+            return memo
+
+        with open(filename, "rb") as f:
+            data = f.read()
+        memo = (stamp, hashlib.sha1(data).hexdigest(),
+                include_scanner.scan_lines(
+                    data.decode("utf-8", "replace").splitlines()))
+        with self._lock:
+            # Replaces the memo of the previous contents
+            self._files[filename] = memo
+        return memo
+
+    def file_digest(self, filename):
+        return self._file(filename)[1]
+
+    def _scan(self, filename):
+        try:
+            return self._file(filename)[2]
+        except OSError:
+            return []
+
+    def fingerprint(self, filename, args, cwd):
+        """Returns the key of the result and the (path, stamp) of every file
+        it depends on, see unchanged().
+        """
+        flags = args[args.index("--") + 1:] if "--" in args else []
+        include_dirs = include_scanner.include_dirs_from_flags(flags, cwd)
+
+        h = hashlib.sha1(json.dumps(args).encode())
+        stamps = []
+        for path in [filename] + include_scanner.transitive_includes(
+                filename, include_dirs, self._scan):
+            stamp, digest, _ = self._file(path)
+            h.update(path.encode())
+            h.update(digest.encode())
+            stamps.append((path, stamp))
+        return h.hexdigest(), stamps
+
+    def key(self, filename, args, cwd):
+        return self.fingerprint(filename, args, cwd)[0]
+
+    @staticmethod
+    def unchanged(stamps):
+        # Whether none of the files changed since their fingerprint, e.g.
+        # by a clang-tidy run that applied fixes
+        for path, stamp in stamps:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                return False
+            if (stat.st_mtime, stat.st_size) != stamp:
+                return False
+        return True
+
+    def get(self, key):
+        path = os.path.join(self.cache_dir, key)
+        try:
+            with open(path, "r") as f:
+                entry = json.load(f)
+            os.utime(path, None)  # Mark as recently used
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+        return entry
+
+    def put(self, key, entry):
+        path = os.path.join(self.cache_dir, key)
+        text = json.dumps(entry)
+        try:
+            with open(path, "w") as f:
+                f.write(text)
+        except OSError as e:
+            logging.warning("Cannot write clang-tidy cache entry: {}"
+                            .format(e))
+            return
+
+        with self._lock:
+            self._sizes[key] = len(text)
+        self.evict()
+
+    def evict(self):
+        with self._lock:
+            total = sum(self._sizes.values())
+            if total <= self.max_bytes:
+                return
+            keys = list(self._sizes)
+
+        def last_used(key):
+            try:
+                return os.path.getmtime(os.path.join(self.cache_dir, key))
+            except OSError:
+                return 0
+
+        for key in sorted(keys, key=last_used):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.cache_dir, key))
+            except OSError:
+                pass
+            with self._lock:
+                total -= self._sizes.pop(key, 0)
+
+    def hit_rate(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return self.hits / lookups if lookups else 0.0
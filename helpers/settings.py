@@ -1,15 +1,197 @@
 import sublime
 import json
 import logging
+import os
+import threading
+from collections import namedtuple
+from . import lazy
 
+subprocess = lazy.import_module("subprocess")
+
+SETTINGS_FILE = "Moog.sublime-settings"
+
+Setting = namedtuple("Setting", "type default")
+
+# Every setting with its type and default, see Moog.sublime-settings
+SCHEMA = {
+    "solution_file": Setting(str, ""),
+    "clang_tidy_jobs": Setting(int, 0),
+    "clang_tidy_cache_size_mb": Setting(int, 256),
+    "test_shards": Setting(int, 0),
+    "build_jobs": Setting(int, 2),
+    "build_backend": Setting(str, "msbuild"),
+    "build_parallelism": Setting(int, 0),
+    "build_timings": Setting(bool, False),
+    "compile_on_save": Setting(bool, False),
+    "compile_on_save_delay_ms": Setting(int, 1000),
+    "msbuild": Setting(dict, {}),
+}
+
+# Only used where they exist, discovered installations and the "msbuild"
+# setting take precedence
+DEFAULT_MSBUILD = {
+    "VS2015": r"C:\Program Files (x86)\MSBuild\14.0\Bin\amd64\MSBuild.exe",
+    "VS2017": r"C:\Program Files (x86)\Microsoft Visual Studio\2017\Professional\MSBuild\15.0\Bin\MSBuild.exe"
+}
+
+VS_VERSIONS = {"15": "VS2017", "16": "VS2019", "17": "VS2022"}
+MSBUILD_BIN_DIRS = (("MSBuild", "Current", "Bin"), ("MSBuild", "15.0", "Bin"))
+
+_MISSING = object()
+
+
+def _is_valid(value, setting):
+    # bool is an int, but a flag is no count
+    if setting.type is int and isinstance(value, bool):
+        return False
+    return isinstance(value, setting.type)
+
+
+def discover_msbuild(run=None, isfile=os.path.isfile):
+    """Returns {'VS2019': path to MSBuild.exe, ...} of the Visual Studio
+    installations vswhere knows about.
+    """
+    if run is None:
+        run = subprocess.check_output
+    found = {}
+    program_files = os.environ.get("ProgramFiles(x86)",
+                                   r"C:\Program Files (x86)")
+    vswhere = os.path.join(program_files, "Microsoft Visual Studio",
+                           "Installer", "vswhere.exe")
+    if not isfile(vswhere):
+        return found
 
-def get(key, default):
-    project_settings = sublime.active_window().project_data()
     try:
-        value = project_settings["moog"][key]
-    except KeyError as e:
-        logging.error(e)
-        settings = sublime.load_settings("Moog.sublime-settings")
-        value = settings.get(key, default)
+        output = run([vswhere, "-all", "-products", "*", "-requires",
+                      "Microsoft.Component.MSBuild", "-format", "json"])
+        instances = json.loads(output.decode("utf-8", "replace"))
+    except (OSError, subprocess.CalledProcessError, ValueError) as e:
+        logging.warning("Cannot discover MSBuild: {}".format(e))
+        return found
+
+    for instance in instances:
+        major = str(instance.get("installationVersion", "")).split(".")[0]
+        version = VS_VERSIONS.get(major)
+        if version is None or version in found:
+            continue
+        for bin_dir in MSBUILD_BIN_DIRS:
+            path = os.path.join(instance.get("installationPath", ""),
+                                *bin_dir + ("MSBuild.exe",))
+            if isfile(path):
+                found[version] = path
+                break
+    return found
+
+
+class SettingsService:
+    """Resolves settings from the project's "moog" section first and the
+    package settings second.
+
+    Resolved values are cached until the project or the package settings
+    change, so reading a setting on a hot path is a dictionary lookup.
+    """
+
+    def __init__(self, discover=discover_msbuild, isfile=os.path.isfile):
+        self._lock = threading.Lock()
+        self._discover_lock = threading.Lock()
+        self._discover = discover
+        self._isfile = isfile
+        self._projects = {}  # window id -> "moog" section of the project
+        self._values = {}  # (window id, key) -> typed value
+        self._package = None
+        self._msbuild = None
+
+    def invalidate(self):
+        with self._lock:
+            self._projects = {}
+            self._values = {}
+
+    def _window_id(self, window):
+        return window.id() if window is not None else None
+
+    def _project_settings(self, window):
+        window_id = self._window_id(window)
+        with self._lock:
+            project = self._projects.get(window_id)
+        if project is None:
+            data = window.project_data() if window is not None else None
+            project = data.get("moog") if isinstance(data, dict) else None
+            if not isinstance(project, dict):
+                project = {}
+            with self._lock:
+                self._projects[window_id] = project
+        return project
+
+    def _package_settings(self):
+        package = sublime.load_settings(SETTINGS_FILE)
+        if package is not self._package:
+            # Edits of the package or user settings invalidate the cache
+            package.clear_on_change("moog")
+            package.add_on_change("moog", self.invalidate)
+            self._package = package
+        return package
+
+    def get(self, key, default, window=None):
+        # The raw value, not cached and not checked against the schema
+        if window is None:
+            window = sublime.active_window()
+        value = self._project_settings(window).get(key, _MISSING)
+        if value is _MISSING:
+            value = self._package_settings().get(key, default)
+        return value
+
+    def value(self, key, window=None):
+        setting = SCHEMA[key]
+        if window is None:
+            window = sublime.active_window()
+        cache_key = (self._window_id(window), key)
+        with self._lock:
+            value = self._values.get(cache_key, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        value = self.get(key, setting.default, window)
+        if not _is_valid(value, setting):
+            logging.warning("Ignoring setting {} = {!r}, expected {}"
+                            .format(key, value, setting.type.__name__))
+            value = setting.default
+
+        with self._lock:
+            self._values[cache_key] = value
+        return value
+
+    def _discovered_msbuild(self):
+        # Runs once per session, callers during discovery wait for it
+        with self._discover_lock:
+            if self._msbuild is None:
+                found = dict((version, path)
+                             for version, path in DEFAULT_MSBUILD.items()
+                             if self._isfile(path))
+                found.update(self._discover())
+                self._msbuild = found
+            return self._msbuild
+
+    def msbuild(self, window=None):
+        # The setting is applied on top of the installations
+        paths = dict(self._discovered_msbuild())
+        paths.update(self.value("msbuild", window))
+        return paths
+
+
+service = SettingsService()
+
+
+def get(key, default):
+    return service.get(key, default)
+
+
+def value(key, window=None):
+    return service.value(key, window)
+
+
+def msbuild(window=None):
+    return service.msbuild(window)
+
 
-    return value
+def invalidate():
+    service.invalidate()
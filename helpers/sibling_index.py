@@ -0,0 +1,183 @@
+import os
+import threading
+from .project_index import SKIPPED_DIRS
+from .telemetry import timed
+
+HEADER = "header"
+SOURCE = "source"
+TESTER = "tester"
+ROLES = (HEADER, SOURCE, TESTER)
+
+HEADER_EXTENSIONS = (".h", ".hh", ".hpp", ".hxx")
+SOURCE_EXTENSIONS = (".cpp", ".cc", ".cxx", ".c")
+TESTER_SUFFIX = "Tester"
+
+
+def classify(filename):
+    # Returns (class name, role) following the Foo.h, Foo.cpp and
+    # FooTester.cpp convention, or None for other files
+    stem, extension = os.path.splitext(os.path.basename(filename))
+    extension = extension.lower()
+    if extension in HEADER_EXTENSIONS:
+        return stem, HEADER
+    if extension in SOURCE_EXTENSIONS:
+        if stem.endswith(TESTER_SUFFIX) and len(stem) > len(TESTER_SUFFIX):
+            return stem[:-len(TESTER_SUFFIX)], TESTER
+        return stem, SOURCE
+    return None
+
+
+def _shared_depth(a, b):
+    depth = 0
+    for x, y in zip(a.split(os.sep), b.split(os.sep)):
+        if x != y:
+            break
+        depth += 1
+    return depth
+
+
+class SiblingIndex:
+    """Finds the header, source and tester of a class.
+
+    Every directory under the folders is listed once, after that an update
+    only lists the directories whose mtime changed, which is where files
+    were added, removed or renamed. Lookups are dictionary accesses.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._dirs = {}  # directory -> (mtime, subdirectories, files)
+        self._classes = {}  # normcased class name -> {role: [paths]}
+        self._names = {}  # normcased class name -> class name
+        self.ready = False
+
+    def siblings(self, filename):
+        # {role: path} of the class of filename, nearest files first
+        classified = classify(filename)
+        if classified is None:
+            return {}
+
+        name, _ = classified
+        with self._lock:
+            roles = self._classes.get(os.path.normcase(name), {})
+            roles = dict((role, list(paths)) for role, paths in roles.items())
+        if not roles:
+            return {}
+
+        filename = os.path.abspath(filename)
+        return dict((role, paths[0] if len(paths) == 1 else
+                     max(paths, key=lambda p: _shared_depth(p, filename)))
+                    for role, paths in roles.items() if paths)
+
+    def sibling(self, filename, role):
+        return self.siblings(filename).get(role)
+
+    def next_sibling(self, filename):
+        # The next existing file in header, source, tester order
+        classified = classify(filename)
+        if classified is None:
+            return None
+
+        siblings = self.siblings(filename)
+        index = ROLES.index(classified[1])
+        for offset in range(1, len(ROLES)):
+            path = siblings.get(ROLES[(index + offset) % len(ROLES)])
+            if path is not None:
+                return path
+        return None
+
+    def classes(self):
+        # [(class name, {role: [paths]})] sorted by name
+        with self._lock:
+            return sorted((self._names[key], dict(roles))
+                          for key, roles in self._classes.items())
+
+    def _add(self, path):
+        name, role = classify(path)
+        key = os.path.normcase(name)
+        self._names.setdefault(key, name)
+        self._classes.setdefault(key, {}).setdefault(role, []).append(path)
+
+    def _remove(self, path):
+        name, role = classify(path)
+        key = os.path.normcase(name)
+        roles = self._classes.get(key, {})
+        paths = roles.get(role, [])
+        if path in paths:
+            paths.remove(path)
+        if not paths:
+            roles.pop(role, None)
+        if not roles:
+            self._classes.pop(key, None)
+            self._names.pop(key, None)
+
+    def _list(self, directory):
+        subdirectories = []
+        files = []
+        for entry in os.listdir(directory):
+            path = os.path.join(directory, entry)
+            if classify(entry) is not None:
+                if os.path.isfile(path):
+                    files.append(path)
+            elif entry not in SKIPPED_DIRS and not entry.startswith(".") \
+                    and os.path.isdir(path):
+                subdirectories.append(path)
+        return subdirectories, files
+
+    @timed("sibling_index.update")
+    def update(self, folders):
+        with self._refresh_lock:
+            with self._lock:
+                known = dict(self._dirs)
+
+            dirs = {}
+            added = []
+            removed = []
+            pending = [os.path.abspath(folder) for folder in folders]
+            while pending:
+                directory = pending.pop()
+                if directory in dirs:
+                    continue
+                try:
+                    mtime = os.stat(directory).st_mtime
+                except OSError:
+                    continue
+
+                entry = known.get(directory)
+                if entry is None or entry[0] != mtime:
+                    try:
+                        subdirectories, files = self._list(directory)
+                    except OSError:
+                        continue
+                    old_files = entry[2] if entry is not None else []
+                    removed.extend(set(old_files) - set(files))
+                    added.extend(set(files) - set(old_files))
+                    entry = (mtime, subdirectories, files)
+
+                dirs[directory] = entry
+                pending.extend(entry[1])
+
+            for directory, entry in known.items():
+                if directory not in dirs:
+                    removed.extend(entry[2])
+
+            with self._lock:
+                for path in removed:
+                    self._remove(path)
+                for path in added:
+                    self._add(path)
+                self._dirs = dirs
+                self.ready = True
+
+            return bool(added or removed)
+
+    def update_async(self, folders):
+        # A refresh that is already running will pick up the changes
+        if self._refresh_lock.locked():
+            return None
+
+        thread = threading.Thread(target=self.update, args=(list(folders),))
+        thread.daemon = True
+        thread.start()
+        return thread
@@ -0,0 +1,244 @@
+"""Prefixes standard library identifiers with 'std::'.
+
+Besides the Standardize commands, whole trees can be processed from the
+command line, run from the package directory:
+
+    python -m helpers.standardizer [--dry-run] [--jobs N] PATH...
+"""
+import argparse
+import difflib
+import hashlib
+import json
+import logging
+import os
+import sys
+from . import batch
+from . import cpp_lexer
+from . import lazy
+from .telemetry import timed
+
+STD_NAMES = frozenset([
+    "string",
+    "string_view",
+    "endl",
+    "fstream",
+    "ifstream",
+    "ofstream",
+    "unique_ptr",
+    "shared_ptr",
+])
+
+# Only prefixed when used as a template, 'map<', not 'map'
+STD_TEMPLATES = frozenset([
+    "vector",
+    "map",
+    "list",
+    "set",
+    "pair",
+])
+
+QUALIFIERS = frozenset(["::", ".", "->"])
+
+# Whole words followed by a ';' or '{' on the same line. Only lines with
+# such a candidate are tokenized, the look-ahead on the first letter keeps
+# the scan cheap.
+_WORDS = sorted(STD_NAMES | STD_TEMPLATES, key=len, reverse=True)
+CANDIDATE_RE = lazy.compile(
+    r"(?=[" + "".join(sorted(set(w[0] for w in _WORDS))) + r"])"
+    r"\b(?:" + "|".join(_WORDS) + r")\b[^\n;{]*[;{]"
+)
+
+
+def _line_insertions(tokens):
+    # Only statements and declarations, identified by a ';' or '{' following
+    # the identifier on the same line, are rewritten.
+    if not tokens or tokens[0].text == "#":
+        return
+
+    last_terminator = -1
+    for i, token in enumerate(tokens):
+        if token.kind == cpp_lexer.PUNCT and token.text in (";", "{"):
+            last_terminator = i
+
+    for i in range(last_terminator):
+        token = tokens[i]
+        if token.kind != cpp_lexer.IDENTIFIER:
+            continue
+
+        if token.text in STD_NAMES or (token.text in STD_TEMPLATES and
+                                       tokens[i + 1].text == "<"):
+            if i == 0 or tokens[i - 1].text not in QUALIFIERS:
+                yield token.start
+
+
+def find_insertions(text, lexer=None):
+    # Yields the offsets at which 'std::' has to be inserted, in order
+    lexer = lexer or cpp_lexer.CppLexer(text)
+    pos = 0
+    while True:
+        candidate = CANDIDATE_RE.search(text, pos)
+        if candidate is None:
+            return
+
+        line_begin = text.rfind("\n", 0, candidate.start()) + 1
+        line_end = text.find("\n", candidate.start())
+        if line_end < 0:
+            line_end = len(text)
+
+        tokens = list(lexer.tokens(line_begin, line_end))
+        for insertion in _line_insertions(tokens):
+            yield insertion
+        pos = max(line_end, tokens[-1].end if tokens else 0) + 1
+
+
+def standardize(text):
+    pieces = []
+    pos = 0
+    for insertion in find_insertions(text):
+        pieces.append(text[pos:insertion])
+        pieces.append("std::")
+        pos = insertion
+    pieces.append(text[pos:])
+    return "".join(pieces)
+
+
+# Part of the manifest, so changing the rules invalidates earlier clean runs
+RULES_VERSION = hashlib.sha1(" ".join(
+    sorted(STD_NAMES) + sorted(STD_TEMPLATES)).encode()).hexdigest()
+
+
+def _digest(text):
+    return hashlib.sha1(text.encode("utf-8", "surrogateescape")).hexdigest()
+
+
+def standardize_file(task):
+    # Returns (filename, mtime, size, digest, insertions, diff), where
+    # mtime, size and digest describe the file after standardizing
+    filename, dry_run, known_digest = task
+    with open(filename, "r", encoding="utf-8", errors="surrogateescape",
+              newline="") as f:
+        text = f.read()
+
+    # Only touched since the last clean run, the contents are unchanged
+    if known_digest == _digest(text):
+        new_text = text
+    else:
+        new_text = standardize(text)
+    insertions = (len(new_text) - len(text)) // len("std::")
+    diff = ""
+    if insertions:
+        diff = "".join(difflib.unified_diff(text.splitlines(True),
+                                            new_text.splitlines(True),
+                                            filename, filename))
+        if not dry_run:
+            with open(filename, "w", encoding="utf-8",
+                      errors="surrogateescape", newline="") as f:
+                f.write(new_text)
+
+    stat = os.stat(filename)
+    return (filename, stat.st_mtime, stat.st_size, _digest(new_text),
+            insertions, diff)
+
+
+class Manifest:
+    """Remembers the files that were clean after the last run."""
+
+    def __init__(self, filename=None):
+        self.filename = filename
+        self.files = {}
+        if filename and os.path.exists(filename):
+            try:
+                with open(filename, "r") as f:
+                    data = json.load(f)
+                if data.get("rules") == RULES_VERSION:
+                    self.files = data.get("files", {})
+            except (OSError, ValueError) as e:
+                logging.warning("Discarding standardize manifest {}: {}"
+                                .format(filename, e))
+
+    def is_clean(self, filename):
+        known = self.files.get(filename)
+        if known is None:
+            return False
+        try:
+            stat = os.stat(filename)
+        except OSError:
+            return False
+        return known[:2] == [stat.st_mtime, stat.st_size]
+
+    def digest(self, filename):
+        known = self.files.get(filename)
+        return known[2] if known is not None else None
+
+    def mark_clean(self, filename, mtime, size, digest):
+        self.files[filename] = [mtime, size, digest]
+
+    def save(self):
+        if not self.filename:
+            return
+        os.makedirs(os.path.dirname(self.filename), exist_ok=True)
+        with open(self.filename, "w") as f:
+            json.dump({"rules": RULES_VERSION, "files": self.files}, f)
+
+
+class TreeResult:
+    def __init__(self):
+        self.scanned = 0
+        self.skipped = 0
+        self.changed = []  # (filename, insertions)
+        self.diff = ""
+
+
+@timed("standardizer.standardize_tree")
+def standardize_tree(paths, manifest=None, dry_run=False, jobs=None,
+                     processes=True):
+    manifest = manifest if manifest is not None else Manifest()
+    result = TreeResult()
+    tasks = []
+    for filename in batch.find_sources(paths):
+        filename = os.path.abspath(filename)
+        if manifest.is_clean(filename):
+            result.skipped += 1
+        else:
+            tasks.append((filename, dry_run, manifest.digest(filename)))
+
+    diffs = []
+    try:
+        for filename, mtime, size, digest, insertions, diff in \
+                batch.map_unordered(standardize_file, tasks, jobs, processes):
+            result.scanned += 1
+            if insertions:
+                result.changed.append((filename, insertions))
+                diffs.append(diff)
+            if not insertions or not dry_run:
+                manifest.mark_clean(filename, mtime, size, digest)
+    finally:
+        # Files rewritten before a failure are not done again next time
+        manifest.save()
+
+    result.changed.sort()
+    result.diff = "".join(sorted(diffs))
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("paths", nargs="+")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="print a diff instead of writing the files")
+    parser.add_argument("--jobs", type=int, default=None,
+                        help="number of worker processes (default: all cores)")
+    parser.add_argument("--manifest",
+                        help="skip files that were clean in a previous run")
+    options = parser.parse_args(argv)
+
+    result = standardize_tree(options.paths, Manifest(options.manifest),
+                              options.dry_run, options.jobs)
+    sys.stdout.write(result.diff)
+    sys.stderr.write("{} file(s) changed, {} scanned, {} skipped\n".format(
+        len(result.changed), result.scanned, result.skipped))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,120 @@
+import collections
+import functools
+import os
+import threading
+import time
+from . import lazy
+
+cProfile = lazy.import_module("cProfile")
+
+WINDOW = 500  # Timings kept per name
+
+
+class Telemetry:
+    """Rolling latency statistics and an on-demand profiler.
+
+    Timed calls are recorded in memory per name. While profiling is
+    enabled, the next invocations of timed functions run under cProfile
+    and their stats are dumped to output_dir.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._timings = {}
+        self._local = threading.local()
+        self._profile_remaining = 0
+        self.profile_dir = None
+        self.profiles = []
+
+    def record(self, name, seconds):
+        with self._lock:
+            timings = self._timings.get(name)
+            if timings is None:
+                timings = collections.deque(maxlen=WINDOW)
+                self._timings[name] = timings
+            timings.append(seconds)
+
+    def report(self):
+        # [(name, count, p50, p90, p99, max)], slowest p90 first
+        with self._lock:
+            snapshot = [(name, sorted(timings))
+                        for name, timings in self._timings.items()]
+
+        rows = []
+        for name, timings in snapshot:
+            rows.append((name, len(timings),
+                         percentile(timings, 50),
+                         percentile(timings, 90),
+                         percentile(timings, 99),
+                         timings[-1]))
+        rows.sort(key=lambda row: row[3], reverse=True)
+        return rows
+
+    def reset(self):
+        with self._lock:
+            self._timings.clear()
+
+    def profile_next(self, count, profile_dir):
+        with self._lock:
+            self._profile_remaining = count
+            self.profile_dir = profile_dir
+            self.profiles = []
+
+    @property
+    def profiling(self):
+        return self._profile_remaining > 0
+
+    def _claim_profile(self):
+        # Only the outermost timed call of a thread is profiled
+        if getattr(self._local, "profiling", False):
+            return False
+        with self._lock:
+            if self._profile_remaining <= 0:
+                return False
+            self._profile_remaining -= 1
+            return True
+
+    def call(self, name, function, *args, **kwargs):
+        if not self._claim_profile():
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.record(name, time.perf_counter() - start)
+
+        profile = cProfile.Profile()
+        self._local.profiling = True
+        start = time.perf_counter()
+        try:
+            return profile.runcall(function, *args, **kwargs)
+        finally:
+            self.record(name, time.perf_counter() - start)
+            self._local.profiling = False
+            self._dump(name, profile)
+
+    def _dump(self, name, profile):
+        os.makedirs(self.profile_dir, exist_ok=True)
+        with self._lock:
+            filename = os.path.join(self.profile_dir, "{}-{}-{}.pstats".format(
+                name, time.strftime("%Y%m%d-%H%M%S"), len(self.profiles)))
+            self.profiles.append(filename)
+        profile.dump_stats(filename)
+
+
+def percentile(sorted_values, percent):
+    if not sorted_values:
+        return 0.0
+    index = int(round((len(sorted_values) - 1) * percent / 100.0))
+    return sorted_values[index]
+
+
+telemetry = Telemetry()
+
+
+def timed(name):
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            return telemetry.call(name, function, *args, **kwargs)
+        return wrapper
+    return decorator
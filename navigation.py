@@ -0,0 +1,94 @@
+import os
+import time
+import sublime
+import sublime_plugin
+from .helpers.sibling_index import HEADER, ROLES, SOURCE, TESTER, \
+    SiblingIndex
+from .helpers.telemetry import timed
+
+# Seconds between two polls of the folders for added or removed files
+POLL_INTERVAL = 5
+
+sibling_index = SiblingIndex()
+_last_poll = 0
+
+
+def plugin_loaded():
+    poll_sibling_index(force=True)
+
+
+def poll_sibling_index(force=False):
+    global _last_poll
+    now = time.time()
+    if not force and now - _last_poll < POLL_INTERVAL:
+        return
+    _last_poll = now
+
+    folders = set(folder
+                  for window in sublime.windows()
+                  for folder in window.folders())
+    sibling_index.update_async(folders)
+
+
+class MoogSwitchSiblingCommand(sublime_plugin.WindowCommand):
+    """Opens the header, source or tester of the class in the active view,
+    without a role the next one that exists."""
+
+    def is_enabled(self, role=None):
+        view = self.window.active_view()
+        return view is not None and view.file_name() is not None
+
+    @timed("moog_switch_sibling")
+    def run(self, role=None):
+        filename = self.window.active_view().file_name()
+        if role is None:
+            sibling = sibling_index.next_sibling(filename)
+        else:
+            sibling = sibling_index.sibling(filename, role)
+
+        if sibling is None:
+            poll_sibling_index(force=True)
+            if sibling_index.ready:
+                sublime.status_message("No {} found for {}".format(
+                    role or "sibling", os.path.basename(filename)))
+            else:
+                sublime.status_message("Moog is still indexing files")
+            return
+
+        self.window.open_file(sibling)
+
+
+class MoogGotoClassCommand(sublime_plugin.WindowCommand):
+    @timed("moog_goto_class")
+    def run(self):
+        classes = sibling_index.classes()
+        if not classes:
+            poll_sibling_index(force=True)
+            sublime.status_message("Moog is still indexing files")
+            return
+
+        items = []
+        targets = []
+        for name, roles in classes:
+            # A class that exists in several places gets an item for each
+            for path in roles.get(HEADER) or roles.get(SOURCE) or \
+                    roles[TESTER]:
+                folder = os.path.dirname(path)
+                items.append([name, "{}  ({})".format(
+                    folder, ", ".join(role for role in ROLES
+                                      if role in roles))])
+                targets.append(path)
+
+        def on_done(index):
+            if index >= 0:
+                self.window.open_file(targets[index])
+
+        self.window.show_quick_panel(items, on_done)
+
+
+class MoogSiblingIndexListener(sublime_plugin.EventListener):
+    def on_activated_async(self, view):
+        poll_sibling_index()
+
+    def on_post_save_async(self, view):
+        poll_sibling_index()
@@ -0,0 +1,48 @@
+import os
+import sublime
+import sublime_plugin
+from .helpers.telemetry import telemetry
+
+
+def _ms(seconds):
+    return "{:.1f} ms".format(seconds * 1000)
+
+
+class MoogPerformanceReportCommand(sublime_plugin.WindowCommand):
+    def run(self, reset=False):
+        if reset:
+            telemetry.reset()
+            sublime.status_message("Moog performance statistics cleared")
+            return
+
+        rows = telemetry.report()
+        if not rows:
+            sublime.status_message("No Moog timings recorded yet")
+            return
+
+        items = [[name,
+                  "p50 {}  p90 {}  p99 {}  max {}  ({} calls)".format(
+                      _ms(p50), _ms(p90), _ms(p99), _ms(max_), count)]
+                 for name, count, p50, p90, p99, max_ in rows]
+        self.window.show_quick_panel(items, None)
+
+
+class MoogProfileCommand(sublime_plugin.WindowCommand):
+    def run(self, count=None):
+        if count is None:
+            self.window.show_input_panel("Profile the next N Moog calls", "5",
+                                         self.start_profiling, None, None)
+        else:
+            self.start_profiling(count)
+
+    def start_profiling(self, count):
+        try:
+            count = int(count)
+        except ValueError:
+            sublime.status_message("Not a number: {}".format(count))
+            return
+
+        profile_dir = os.path.join(sublime.cache_path(), "Moog", "profiles")
+        telemetry.profile_next(count, profile_dir)
+        sublime.status_message("Profiling the next {} Moog call(s) into {}"
+                               .format(count, profile_dir))
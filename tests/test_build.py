@@ -1,6 +1,12 @@
+import os
+import sys
+import threading
 from unittest import TestCase
 import unittest.mock as mock
 import Moog.build as build
+import Moog.helpers.build_jobs as build_jobs
+from Moog.helpers.diagnostics import Diagnostic
+from Moog.tests.test_build_backends import FakeBackend
 
 
 class TestMoogBuildCommand(TestCase):
@@ -40,3 +46,143 @@ class TestMoogBuildCommand(TestCase):
     def test_get_project_file_success_logs_build(self, _):
         self.command.get_project_file("foo.cpp", False)
         self.assert_logged_in_panel("Building foo.vcxproj\n")
+
+    @mock.patch("Moog.build.include_graph.affected_tests", return_value={})
+    @mock.patch("Moog.build.get_include_graph")
+    @mock.patch("Moog.build.project_index")
+    @mock.patch("Moog.build._all_folders", return_value=["/a", "/b"])
+    def test_affected_tests_keep_other_windows_indexed(
+            self, _, mock_index, mock_graph, __):
+        self.mock_window.folders.return_value = ["/a"]
+        with mock.patch.object(self.command, "get_project_file",
+                               return_value=None):
+            self.command.submit_affected("/a/foo.cpp")
+        mock_index.update.assert_called_once_with(["/a", "/b"])
+        mock_graph().update.assert_called_once_with(["/a", "/b"])
+
+    def test_get_arguments_compiles_selected_files(self):
+        args = self.command.get_arguments(
+            "Foo.vcxproj", [os.path.join("src", "a.cpp"), "b.cpp"],
+            False, True)
+        self.assertEqual(["/t:ClCompile", "/p:SelectedFiles=a.cpp;b.cpp"],
+                         args[-2:])
+
+    @mock.patch("Moog.build.sublime.set_timeout",
+                side_effect=lambda callback, delay: callback())
+    def test_build_output_is_decoded_with_crlf_normalized(self, _):
+        finished = threading.Event()
+
+        def append(command, args):
+            if "[Finished]" in args["characters"]:
+                finished.set()
+        self.mock_panel.run_command.side_effect = append
+
+        script = "import os; os.write(1, 'café\\r\\n'.encode('utf-8'))"
+        project_file = os.path.join(os.getcwd(), "foo.vcxproj")
+        with mock.patch("Moog.build.get_scheduler",
+                        return_value=build_jobs.BuildScheduler(1)):
+            self.command.submit("key", "Build foo", project_file,
+                                [sys.executable, "-c", script])
+        self.assertTrue(finished.wait(10))
+
+        written = "".join(args[1]["characters"] for args, _ in
+                          self.mock_panel.run_command.call_args_list)
+        self.assertEqual("café\n\n[Finished]", written)
+
+
+class TestMoogBuildCommandBackend(TestCase):
+    def setUp(self):
+        self.window = mock.MagicMock()
+        self.filename = os.path.join(os.getcwd(), "src", "foo.cpp")
+        self.window.active_view().file_name.return_value = self.filename
+        self.project_file = os.path.join(os.getcwd(), "foo.project")
+        self.command = build.MoogBuildCommand(self.window)
+        self.command.panel = mock.MagicMock()
+        self.finished = threading.Event()
+
+        def append(command, args):
+            if "[Finished]" in args.get("characters", ""):
+                self.finished.set()
+        self.command.panel.run_command.side_effect = append
+
+    @mock.patch("Moog.build.sublime.set_timeout",
+                side_effect=lambda callback, delay: callback())
+    @mock.patch("Moog.build.refresh_project_index")
+    @mock.patch("Moog.build.record_build")
+    @mock.patch("Moog.build.get_locator_cache")
+    def test_compile_runs_the_backend_command(self, *_):
+        backend = FakeBackend(output="compiled\n",
+                              project_file=self.project_file)
+        with mock.patch("Moog.build.get_backend", return_value=backend), \
+                mock.patch("Moog.build.get_scheduler",
+                           return_value=build_jobs.BuildScheduler(1)), \
+                mock.patch.object(self.command, "prepare_output_panel"):
+            self.command.run_impl(compile_=True)
+            self.assertTrue(self.finished.wait(10))
+
+        self.assertEqual([("compile", self.project_file, (self.filename,))],
+                         backend.requests)
+        written = "".join(args[1]["characters"] for args, _ in
+                          self.command.panel.run_command.call_args_list
+                          if args[0] == "append")
+        self.assertIn("compiled\n", written)
+
+
+
+class TestViewDiagnostics(TestCase):
+    @mock.patch("Moog.build.sublime.PhantomSet")
+    @mock.patch("Moog.build.sublime.Phantom")
+    def test_phantom_escapes_message(self, mock_phantom, _):
+        diagnostic = Diagnostic("foo.cpp", 3, 5, "warning", "C4100",
+                                "'x' <unused>")
+        view = mock.MagicMock()
+        view.file_name.return_value = "foo.cpp"
+        with mock.patch.object(build.diagnostics, "for_file",
+                               return_value=[diagnostic]):
+            build.update_view_diagnostics(view)
+
+        _, html, _ = mock_phantom.call_args[0]
+        self.assertIn("warning C4100: &#x27;x&#x27; &lt;unused&gt;", html)
+
+
+class TestMoogIncludeHotspotsCommand(TestCase):
+    @mock.patch("Moog.build.sublime.status_message")
+    @mock.patch("Moog.build.sublime.set_timeout",
+                side_effect=lambda callback, delay: callback())
+    def test_failure_is_reported(self, _, mock_status):
+        command = build.MoogIncludeHotspotsCommand(mock.MagicMock())
+        graph = mock.MagicMock()
+        graph.update.side_effect = OSError("disk gone")
+        with mock.patch("Moog.build.get_include_graph", return_value=graph), \
+                self.assertLogs(level="ERROR"):
+            command.analyze(["/src"])
+
+        mock_status.assert_called_once_with(
+            "Moog: include analysis failed, see the console")
+        command.window.new_file.assert_not_called()
+
+
+@mock.patch("Moog.build.settings.value", return_value=True)
+@mock.patch("Moog.build.sublime.set_timeout",
+            side_effect=lambda callback, delay: callback())
+class TestMoogCompileOnSaveListener(TestCase):
+    def setUp(self):
+        self.view = mock.MagicMock()
+        self.view.file_name.return_value = "foo.cpp"
+
+    def test_compiles_modified_files(self, *_):
+        build.MoogCompileOnSaveListener().on_post_save(self.view)
+        self.view.window().run_command.assert_called_once_with(
+            "moog_build", {"modified": True, "background": True})
+
+    def test_view_closed_during_delay(self, mock_set_timeout, _):
+        # The view is closed before the delayed compile runs
+        window = self.view.window()
+        pending = []
+        mock_set_timeout.side_effect = lambda callback, delay: \
+            pending.append(callback)
+        build.MoogCompileOnSaveListener().on_post_save(self.view)
+
+        self.view.window.return_value = None
+        pending[0]()
+        window.run_command.assert_not_called()
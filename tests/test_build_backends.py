@@ -0,0 +1,223 @@
+import json
+import os
+import sys
+import tempfile
+from unittest import TestCase
+import unittest.mock as mock
+import Moog.helpers.build_backends as build_backends
+
+
+class FakeBackend(build_backends.BuildBackend):
+    """Runs a Python one-liner instead of a build tool."""
+    name = "fake"
+
+    def __init__(self, jobs=0, output="", returncode=0, project_file=None):
+        super().__init__(jobs)
+        self.output = output
+        self.returncode = returncode
+        self.project_file = project_file
+        self.requests = []
+
+    def find_project_file(self, filename, test=False):
+        return self.project_file
+
+    def _args(self, request):
+        self.requests.append(request)
+        script = "import sys; sys.stdout.write({}); sys.exit({})".format(
+            json.dumps(self.output), self.returncode)
+        return [sys.executable, "-c", script]
+
+    def build_args(self, project_file):
+        return self._args(("build", project_file))
+
+    def compile_args(self, project_file, files):
+        return self._args(("compile", project_file, tuple(files)))
+
+
+class TestMsBuildBackend(TestCase):
+    def test_compile_args(self):
+        backend = build_backends.MsBuildBackend(
+            4, msbuild={"VS2015": r"c:\vs\MSBuild.exe"})
+        args = backend.compile_args(r"c:\bld\VS2015\Foo.vcxproj",
+                                    [os.path.join("src", "a.cpp")])
+        self.assertEqual(["cmd", "/C", r"c:\vs\MSBuild.exe",
+                          r"c:\bld\VS2015\Foo.vcxproj",
+                          "/p:Configuration=Debug", "/maxcpucount:4", "/v:q",
+                          "/t:ClCompile", "/p:SelectedFiles=a.cpp"], args)
+
+    def test_timings_are_logged_to_a_file(self):
+        with tempfile.TemporaryDirectory() as timings_dir:
+            backend = build_backends.MsBuildBackend(4,
+                                                    timings_dir=timings_dir)
+            project_file = r"c:\bld\VS2017\Foo.vcxproj"
+            log = backend.timings_log(project_file)
+            self.assertEqual(timings_dir, os.path.dirname(log))
+            self.assertIn("/flp:LogFile={};Verbosity=normal;"
+                          "PerformanceSummary".format(log),
+                          backend.build_args(project_file))
+            self.assertIn("/Bt+",
+                          backend.build_env(project_file)["_CL_"])
+
+            with open(log, "w") as f:
+                f.write("  time(C:\\VC (x86)\\c1xx.dll)=0.50000s "
+                        "< 1 - 2 > BB [c:\\src\\a.cpp]\n"
+                        "  time(C:\\VC\\c2.dll)=0.25000s "
+                        "< 3 - 4 > BB [c:\\src\\a.cpp]\n"
+                        "  Build succeeded.\n")
+            self.assertEqual({"c:\\src\\a.cpp": 0.75},
+                             backend.unit_times(project_file))
+            self.assertFalse(os.path.exists(log))
+            self.assertEqual({}, backend.unit_times(project_file))
+
+    def test_msbuild_from_path_for_unknown_version(self):
+        backend = build_backends.MsBuildBackend(4)
+        self.assertEqual("MSBuild.exe",
+                         backend.build_args(r"c:\bld\VS2017\Foo.vcxproj")[2])
+
+    def test_msbuild_of_the_project_version_or_newer(self):
+        backend = build_backends.MsBuildBackend(4, msbuild={
+            "VS2015": "2015.exe", "VS2017": "2017.exe", "VS2022": "2022.exe"})
+        self.assertEqual("2015.exe",
+                         backend.msbuild_path(r"c:\bld\VS2015\Foo.vcxproj"))
+        self.assertEqual("2022.exe",
+                         backend.msbuild_path(r"c:\bld\VS2019\Foo.vcxproj"))
+        self.assertEqual("2022.exe",
+                         backend.msbuild_path(r"c:\bld\Foo.vcxproj"))
+        self.assertEqual("MSBuild.exe",
+                         backend.msbuild_path(r"c:\bld\VS2026\Foo.vcxproj"))
+
+    def test_no_timings_by_default(self):
+        backend = build_backends.MsBuildBackend(4)
+        self.assertIsNone(backend.build_env("Foo.vcxproj"))
+        self.assertEqual({}, backend.unit_times("Foo.vcxproj"))
+
+    def test_project_index_is_preferred_over_locator(self):
+        index = mock.MagicMock()
+        locator = mock.MagicMock()
+        backend = build_backends.MsBuildBackend(project_index=index,
+                                                locator=locator)
+        index.get_vc_test_project.return_value = "FooTester.vcxproj"
+        self.assertEqual("FooTester.vcxproj",
+                         backend.find_project_file("foo.cpp", True))
+        locator.get_vc_test_project.assert_not_called()
+
+        index.get_vc_project.return_value = None
+        locator.get_vc_project.return_value = "Foo.vcxproj"
+        self.assertEqual("Foo.vcxproj", backend.find_project_file("foo.cpp"))
+
+
+class TestGeneratorBackends(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        self.build_dir = os.path.join(self.root, "build")
+        self.source = os.path.join(self.root, "src", "a.cpp")
+        os.makedirs(self.build_dir)
+        os.makedirs(os.path.dirname(self.source))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, name, text=""):
+        with open(os.path.join(self.build_dir, name), "w") as f:
+            f.write(text)
+
+    def test_ninja_finds_build_dir_above_source(self):
+        self.write("build.ninja")
+        backend = build_backends.NinjaBackend(8)
+        project_file = backend.find_project_file(self.source)
+        self.assertEqual(os.path.join(self.build_dir, "build.ninja"),
+                         project_file)
+        self.assertEqual(["ninja", "-C", self.build_dir, "-j", "8"],
+                         backend.build_args(project_file))
+
+    def test_ninja_compiles_object_of_source(self):
+        self.write("build.ninja")
+        backend = build_backends.NinjaBackend(8)
+        args = backend.compile_args(
+            os.path.join(self.build_dir, "build.ninja"), [self.source])
+        self.assertEqual(os.path.join("..", "src", "a.cpp") + "^", args[-1])
+
+    def write_compile_commands(self, *entries):
+        self.write("compile_commands.json", json.dumps([{
+            "directory": directory,
+            "file": source,
+            "output": output,
+            "command": "c++ -c " + source,
+        } for directory, source, output in entries]))
+
+    def test_ninja_object_from_compile_commands(self):
+        self.write_compile_commands(
+            (os.path.join(self.build_dir, "lib"), self.source,
+             "CMakeFiles/foo.dir/src/a.cpp.o"))
+        backend = build_backends.NinjaBackend(2)
+        args = backend.compile_args(
+            os.path.join(self.build_dir, "build.ninja"), [self.source])
+        self.assertEqual(
+            os.path.normpath("lib/CMakeFiles/foo.dir/src/a.cpp.o"), args[-1])
+
+    def test_make_runs_in_the_directory_owning_the_object(self):
+        # The top level Makefile CMake generates has no object rules
+        lib_dir = os.path.join(self.build_dir, "lib")
+        self.write_compile_commands(
+            (lib_dir, self.source, "CMakeFiles/foo.dir/src/a.cpp.o"))
+        backend = build_backends.MakeBackend(2)
+        args = backend.compile_args(
+            os.path.join(self.build_dir, "Makefile"), [self.source])
+        self.assertEqual(["make", "-C", lib_dir, "-j", "2", "src/a.cpp.o"],
+                         args)
+
+    def test_make_objects_of_several_directories(self):
+        other = os.path.join(self.root, "src", "b.cpp")
+        self.write_compile_commands(
+            (os.path.join(self.build_dir, "a"), self.source,
+             "CMakeFiles/a.dir/a.cpp.o"),
+            (os.path.join(self.build_dir, "b"), other,
+             "CMakeFiles/b.dir/b.cpp.o"))
+        backend = build_backends.MakeBackend(2)
+        args = backend.compile_args(
+            os.path.join(self.build_dir, "Makefile"), [self.source, other])
+        self.assertEqual(["sh", "-c"], args[:2])
+        self.assertEqual(
+            "make -C {0}/a -j 2 a.cpp.o && make -C {0}/b -j 2 b.cpp.o".format(
+                self.build_dir), args[2].replace(os.sep, "/"))
+
+    def test_make_without_compile_commands(self):
+        backend = build_backends.MakeBackend(2)
+        args = backend.compile_args(
+            os.path.join(self.build_dir, "Makefile"), [self.source])
+        self.assertEqual(os.path.join("..", "src", "a.o"), args[-1])
+
+    def test_cmake_compiles_with_its_generator(self):
+        self.write("CMakeCache.txt")
+        self.write("build.ninja")
+        backend = build_backends.CMakeBackend(2)
+        project_file = backend.find_project_file(self.source)
+        self.assertEqual(["cmake", "--build", self.build_dir, "--", "-j",
+                          "2"], backend.build_args(project_file))
+        self.assertEqual("ninja",
+                         backend.compile_args(project_file,
+                                              [self.source])[0])
+
+    def test_cmake_with_makefiles_compiles_in_object_directory(self):
+        self.write("CMakeCache.txt")
+        self.write("Makefile")
+        self.write_compile_commands(
+            (self.build_dir, self.source, "CMakeFiles/foo.dir/src/a.cpp.o"))
+        backend = build_backends.CMakeBackend(2)
+        project_file = backend.find_project_file(self.source)
+        self.assertEqual(["make", "-C", self.build_dir, "-j", "2",
+                          "src/a.cpp.o"],
+                         backend.compile_args(project_file, [self.source]))
+
+
+class TestCreateBackend(TestCase):
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            build_backends.create_backend("scons")
+
+    @mock.patch.dict(build_backends.BACKENDS, {"fake": FakeBackend})
+    def test_registered_backend(self):
+        backend = build_backends.create_backend("fake")
+        backend.compile_args("p", ["a.cpp"])
+        self.assertEqual([("compile", "p", ("a.cpp",))], backend.requests)
@@ -0,0 +1,75 @@
+from unittest import TestCase
+import Moog.helpers.build_history as build_history
+
+
+class TestBuildHistory(TestCase):
+    def setUp(self):
+        self.history = build_history.BuildHistory(":memory:")
+
+    def tearDown(self):
+        self.history.close()
+
+    def test_records_jobs_most_recent_first(self):
+        first = self.history.record(10.0, 12.5, "Foo.vcxproj", "build", 0)
+        second = self.history.record(20.0, 21.0, "Foo.vcxproj", "compile", 2,
+                                     unit_times={"a.cpp": 0.5})
+        jobs = self.history.jobs()
+        self.assertEqual([second, first], [job.id for job in jobs])
+        self.assertEqual(("compile", 2, False),
+                         (jobs[0].variant, jobs[0].returncode,
+                          jobs[0].cancelled))
+        self.assertEqual({"a.cpp": 0.5}, self.history.unit_times(second))
+        self.assertEqual({}, self.history.unit_times(first))
+
+    def test_slowest_units_by_average(self):
+        self.history.record(0, 1, "Foo.vcxproj", "build", 0,
+                            unit_times={"a.cpp": 1.0, "b.cpp": 4.0})
+        self.history.record(2, 3, "Foo.vcxproj", "build", 0,
+                            unit_times={"a.cpp": 3.0, "b.cpp": 2.0})
+        self.history.record(4, 5, "Foo.vcxproj", "build", 0,
+                            unit_times={"c.cpp": 0.1})
+
+        units = self.history.slowest_units(2)
+        self.assertEqual(
+            [build_history.UnitStats("b.cpp", 2, 3.0, 4.0, 2.0),
+             build_history.UnitStats("a.cpp", 2, 2.0, 3.0, 3.0)], units)
+
+    def test_project_trends_only_count_successful_runs(self):
+        self.history.record(0, 10, "Foo.vcxproj", "build", 0)
+        self.history.record(20, 25, "Bar.vcxproj", "build", 0)
+        self.history.record(30, 31, "Foo.vcxproj", "build", 1)
+        self.history.record(40, 42, "Foo.vcxproj", "build", None,
+                            cancelled=True)
+        self.history.record(50, 62, "Foo.vcxproj", "build", 0)
+
+        trends = self.history.project_trends()
+        self.assertEqual(
+            [build_history.ProjectTrend("Foo.vcxproj", "build", [10, 12]),
+             build_history.ProjectTrend("Bar.vcxproj", "build", [5])],
+            trends)
+
+    def test_project_trends_keep_the_last_runs(self):
+        for i in range(5):
+            self.history.record(i * 10, i * 10 + i, "Foo.vcxproj", "build",
+                                0)
+        self.assertEqual([2, 3, 4],
+                         self.history.project_trends(3)[0].durations)
+
+    def test_clear(self):
+        self.history.record(0, 1, "Foo.vcxproj", "build", 0,
+                            unit_times={"a.cpp": 1.0})
+        self.history.clear()
+        self.assertEqual([], self.history.jobs())
+        self.assertEqual([], self.history.slowest_units())
+
+
+class TestFormatting(TestCase):
+    def test_sparkline(self):
+        self.assertEqual("▁█▄", build_history.sparkline([0, 7, 3]))
+        self.assertEqual("▁▁", build_history.sparkline([2, 2]))
+        self.assertEqual("", build_history.sparkline([]))
+
+    def test_format_trend(self):
+        self.assertEqual("last 12.0 s, avg 10.0 s over 2 run(s) (+20%) ▁██",
+                         build_history.format_trend([8.0, 12.0, 12.0]))
+        self.assertEqual("last 3.0 s ▁", build_history.format_trend([3.0]))
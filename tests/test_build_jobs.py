@@ -0,0 +1,92 @@
+import sys
+import threading
+import time
+from unittest import TestCase
+import Moog.helpers.build_jobs as build_jobs
+
+
+def python(script):
+    return [sys.executable, "-c", script]
+
+
+class TestBuildScheduler(TestCase):
+    def setUp(self):
+        self.scheduler = build_jobs.BuildScheduler(2)
+        self.output = {}
+        self.done = {}
+
+    def submit(self, key, args, resource=None):
+        self.output[key] = []
+        self.done[key] = threading.Event()
+        return self.scheduler.submit(key, key, args, None,
+                                     self.output[key].append,
+                                     lambda job: self.done[job.key].set(),
+                                     resource)
+
+    def wait(self, *keys):
+        for key in keys:
+            self.assertTrue(self.done[key].wait(10))
+
+    def test_runs_job_and_reports_output_in_lines(self):
+        job, created = self.submit(
+            "a", python("import sys; sys.stdout.write('x\\ny\\nz')"))
+        self.assertTrue(created)
+        self.wait("a")
+        self.assertEqual(b"x\ny\nz", b"".join(self.output["a"]))
+        self.assertTrue(all(chunk.endswith(b"\n")
+                            for chunk in self.output["a"][:-1]))
+        self.assertEqual(0, job.returncode)
+        self.assertEqual(build_jobs.FINISHED, job.state)
+        self.assertFalse(self.scheduler.active())
+
+    def test_duplicate_of_queued_job_is_coalesced(self):
+        blocker, _ = self.submit("block", python("import time; "
+                                                 "time.sleep(10)"), "p")
+        first, created = self.submit("a", python("pass"), "p")
+        self.assertTrue(created)
+        second, created = self.scheduler.submit("a", "a", python("pass"),
+                                                None, None, None, "p")
+        self.assertFalse(created)
+        self.assertIs(first, second)
+
+        self.scheduler.cancel(blocker)
+        self.wait("block", "a")
+        self.assertTrue(blocker.cancelled)
+        self.assertEqual(0, first.returncode)
+
+    def test_jobs_sharing_a_resource_run_one_at_a_time(self):
+        blocker, _ = self.submit("block", python("import time; "
+                                                 "time.sleep(10)"), "p")
+        queued, _ = self.submit("a", python("pass"), "p")
+        other, _ = self.submit("b", python("pass"), "q")
+        self.wait("b")
+        self.assertEqual(build_jobs.QUEUED, queued.state)
+        self.assertEqual([blocker, queued], self.scheduler.jobs())
+
+        self.scheduler.cancel(queued)
+        self.wait("a")
+        self.assertTrue(queued.cancelled)
+        self.assertIsNone(queued.returncode)
+        self.scheduler.cancel_all()
+        self.wait("block")
+
+    def test_independent_jobs_run_concurrently(self):
+        self.submit("warm", python("pass"))
+        self.wait("warm")
+        deadline = time.time() + 10
+        while self.scheduler._idle != 1 and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(1, self.scheduler._idle)
+
+        sleep = python("import time; time.sleep(1)")
+        first, _ = self.submit("a", sleep, "p")
+        second, _ = self.submit("b", sleep, "q")
+        self.wait("a", "b")
+        self.assertLess(max(first.started, second.started),
+                        min(first.ended, second.ended))
+
+    def test_failing_to_start_reports_error(self):
+        job, _ = self.submit("a", ["/nonexistent/moog/binary"])
+        self.wait("a")
+        self.assertEqual(-1, job.returncode)
+        self.assertIn(b"Cannot start a", b"".join(self.output["a"]))
@@ -0,0 +1,75 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+from Moog.helpers.build_log import BuildLog
+
+
+class TestBuildLog(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        self.log.close()
+        shutil.rmtree(self.directory)
+
+    def test_lines_and_search(self):
+        self.log = BuildLog(self.directory)
+        writer = self.log.writer()
+        writer.write("Building foo\nfoo.cpp(1): err")
+        writer.write("or C2065\r\nDone\n")
+        self.assertEqual([(0, "Building foo"), (1, "foo.cpp(1): error C2065"),
+                          (2, "Done")], self.log.lines(0, 10))
+        self.assertEqual([(1, "foo.cpp(1): error C2065")],
+                         self.log.search("c2065"))
+        self.assertEqual([(2, "Done")], self.log.lines(2))
+        self.assertEqual([(1, "foo.cpp(1): error C2065")],
+                         self.log.search("C2065"))
+        self.assertEqual([], self.log.search("DONE"))
+        self.assertEqual([(0, "Building foo"), (2, "Done")],
+                         self.log.search(r"^(B|D)\w+"))
+
+    def test_writers_do_not_share_lines(self):
+        self.log = BuildLog(self.directory)
+        self.log.writer().write("[Finished]")
+        self.log.append(b"Building bar\n")
+        self.assertEqual([(0, "[Finished]"), (1, "Building bar")],
+                         self.log.lines(0, 10))
+
+    def test_diagnostics_are_indexed_by_line(self):
+        self.log = BuildLog(self.directory)
+        writer = self.log.writer(lambda line: line if "error" in line
+                                 else None)
+        self.assertEqual([], writer.write("a\npartial err"))
+        self.assertEqual(["partial error", "error 2"],
+                         writer.write("or\nb\nerror 2\n"))
+        self.assertEqual([(1, "partial error"), (3, "error 2")],
+                         self.log.diagnostics())
+
+    def test_only_the_newest_diagnostics_are_kept(self):
+        self.log = BuildLog(self.directory, max_diagnostics=2)
+        writer = self.log.writer(lambda line: line)
+        writer.write("a\nb\nc\n")
+        self.assertEqual([(1, "b"), (2, "c")], self.log.diagnostics())
+
+    def test_old_files_are_rotated_away(self):
+        self.log = BuildLog(self.directory, max_bytes=10, max_files=2)
+        writer = self.log.writer(lambda line: line)
+        for i in range(10):
+            writer.write("line {}\n".format(i))
+
+        first, end = self.log.line_range()
+        self.assertEqual(10, end)
+        self.assertGreater(first, 0)
+        self.assertEqual("line 9", self.log.lines(9)[0][1])
+        self.assertEqual(first, self.log.lines(0)[0][0])
+        self.assertEqual(2, len(os.listdir(self.directory)))
+        self.assertTrue(all(line >= first
+                            for line, _ in self.log.diagnostics()))
+
+    def test_previous_session_is_removed(self):
+        self.log = BuildLog(self.directory)
+        self.log.append(b"old\n")
+        self.log.close()
+        self.log = BuildLog(self.directory)
+        self.assertEqual([], self.log.search("old"))
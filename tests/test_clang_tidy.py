@@ -0,0 +1,113 @@
+import os
+import shutil
+import tempfile
+import importlib
+import threading
+from unittest import TestCase, mock
+from Moog.helpers import clang_tidy
+
+plugin = importlib.import_module("Moog.clang-tidy")
+
+
+class TestClangTidyHelpers(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def touch(self, *parts):
+        filename = os.path.join(self.root, *parts)
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        open(filename, "w").close()
+        return filename
+
+    def test_find_sources(self):
+        foo = self.touch("src", "Foo.cpp")
+        bar = self.touch("src", "bar.c")
+        self.touch("src", "Foo.h")
+        self.touch(".git", "hidden.cpp")
+
+        self.assertEqual(sorted([foo, bar]),
+                         sorted(clang_tidy.find_sources([self.root])))
+        self.assertEqual([foo], list(clang_tidy.find_sources([foo])))
+
+    def test_build_args(self):
+        args = clang_tidy.build_args("--fix -checks=-*", "src/Foo.cpp",
+                                     ["-std=c++17", "-Iinclude"])
+        self.assertEqual(["clang-tidy.exe", "--fix", "-checks=-*",
+                          "src/Foo.cpp", "--", "-std=c++17", "-Iinclude"],
+                         args)
+
+    def test_c_std_error_is_not_a_failure(self):
+        result = clang_tidy.TidyResult("foo.c", 1, clang_tidy.C_STD_ERROR)
+        self.assertFalse(result.failed)
+        self.assertTrue(clang_tidy.TidyResult("foo.cpp", 1, "boom").failed)
+
+    def test_runner_reports_every_file(self):
+        results = []
+        done = threading.Event()
+        tasks = [("file{}".format(i), "echo tidy", self.root)
+                 for i in range(5)]
+
+        runner = clang_tidy.ClangTidyRunner(jobs=2)
+        runner.run(tasks, results.append, lambda _: done.set())
+        self.assertTrue(done.wait(10))
+
+        self.assertEqual(5, runner.finished)
+        self.assertEqual(sorted(task[0] for task in tasks),
+                         sorted(result.filename for result in results))
+        self.assertIn("tidy", results[0].output)
+
+    def test_runner_reports_files_it_cannot_check(self):
+        results = []
+        done = threading.Event()
+        missing_dir = os.path.join(self.root, "missing")
+        runner = clang_tidy.ClangTidyRunner(jobs=2)
+        with self.assertLogs(level="ERROR"):
+            runner.run([("foo.cpp", "echo tidy", missing_dir),
+                        ("bar.cpp", "echo tidy", self.root)],
+                       results.append, lambda _: done.set())
+            self.assertTrue(done.wait(10))
+
+        self.assertEqual(2, runner.finished)
+        failed = [result for result in results if result.failed]
+        self.assertEqual(["foo.cpp"], [result.filename for result in failed])
+        self.assertIn("Cannot run clang-tidy", failed[0].output)
+
+    def test_cancelled_runner_skips_pending_files(self):
+        results = []
+        done = threading.Event()
+        runner = clang_tidy.ClangTidyRunner(jobs=1)
+        runner.cancel()
+        runner.run([("foo.cpp", "echo tidy", self.root)], results.append,
+                   lambda _: done.set())
+        self.assertTrue(done.wait(10))
+        self.assertEqual([], results)
+
+
+class TestClangTidyCommand(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.window = mock.MagicMock()
+        self.window.folders.return_value = [self.root]
+        self.command = plugin.ClangTidyCommand(self.window)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    @mock.patch.object(plugin.sublime, "status_message")
+    def test_nothing_to_check_is_reported(self, mock_status):
+        skipped = []
+        with self.assertLogs(level="ERROR"):
+            tasks = list(self.command.get_tasks(
+                "-checks=*", [os.path.join(self.root, "foo.cpp"),
+                              "/elsewhere/bar.cpp"], skipped))
+        self.assertEqual([], tasks)
+        self.assertEqual(2, len(skipped))
+
+        self.command.start(tasks, skipped)
+        mock_status.assert_called_once_with(
+            "clang-tidy: nothing to check, skipped 2 file(s), see the "
+            "console")
+        self.window.create_output_panel.assert_not_called()
@@ -0,0 +1,103 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+import time
+from unittest import TestCase
+from Moog.helpers.compile_commands import (FlagIndex, extract_flags,
+                                           iter_json_array)
+
+
+class TestIterJsonArray(TestCase):
+    def test_elements_split_over_chunks(self):
+        entries = [{"file": "foo{}.cpp".format(i)} for i in range(50)]
+        text = json.dumps(entries, indent=2)
+        for chunk_size in (1, 13, 2 ** 16):
+            self.assertEqual(entries, list(iter_json_array(io.StringIO(text),
+                                                           chunk_size)))
+
+    def test_empty_array(self):
+        self.assertEqual([], list(iter_json_array(io.StringIO(" [ ] "))))
+
+    def test_invalid_databases(self):
+        for text in ("", "{}", '[{"file": "foo.cpp"}'):
+            with self.assertRaises(ValueError):
+                list(iter_json_array(io.StringIO(text), 4))
+
+
+class TestExtractFlags(TestCase):
+    def test_command(self):
+        entry = {"directory": "/build",
+                 "command": "clang++ -DFOO -Iinclude -I /abs -std=c++14 "
+                            "-o foo.o -c /src/foo.cpp",
+                 "file": "/src/foo.cpp"}
+        self.assertEqual(["-DFOO", "-I" + os.path.join("/build", "include"),
+                          "-I", "/abs", "-std=c++14"],
+                         extract_flags(entry))
+
+    def test_arguments(self):
+        entry = {"directory": "/build",
+                 "arguments": ["gcc", "-std=c99", "-c", "foo.c"],
+                 "file": "foo.c"}
+        self.assertEqual(["-std=c99"], extract_flags(entry))
+
+
+class TestFlagIndex(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def write(self, name, text, mtime_offset=0):
+        filename = os.path.join(self.root, name)
+        with open(filename, "w") as f:
+            f.write(text)
+        mtime = time.time() + mtime_offset
+        os.utime(filename, (mtime, mtime))
+
+    def write_database(self, flag, mtime_offset=0):
+        entries = [{"directory": self.root,
+                    "command": "clang++ {} -c foo.cpp".format(flag),
+                    "file": "foo.cpp"}]
+        self.write("compile_commands.json", json.dumps(entries), mtime_offset)
+
+    def test_flags_from_database(self):
+        self.write_database("-DFOO")
+        index = FlagIndex()
+        self.assertEqual(["-DFOO"], index.get_flags(
+            self.root, os.path.join(self.root, "foo.cpp")))
+
+    def test_database_is_reparsed_when_changed(self):
+        index = FlagIndex()
+        filename = os.path.join(self.root, "foo.cpp")
+        self.write_database("-DFOO")
+        index.get_flags(self.root, filename)
+
+        self.write_database("-DBAR", mtime_offset=10)
+        self.assertEqual(["-DBAR"], index.get_flags(self.root, filename))
+
+    def test_clang_complete_fallback(self):
+        self.write(".clang_complete", "-Iinclude\n-DFOO\n")
+        index = FlagIndex()
+        self.assertEqual(["-std=c++17", "-Iinclude", "-DFOO"],
+                         index.get_flags(self.root, "foo.cpp"))
+        self.assertEqual(["-Iinclude", "-DFOO"],
+                         index.get_flags(self.root, "foo.c"))
+
+    def test_corrupt_database_falls_back_to_clang_complete(self):
+        self.write("compile_commands.json",
+                   '[{"directory": "/src", "file": "foo.cpp", "comm')
+        self.write(".clang_complete", "-DFOO\n")
+        index = FlagIndex()
+        filename = os.path.join(self.root, "foo.cpp")
+        with self.assertLogs(level="WARNING"):
+            self.assertEqual(["-std=c++17", "-DFOO"],
+                             index.get_flags(self.root, filename))
+
+        self.write_database("-DBAR", mtime_offset=10)
+        self.assertEqual(["-DBAR"], index.get_flags(self.root, filename))
+
+    def test_no_flags(self):
+        self.assertIsNone(FlagIndex().get_flags(self.root, "foo.cpp"))
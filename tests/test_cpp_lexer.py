@@ -0,0 +1,60 @@
+from unittest import TestCase
+from Moog.helpers import cpp_lexer
+
+SOURCE = """\
+#include <string>
+// string x;
+auto s = R"x(a "string" ;)x"; /* block
+string */ std::map<int, std::vector<int>> m{1'000, 'a'};
+"""
+
+
+class TestCppLexer(TestCase):
+    def texts(self, tokens):
+        return [token.text for token in tokens]
+
+    def test_tokenize(self):
+        tokens = cpp_lexer.tokenize("std::map<int, std::vector<int>> m;")
+        self.assertEqual(["std", "::", "map", "<", "int", ",", "std", "::",
+                          "vector", "<", "int", ">>", "m", ";"],
+                         self.texts(tokens))
+
+    def test_literals_and_comments(self):
+        tokens = cpp_lexer.tokenize(SOURCE, comments=True)
+        kinds = dict((token.text, token.kind) for token in tokens)
+        self.assertEqual(cpp_lexer.COMMENT, kinds["// string x;"])
+        self.assertEqual(cpp_lexer.STRING, kinds['R"x(a "string" ;)x"'])
+        self.assertEqual(cpp_lexer.NUMBER, kinds["1'000"])
+        self.assertEqual(cpp_lexer.CHAR, kinds["'a'"])
+
+    def test_is_code(self):
+        lexer = cpp_lexer.CppLexer(SOURCE)
+        self.assertFalse(lexer.is_code(SOURCE.index("string x")))
+        self.assertFalse(lexer.is_code(SOURCE.index('"string"')))
+        self.assertFalse(lexer.is_code(SOURCE.index("string */")))
+        self.assertTrue(lexer.is_code(SOURCE.index("std::map")))
+        self.assertTrue(lexer.is_code(SOURCE.index("'a'") - 2))
+
+    def test_tokens_from_inside_a_comment(self):
+        lexer = cpp_lexer.CppLexer(SOURCE)
+        begin = SOURCE.index("string */")
+        tokens = list(lexer.tokens(begin, SOURCE.index("<int,")))
+        self.assertEqual(["std", "::", "map"], self.texts(tokens))
+
+    def test_split_top_level(self):
+        tokens = cpp_lexer.tokenize("int a, std::map<int, int> b, f(1, 2)")
+        parts = cpp_lexer.split_top_level(tokens)
+        self.assertEqual(["int a", "std::map<int, int> b", "f(1, 2)"],
+                         [cpp_lexer.join_tokens(part, "") for part in parts])
+
+    def test_find_closing_and_opening(self):
+        tokens = cpp_lexer.tokenize("f(a, (b), c) + 1")
+        self.assertEqual(9, cpp_lexer.find_closing(tokens, 1))
+        self.assertEqual(1, cpp_lexer.find_opening(tokens, 9))
+
+    def test_lexer_cache(self):
+        cache = cpp_lexer.LexerCache()
+        texts = ["int a;", "int b;"]
+        first = cache.get(1, 1, lambda: texts[0])
+        self.assertIs(first, cache.get(1, 1, lambda: texts[1]))
+        self.assertEqual("int b;", cache.get(1, 2, lambda: texts[1]).text)
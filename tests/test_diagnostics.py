@@ -0,0 +1,102 @@
+import os
+from unittest import TestCase
+from Moog.helpers.diagnostics import (Diagnostic, DiagnosticParser,
+                                      DiagnosticStore)
+
+
+class TestDiagnosticParser(TestCase):
+    def setUp(self):
+        self.parser = DiagnosticParser()
+
+    def test_msbuild_warning(self):
+        line = r"  1>c:\src\foo.cpp(234,5): warning C4100: 'bar': " \
+               r"unreferenced parameter [c:\bld\Foo.vcxproj]"
+        diagnostic = self.parser.parse_line(line)
+        self.assertEqual(234, diagnostic.line)
+        self.assertEqual(5, diagnostic.column)
+        self.assertEqual("warning", diagnostic.severity)
+        self.assertEqual("C4100", diagnostic.code)
+        self.assertEqual("'bar': unreferenced parameter", diagnostic.message)
+
+    def test_msbuild_fatal_error_without_column(self):
+        line = r"c:\src\foo.cpp(12): fatal error C1083: Cannot open include"
+        diagnostic = self.parser.parse_line(line)
+        self.assertEqual((12, 0, "error", "C1083"),
+                         (diagnostic.line, diagnostic.column,
+                          diagnostic.severity, diagnostic.code))
+
+    def test_msbuild_path_with_parentheses(self):
+        line = r"  1>C:\Program Files (x86)\VC\include\xmemory(123,9): " \
+               r"warning C4996: 'std::copy': unsafe [c:\bld\Foo.vcxproj]"
+        diagnostic = self.parser.parse_line(line)
+        self.assertTrue(diagnostic.file.endswith(
+            r"C:\Program Files (x86)\VC\include\xmemory"))
+        self.assertEqual((123, 9, "C4996"), (diagnostic.line,
+                                             diagnostic.column,
+                                             diagnostic.code))
+
+    def test_gtest_failures(self):
+        windows = self.parser.parse_line(
+            r"c:\src\FooTester.cpp(12): error: Value of: foo.Bar()")
+        self.assertEqual((12, "gtest", "Value of: foo.Bar()"),
+                         (windows.line, windows.code, windows.message))
+
+        posix = self.parser.parse_line("/src/FooTester.cpp:31: Failure")
+        self.assertEqual((31, "error"), (posix.line, posix.severity))
+
+    def test_gcc_and_clang_diagnostics(self):
+        warning = self.parser.parse_line(
+            "/src/foo.cpp:12:5: warning: unused variable 'x' "
+            "[-Wunused-variable]")
+        self.assertEqual(("/src/foo.cpp", 12, 5, "warning",
+                          "-Wunused-variable", "unused variable 'x'"),
+                         tuple(warning))
+
+        error = self.parser.parse_line(
+            r"c:\src\foo.cpp:3: fatal error: 'bar.h' file not found")
+        self.assertEqual((3, 0, "error", ""),
+                         (error.line, error.column, error.severity,
+                          error.code))
+
+    def test_unrelated_lines_are_ignored(self):
+        self.assertIsNone(self.parser.parse_line("Build succeeded."))
+        self.assertIsNone(self.parser.parse_line("[ RUN      ] Foo.Bar"))
+
+    def test_lines_split_over_feeds(self):
+        self.assertEqual([], self.parser.feed("foo.cpp(1): err"))
+        diagnostics = self.parser.feed("or C2065: 'x': undeclared\nnext")
+        self.assertEqual(1, len(diagnostics))
+        self.assertEqual("C2065", diagnostics[0].code)
+        self.assertEqual([], self.parser.flush())
+
+    def test_relative_paths_use_base_dir(self):
+        parser = DiagnosticParser(os.path.join("root", "bld"))
+        diagnostic = parser.parse_line("foo.cpp(1): error C2065: 'x'")
+        self.assertEqual(os.path.join("root", "bld", "foo.cpp"),
+                         diagnostic.file)
+
+
+class TestDiagnosticStore(TestCase):
+    def diagnostic(self, line, severity="error", filename="foo.h"):
+        return Diagnostic(filename, line, 0, severity, "C1", "message")
+
+    def test_duplicates_are_dropped(self):
+        store = DiagnosticStore()
+        self.assertEqual({"foo.h"}, store.add([self.diagnostic(1)]))
+        self.assertEqual(set(), store.add([self.diagnostic(1)]))
+        self.assertEqual(1, len(store))
+        self.assertEqual(1, len(store.for_file("foo.h")))
+
+    def test_next_cycles_and_skips_notes(self):
+        store = DiagnosticStore()
+        store.add([self.diagnostic(1),
+                   self.diagnostic(2, "note"),
+                   self.diagnostic(3, "warning", "bar.cpp")])
+
+        self.assertEqual(1, store.next().line)
+        self.assertEqual(3, store.next().line)
+        self.assertEqual(1, store.next().line)
+        self.assertEqual(3, store.next(forward=False).line)
+
+    def test_next_without_diagnostics(self):
+        self.assertIsNone(DiagnosticStore().next())
@@ -0,0 +1,169 @@
+import os
+import tempfile
+from unittest import TestCase
+import unittest.mock as mock
+import Moog.helpers.gtest as gtest
+
+TEST_LIST = """Running main() from gtest_main.cc
+FooTest.
+  Bar
+  Baz
+ParamTest/Values.  # TypeParam = int
+  Check/0  # GetParam() = 1
+"""
+
+XML_REPORT = """<?xml version="1.0" encoding="UTF-8"?>
+<testsuites tests="3" failures="1">
+  <testsuite name="A" tests="3">
+    <testcase name="a" status="run" time="0.5" classname="A" />
+    <testcase name="b" status="run" time="0.012" classname="A">
+      <failure message="c:/src/foo.cpp:3&#x0A;Expected: 1" type="" />
+    </testcase>
+    <testcase name="DISABLED_c" status="notrun" time="0" classname="A" />
+  </testsuite>
+</testsuites>
+"""
+
+
+class TestGtest(TestCase):
+    def test_parse_test_list(self):
+        self.assertEqual(["FooTest.Bar", "FooTest.Baz",
+                          "ParamTest/Values.Check/0"],
+                         gtest.parse_test_list(TEST_LIST))
+
+    def test_split_filter(self):
+        self.assertEqual(("Foo*", ["--gtest_repeat=2"]),
+                         gtest.split_filter("--gtest_filter=Foo* "
+                                            "--gtest_repeat=2"))
+        self.assertEqual(("*", []), gtest.split_filter(""))
+        self.assertEqual(("*", []),
+                         gtest.split_filter("--gtest_output=xml:a.xml"))
+
+    def test_with_filter(self):
+        self.assertEqual("--gtest_repeat=2 --gtest_filter=A.a:A.b",
+                         gtest.with_filter("--gtest_filter=* "
+                                           "--gtest_repeat=2",
+                                           ["A.a", "A.b"]))
+
+    def parse_report(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            filename = os.path.join(tmp, "report.xml")
+            with open(filename, "w") as f:
+                f.write(XML_REPORT)
+            return gtest.parse_xml_report(filename)
+
+    def test_parse_xml_report(self):
+        self.assertEqual({
+            "A.a": gtest.TestResult(gtest.PASSED, 0.5, ""),
+            "A.b": gtest.TestResult(gtest.FAILED, 0.012,
+                                    "c:/src/foo.cpp:3\nExpected: 1"),
+            "A.DISABLED_c": gtest.TestResult(gtest.SKIPPED, 0.0, ""),
+        }, self.parse_report())
+
+    def test_format_results_marks_failure_locations(self):
+        text = gtest.format_results(self.parse_report())
+        self.assertIn("[ RUN      ] A.b\nc:/src/foo.cpp:3: Failure\n"
+                      "Expected: 1\n[  FAILED  ] A.b (12 ms)\n", text)
+        self.assertIn("1 passed, 1 failed, 1 skipped (cached)", text)
+        self.assertNotIn("A.a", text)
+
+    def test_results_lookup_requires_same_binary_and_arguments(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            filename = os.path.join(tmp, "results.json")
+            results = gtest.TestResults(filename)
+            results.record("t.exe", "abc", "--gtest_filter=*",
+                           self.parse_report())
+            results.save()
+
+            results = gtest.TestResults(filename)
+            self.assertEqual(["A.b"], results.failed("t.exe"))
+            self.assertEqual(self.parse_report(),
+                             results.lookup("t.exe", "abc", "--gtest_filter=*"))
+            self.assertIsNone(results.lookup("t.exe", "def",
+                                             "--gtest_filter=*"))
+            self.assertIsNone(results.lookup("t.exe", "abc",
+                                             "--gtest_filter=A.b"))
+
+    @mock.patch("Moog.helpers.gtest.file_digest", return_value="abc")
+    def test_unchanged_tester_is_not_run_again(self, _):
+        results = gtest.TestResults()
+        results.record("t.exe", "abc", "", self.parse_report())
+        written = []
+        done = mock.MagicMock()
+        run = gtest.ShardedTestRun("t.exe", ".", "", 2,
+                                   gtest.TestDurations(), written.append,
+                                   done, results)
+        with mock.patch("Moog.helpers.gtest.subprocess") as subprocess:
+            run.run()
+        subprocess.Popen.assert_not_called()
+        done.assert_called_with(run)
+        self.assertTrue(run.cached)
+        self.assertIn("(cached)", "".join(written))
+
+    def test_partition_balances_durations(self):
+        durations = {"A.a": 4.0, "A.b": 3.0, "A.c": 2.0, "A.d": 1.0}
+        parts = gtest.partition(sorted(durations), durations, 2)
+        self.assertEqual([["A.a", "A.d"], ["A.b", "A.c"]], parts)
+
+    def test_partition_never_creates_empty_shards(self):
+        self.assertEqual([["A.a"]], gtest.partition(["A.a"], {}, 4))
+
+    def test_shard_output_keeps_test_blocks_together(self):
+        written = []
+        output = gtest.ShardOutput(written.append)
+        output.feed(b"[ RUN      ] A.a\r\nfoo.cpp(3): error: x\n")
+        self.assertEqual([], written)
+        output.feed(b"[  FAILED  ] A.a (12 ms)\n[ RUN      ] A.b\n"
+                    b"[       OK ] A.b (3 ms)\n")
+        self.assertEqual(["[ RUN      ] A.a\nfoo.cpp(3): error: x\n"
+                          "[  FAILED  ] A.a (12 ms)\n"
+                          "[ RUN      ] A.b\n[       OK ] A.b (3 ms)\n"],
+                         written)
+        self.assertEqual(["A.a"], output.failed)
+        self.assertEqual(1, output.passed)
+        self.assertEqual({"A.a": 0.012, "A.b": 0.003}, output.durations)
+
+    def test_shard_output_close_flushes_crashed_test(self):
+        written = []
+        output = gtest.ShardOutput(written.append)
+        output.feed(b"[ RUN      ] A.a\nboom")
+        output.close()
+        self.assertEqual("[ RUN      ] A.a\nboom\n", "".join(written))
+
+    def test_durations_round_trip(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            filename = os.path.join(tmp, "sub", "durations.json")
+            durations = gtest.TestDurations(filename)
+            durations.update("tester.exe", {"A.a": 1.5})
+            durations.save()
+            self.assertEqual({"A.a": 1.5},
+                             gtest.TestDurations(filename).get("tester.exe"))
+
+    def test_shard_commands_use_filters(self):
+        run = gtest.ShardedTestRun("tester.exe", ".", "--gtest_filter=A.*",
+                                   2, gtest.TestDurations(), None)
+        with mock.patch.object(run, "list_tests",
+                               return_value=["A.a", "A.b"]) as list_tests:
+            commands = run.shard_commands()
+        list_tests.assert_called_with("A.*")
+        self.assertEqual([(["tester.exe", "--gtest_filter=A.a"], None),
+                          (["tester.exe", "--gtest_filter=A.b"], None)],
+                         commands)
+
+    def test_shard_commands_write_a_report_per_shard(self):
+        run = gtest.ShardedTestRun("tester.exe", ".", "", 1,
+                                   gtest.TestDurations(), None)
+        (args, _), = run.shard_commands("reports")
+        self.assertEqual("--gtest_output=xml:" +
+                         os.path.join("reports", "shard_0.xml"), args[-1])
+
+    def test_shard_commands_fall_back_to_gtest_sharding(self):
+        run = gtest.ShardedTestRun("tester.exe", ".", "", 2,
+                                   gtest.TestDurations(), None)
+        with mock.patch.object(run, "list_tests", side_effect=OSError):
+            commands = run.shard_commands()
+        self.assertEqual(2, len(commands))
+        for index, (args, env) in enumerate(commands):
+            self.assertEqual(["tester.exe", "--gtest_filter=*"], args)
+            self.assertEqual("2", env["GTEST_TOTAL_SHARDS"])
+            self.assertEqual(str(index), env["GTEST_SHARD_INDEX"])
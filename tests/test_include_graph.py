@@ -0,0 +1,128 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase, mock
+import Moog.helpers.include_graph as include_graph
+
+
+class TestIncludeGraph(TestCase):
+    def setUp(self):
+        self.root = os.path.realpath(tempfile.mkdtemp())
+        self.cache_file = os.path.join(self.root, "cache", "graph.json")
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def create(self, name, text=""):
+        path = os.path.join(self.root, *name.split("/"))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(text)
+        return path
+
+    def test_scan_file(self):
+        path = self.create("FooTester.cpp",
+                           '#include "Foo.h"\n'
+                           '  # include <gtest/gtest.h>\n'
+                           '// #include "commented.h"\n'
+                           'TEST_F (FooTester, Bar) {}\n'
+                           'TEST_P(FooParam, Baz) {}\n')
+        self.assertEqual((["Foo.h", "gtest/gtest.h"],
+                          ["FooTester.Bar", "*/FooParam.Baz/*"]),
+                         include_graph.scan_file(path))
+
+    def create_tree(self):
+        return {
+            "header": self.create("Lib/include/Lib/Foo.h"),
+            "inner": self.create("Lib/src/Inner.h", '#include "Lib/Foo.h"\n'),
+            "source": self.create("Lib/src/Foo.cpp", '#include "Inner.h"\n'),
+            "tester": self.create("Lib/test/FooTester.cpp",
+                                  '#include <Lib/Foo.h>\n'
+                                  'TEST(Foo, Works) {}\n'),
+            "other": self.create("Lib/test/BarTester.cpp",
+                                 'TEST(Bar, Works) {}\n'),
+        }
+
+    def test_dependents(self):
+        files = self.create_tree()
+        graph = include_graph.IncludeGraph()
+        graph.update([self.root])
+        self.assertEqual(set([files["header"], files["inner"],
+                              files["source"], files["tester"]]),
+                         graph.dependents(files["header"]))
+        self.assertEqual(set([files["other"]]),
+                         graph.dependents(files["other"]))
+
+    def test_paths_are_compared_normcased(self):
+        # As on Windows, where the include and the file differ in case
+        files = self.create_tree()
+        files["local"] = self.create("Lib/src/Bar.cpp", '#include "inner.h"\n')
+        files["elsewhere"] = self.create("Lib/other/Inner.h")
+        graph = include_graph.IncludeGraph()
+        with mock.patch("os.path.normcase", side_effect=str.lower):
+            graph.update([self.root])
+            _, edges = graph.include_tree()
+            dependents = graph.dependents(files["inner"].upper())
+
+        self.assertEqual([files["inner"]], edges[files["local"]])
+        self.assertEqual(set([files["inner"], files["local"],
+                              files["source"]]), dependents)
+
+    def test_include_tree(self):
+        files = self.create_tree()
+        graph = include_graph.IncludeGraph()
+        graph.update([self.root])
+        sizes, edges = graph.include_tree()
+        self.assertEqual(len('#include "Inner.h"\n'), sizes[files["source"]])
+        self.assertEqual([files["inner"]], edges[files["source"]])
+        self.assertEqual([files["header"]], edges[files["tester"]])
+        self.assertEqual([], edges[files["header"]])
+
+    def test_graph_is_persisted(self):
+        files = self.create_tree()
+        graph = include_graph.IncludeGraph(self.cache_file)
+        graph.update([self.root])
+        graph.save()
+
+        loaded = include_graph.IncludeGraph(self.cache_file)
+        self.assertFalse(loaded.update([self.root]))
+        self.assertEqual(["Foo.Works"], loaded.tests(files["tester"]))
+
+    def test_changed_file_is_scanned_again(self):
+        files = self.create_tree()
+        graph = include_graph.IncludeGraph()
+        graph.update([self.root])
+
+        with open(files["other"], "a") as f:
+            f.write('#include "Lib/Foo.h"\n')
+        os.utime(files["other"], (1, 1))
+        self.assertTrue(graph.update([self.root]))
+        self.assertIn(files["other"], graph.dependents(files["header"]))
+
+    def test_affected_tests(self):
+        files = self.create_tree()
+        graph = include_graph.IncludeGraph()
+        graph.update([self.root])
+        owners = {
+            files["source"]: ["Lib.vcxproj", "LibTester.vcxproj"],
+            files["tester"]: ["LibTester.vcxproj"],
+            files["other"]: ["LibTester.vcxproj"],
+        }
+
+        def get_projects(path):
+            return owners.get(path, [])
+
+        def is_test_project(project_file):
+            return project_file.endswith("Tester.vcxproj")
+
+        # The source is compiled into the tester, all tests may use it
+        self.assertEqual({"LibTester.vcxproj": None},
+                         include_graph.affected_tests(
+                             graph, files["header"], get_projects,
+                             is_test_project))
+
+        del owners[files["source"]]
+        self.assertEqual({"LibTester.vcxproj": ["Foo.Works"]},
+                         include_graph.affected_tests(
+                             graph, files["header"], get_projects,
+                             is_test_project))
@@ -0,0 +1,107 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+import Moog.helpers.include_graph as include_graph
+import Moog.helpers.include_hotspots as include_hotspots
+
+
+class TestIncludeHotspots(TestCase):
+    def setUp(self):
+        # a.cpp and b.cpp share Big.h, which pulls in a cycle and <vector>
+        self.sizes = {
+            "a.cpp": 100,
+            "b.cpp": 200,
+            "c.cpp": 50,
+            "Big.h": 1000,
+            "Cycle1.h": 10,
+            "Cycle2.h": 20,
+            "Small.h": 1,
+        }
+        self.edges = {
+            "a.cpp": ["Big.h", "Small.h", "Small.h"],
+            "b.cpp": ["Big.h", "vector"],
+            "c.cpp": ["Small.h"],
+            "Big.h": ["Cycle1.h", "vector"],
+            "Cycle1.h": ["Cycle2.h"],
+            "Cycle2.h": ["Cycle1.h"],
+        }
+        self.report = include_hotspots.analyze(self.sizes, self.edges)
+        self.headers = dict((header.header, header)
+                            for header in self.report.headers)
+
+    def test_transitive_inclusion(self):
+        self.assertEqual(3, self.report.units)
+        self.assertEqual((100 + 1030 + 1) + (200 + 1030) + (50 + 1),
+                         self.report.preprocessed_size)
+        self.assertEqual(
+            include_hotspots.HeaderCost("Big.h", 1000, 1030, 2, 2, 2060,
+                                        False),
+            self.headers["Big.h"])
+        self.assertEqual(30, self.headers["Cycle2.h"].preprocessed_size)
+        self.assertEqual(2, self.headers["Cycle2.h"].units)
+        self.assertEqual((2, 2), (self.headers["Small.h"].includers,
+                                  self.headers["Small.h"].units))
+        self.assertTrue(self.headers["vector"].external)
+        self.assertEqual(2, self.headers["vector"].units)
+        self.assertNotIn("a.cpp", self.headers)
+
+    def test_rankings(self):
+        self.assertEqual(["Big.h", "Cycle1.h", "Cycle2.h", "Small.h"],
+                         [header.header for header in
+                          include_hotspots.pch_candidates(self.report)])
+        self.assertEqual(["Big.h"],
+                         [header.header for header in
+                          include_hotspots.pch_candidates(self.report, 1)])
+        self.assertEqual(["Big.h", "Cycle1.h", "Small.h", "Cycle2.h"],
+                         [header.header for header in
+                          include_hotspots.fan_in(self.report)])
+        self.assertEqual(["vector"],
+                         [header.header for header in
+                          include_hotspots.fan_in(self.report,
+                                                  external=True)])
+
+    def test_format_report(self):
+        text = include_hotspots.format_report(self.report)
+        self.assertTrue(text.startswith(
+            "Include hotspots: 3 translation unit(s), 4 header(s)"))
+        self.assertIn("Big.h\n", text)
+        self.assertIn("vector\n", text)
+
+
+class TestIncludeHotspotsOfScannedTree(TestCase):
+    def setUp(self):
+        self.root = os.path.realpath(tempfile.mkdtemp())
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def create(self, name, text):
+        path = os.path.join(self.root, *name.split("/"))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(text)
+        return path
+
+    def test_analyze_include_tree(self):
+        inner = self.create("Lib/Inner.h", "struct Inner {};\n")
+        outer = self.create("Lib/Outer.h", '#include "Inner.h"\n')
+        self.create("src/a.cpp", '#include "Lib/Outer.h"\n'
+                                 '#include <vector>\n')
+        self.create("src/b.cpp", '#include "Lib/Inner.h"\n')
+        graph = include_graph.IncludeGraph()
+        graph.update([self.root])
+
+        report = include_hotspots.analyze(*graph.include_tree())
+        headers = dict((header.header, header) for header in report.headers)
+        self.assertEqual(2, report.units)
+        self.assertEqual(set([inner, outer, "vector"]), set(headers))
+        self.assertEqual((17, 2, 2), (headers[inner].size,
+                                      headers[inner].includers,
+                                      headers[inner].units))
+        self.assertEqual(19 + 17, headers[outer].preprocessed_size)
+        self.assertEqual(1, headers[outer].units)
+        self.assertTrue(headers["vector"].external)
+        self.assertEqual(
+            (len('#include "Lib/Outer.h"\n#include <vector>\n') + 19 + 17) +
+            (len('#include "Lib/Inner.h"\n') + 17), report.preprocessed_size)
@@ -0,0 +1,48 @@
+import re
+import sys
+from unittest import TestCase, mock
+from Moog.helpers import lazy
+
+
+class TestLazyModule(TestCase):
+    def test_imports_on_first_attribute(self):
+        with mock.patch("Moog.helpers.lazy.importlib.import_module",
+                        return_value=re) as import_module:
+            module = lazy.import_module(".helpers.cpp_lexer", "Moog")
+            import_module.assert_not_called()
+            self.assertIs(re.compile, module.compile)
+            self.assertIs(re.escape, module.escape)
+        import_module.assert_called_once_with(".helpers.cpp_lexer", "Moog")
+
+    def test_relative_import(self):
+        module = lazy.import_module(".helpers.include_scanner", "Moog")
+        self.assertIs(sys.modules["Moog.helpers.include_scanner"].scan_includes,
+                      module.scan_includes)
+
+    def test_attributes_are_not_cached(self):
+        module = lazy.import_module("re")
+        with mock.patch("re.escape", return_value="patched"):
+            self.assertEqual("patched", module.escape("x"))
+        self.assertEqual("x", module.escape("x"))
+
+
+class TestLazyPattern(TestCase):
+    def test_compiles_on_first_use(self):
+        with mock.patch("Moog.helpers.lazy.re.compile",
+                        wraps=re.compile) as compile:
+            pattern = lazy.compile(r"(\d+)-(\d+)", re.I)
+            compile.assert_not_called()
+            self.assertEqual(("1", "2"), pattern.match("1-2").groups())
+            self.assertEqual(["3"], [m.group(2)
+                                     for m in pattern.finditer("a2-3")])
+        compile.assert_called_once_with(r"(\d+)-(\d+)", re.I)
+
+    def test_pattern_and_flags(self):
+        pattern = lazy.compile("foo", re.M)
+        self.assertEqual("foo", pattern.pattern)
+        self.assertEqual(re.M, pattern.flags)
+
+    def test_special_methods_are_not_forwarded(self):
+        pattern = lazy.compile("foo")
+        self.assertFalse(hasattr(pattern, "__deepcopy__"))
+        self.assertIsNone(pattern._compiled)
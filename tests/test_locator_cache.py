@@ -0,0 +1,72 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+from Moog.helpers.locator_cache import LocatorCache
+
+
+class TestLocatorCache(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.src_dir = os.path.join(self.root, "Foo", "src")
+        self.project_dir = os.path.join(self.root, "Foo", "bld", "VS2015")
+        os.makedirs(self.src_dir)
+        os.makedirs(self.project_dir)
+        self.touch(os.path.join(self.project_dir, "Foo.vcxproj"))
+        self.source = os.path.join(self.src_dir, "bar.cpp")
+        self.cache_file = os.path.join(self.root, "cache", "locator.json")
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    @staticmethod
+    def touch(filename):
+        open(filename, "w").close()
+
+    def bump_mtime(self, directory):
+        stat = os.stat(directory)
+        os.utime(directory, (stat.st_atime, stat.st_mtime + 10))
+
+    def test_second_lookup_is_a_hit(self):
+        cache = LocatorCache()
+        project = cache.get_vc_project(self.source)
+        self.assertTrue(project.endswith("Foo.vcxproj"))
+        self.assertEqual(project, cache.get_vc_project(self.source))
+        self.assertEqual(1, cache.stats()["hits"])
+        self.assertEqual(1, cache.stats()["misses"])
+
+    def test_changed_bld_dir_invalidates_entry(self):
+        cache = LocatorCache()
+        self.assertIsNone(cache.get_vc_test_project(self.source))
+
+        self.touch(os.path.join(self.project_dir, "FooTester.vcxproj"))
+        self.bump_mtime(self.project_dir)
+
+        project = cache.get_vc_test_project(self.source)
+        self.assertTrue(project.endswith("FooTester.vcxproj"))
+        self.assertEqual(0, cache.stats()["hits"])
+
+    def test_missing_bld_dir_is_not_cached(self):
+        cache = LocatorCache()
+        source = os.path.join(self.root, "Baz", "src", "baz.cpp")
+        cache.get_vc_project(source)
+        cache.get_vc_project(source)
+        self.assertEqual(0, cache.stats()["entries"])
+        self.assertEqual(2, cache.stats()["misses"])
+
+    def test_entries_survive_reload(self):
+        cache = LocatorCache(self.cache_file)
+        project = cache.get_vc_project(self.source)
+        cache.save()
+
+        reloaded = LocatorCache(self.cache_file)
+        self.assertEqual(project, reloaded.get_vc_project(self.source))
+        self.assertEqual(1, reloaded.stats()["hits"])
+
+    def test_corrupt_cache_file_is_ignored(self):
+        os.makedirs(os.path.dirname(self.cache_file))
+        with open(self.cache_file, "w") as f:
+            f.write("{not json")
+
+        cache = LocatorCache(self.cache_file)
+        self.assertEqual(0, cache.stats()["entries"])
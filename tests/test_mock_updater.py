@@ -0,0 +1,71 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+from Moog.helpers import mock_updater
+
+OLD_HEADER = """\
+class MockFoo : public Foo {
+public:
+    MOCK_CONST_METHOD0(GetFrequency, float());
+    MOCK_METHOD2(SetValue,
+                 void(int index, double value));
+    MOCK_METHOD (int, Get, (), (override));
+};
+"""
+
+NEW_HEADER = """\
+class MockFoo : public Foo {
+public:
+    MOCK_METHOD (float, GetFrequency, (), (const, override));
+    MOCK_METHOD (void, SetValue, (int index, double value), (override));
+    MOCK_METHOD (int, Get, (), (override));
+};
+"""
+
+
+class TestMockUpdater(TestCase):
+    def test_update_text(self):
+        self.assertEqual(NEW_HEADER, mock_updater.update_text(OLD_HEADER))
+
+    def test_nested_templates_and_comments(self):
+        source = "MOCK_METHOD2(Find, std::map<int, std::pair<int, int>>(" \
+                 "const std::function<void(int, int)>& f, // callback\n" \
+                 "int n));"
+        expected = "MOCK_METHOD ((std::map<int, std::pair<int, int>>), " \
+                   "Find, (const std::function<void(int, int)>& f, int n), " \
+                   "(override));"
+        self.assertEqual(expected, mock_updater.update_text(source))
+
+    def test_mocks_in_comments_are_left_alone(self):
+        source = "// MOCK_METHOD0(Foo, void());\n" \
+                 "const char* s = \"MOCK_METHOD0(Foo, void());\";"
+        self.assertEqual([], mock_updater.compute_replacements(source))
+
+    def test_new_style_mocks_are_left_alone(self):
+        self.assertEqual([], mock_updater.compute_replacements(NEW_HEADER))
+
+    def test_convert_tree(self):
+        root = tempfile.mkdtemp()
+        try:
+            header = os.path.join(root, "include", "MockFoo.h")
+            os.makedirs(os.path.dirname(header))
+            with open(header, "w") as f:
+                f.write(OLD_HEADER)
+            with open(os.path.join(root, "Other.h"), "w") as f:
+                f.write(NEW_HEADER)
+
+            results = list(mock_updater.convert_tree([root], dry_run=True,
+                                                     jobs=1))
+            self.assertEqual(1, len(results))
+            filename, count, diff = results[0]
+            self.assertEqual((header, 2), (filename, count))
+            self.assertIn("+    MOCK_METHOD (float, GetFrequency", diff)
+            with open(header) as f:
+                self.assertEqual(OLD_HEADER, f.read())
+
+            list(mock_updater.convert_tree([root], jobs=1))
+            with open(header) as f:
+                self.assertEqual(NEW_HEADER, f.read())
+        finally:
+            shutil.rmtree(root)
@@ -0,0 +1,76 @@
+import os
+import subprocess
+import tempfile
+from unittest import TestCase
+import Moog.helpers.modified_files as modified_files
+
+
+def touch(filename, mtime=None):
+    with open(filename, "w") as f:
+        f.write("int x;\n")
+    if mtime is not None:
+        os.utime(filename, (mtime, mtime))
+
+
+class TestModifiedFiles(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = os.path.realpath(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_parse_git_status(self):
+        output = " M a.cpp\0R  new.cpp\0old.cpp\0D  gone.cpp\0?? b.c\0"
+        self.assertEqual(["a.cpp", "new.cpp", "b.c"],
+                         modified_files.parse_git_status(output))
+
+    def test_git_status_files_outside_git(self):
+        self.assertIsNone(modified_files.git_status_files(self.root))
+
+    def test_modified_sources_from_git(self):
+        subprocess.check_call(["git", "init", "-q", self.root])
+        touch(os.path.join(self.root, "a.cpp"))
+        touch(os.path.join(self.root, "b.h"))
+
+        stamps = modified_files.CompileStamps()
+        self.assertEqual([os.path.join(self.root, "a.cpp")],
+                         modified_files.modified_sources([self.root], stamps))
+
+        stamps.mark(stamps.snapshot([os.path.join(self.root, "a.cpp")]))
+        self.assertEqual([],
+                         modified_files.modified_sources([self.root], stamps))
+
+    def test_modified_sources_by_mtime_outside_git(self):
+        old = os.path.join(self.root, "old.cpp")
+        new = os.path.join(self.root, "new.cpp")
+        touch(old, 1000)
+        touch(new)
+
+        stamps = modified_files.CompileStamps()
+        stamps.since = 2000
+        self.assertEqual([new],
+                         modified_files.modified_sources([self.root], stamps))
+
+    def test_stamps_round_trip(self):
+        filename = os.path.join(self.root, "cache", "stamps.json")
+        source = os.path.join(self.root, "a.cpp")
+        touch(source)
+
+        stamps = modified_files.CompileStamps(filename)
+        self.assertTrue(stamps.is_modified(source))
+        stamps.mark(stamps.snapshot([source]))
+        stamps.save()
+
+        loaded = modified_files.CompileStamps(filename)
+        self.assertFalse(loaded.is_modified(source))
+        self.assertEqual(stamps.since, loaded.since)
+
+    def test_group_by_project(self):
+        projects = {"a.cpp": "A.vcxproj", "b.cpp": "A.vcxproj",
+                    "c.cpp": "C.vcxproj"}
+        self.assertEqual({"A.vcxproj": ["a.cpp", "b.cpp"],
+                          "C.vcxproj": ["c.cpp"]},
+                         modified_files.group_by_project(
+                             ["a.cpp", "b.cpp", "c.cpp", "d.cpp"],
+                             projects.get))
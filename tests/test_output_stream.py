@@ -0,0 +1,60 @@
+import threading
+from unittest import TestCase
+from Moog.helpers.output_stream import OutputStream
+
+
+class TestOutputStream(TestCase):
+    def setUp(self):
+        self.written = []
+        self.scheduled = []
+        self.stream = OutputStream(self.written.append, self.schedule)
+
+    def schedule(self, callback, delay):
+        self.scheduled.append(callback)
+
+    def run_scheduled(self):
+        scheduled, self.scheduled = self.scheduled, []
+        for callback in scheduled:
+            callback()
+
+    def test_writes_are_coalesced(self):
+        self.stream.feed(b"foo.cpp(1): warning\r\n")
+        self.stream.feed(b"bar.cpp(2): error\r\n")
+        self.assertEqual(1, len(self.scheduled))
+
+        self.run_scheduled()
+        self.assertEqual(["foo.cpp(1): warning\nbar.cpp(2): error\n"],
+                         self.written)
+
+    def test_split_multibyte_character(self):
+        data = "café".encode("utf-8")
+        self.stream.feed(data[:-1])
+        self.stream.feed(data[-1:])
+        self.stream.close("\n[Finished]")
+        self.run_scheduled()
+        self.assertEqual(["café\n[Finished]"], self.written)
+
+    def test_invalid_bytes_do_not_abort_the_stream(self):
+        self.stream.feed(b"\xff\xfe ok")
+        self.stream.close()
+        self.run_scheduled()
+        self.assertEqual(["�� ok"], self.written)
+
+    def test_nothing_is_scheduled_without_output(self):
+        self.stream.feed(b"")
+        self.stream.close()
+        self.assertEqual([], self.scheduled)
+
+    def test_observer_runs_on_the_feeding_thread(self):
+        observed = []
+        stream = OutputStream(self.written.append, self.schedule,
+                              observe=lambda text: observed.append(
+                                  (text, threading.current_thread())))
+        feeder = threading.Thread(target=stream.feed, args=(b"a\r\nb",))
+        feeder.start()
+        feeder.join()
+        self.assertEqual([("a\nb", feeder)], observed)
+        self.assertEqual([], self.written)
+
+        self.run_scheduled()
+        self.assertEqual(["a\nb"], self.written)
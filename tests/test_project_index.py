@@ -0,0 +1,98 @@
+import os
+import shutil
+import tempfile
+import time
+from unittest import TestCase
+from Moog.helpers.project_index import ProjectIndex, parse_project_sources
+
+PROJECT_TEMPLATE = """\
+<?xml version="1.0" encoding="utf-8"?>
+<Project DefaultTargets="Build" ToolsVersion="15.0" xmlns="http://schemas.microsoft.com/developer/msbuild/2003">
+  <ItemGroup>
+{items}
+  </ItemGroup>
+</Project>
+"""
+
+
+class TestProjectIndex(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.bld_dir = os.path.join(self.root, "Foo", "bld", "VS2017")
+        os.makedirs(self.bld_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def write_project(self, name, items):
+        project_file = os.path.join(self.bld_dir, name)
+        lines = ['    <{} Include="{}" />'.format(kind, path)
+                 for kind, path in items]
+        with open(project_file, "w") as f:
+            f.write(PROJECT_TEMPLATE.format(items="\n".join(lines)))
+        return project_file
+
+    def source(self, name):
+        return os.path.join(self.root, "Foo", "src", name)
+
+    def test_parse_project_sources(self):
+        project_file = self.write_project("Foo.vcxproj", [
+            ("ClCompile", r"..\..\src\Foo.cpp"),
+            ("ClInclude", r"..\..\src\Foo.h"),
+            ("ClCompile", r"$(SolutionDir)\Generated.cpp"),
+            ("None", r"..\..\README.md"),
+        ])
+        sources = parse_project_sources(project_file)
+        expected = [os.path.normcase(self.source("Foo.cpp")),
+                    os.path.normcase(self.source("Foo.h"))]
+        self.assertEqual(expected, sources)
+
+    def test_lookup_by_owner(self):
+        self.write_project("Foo.vcxproj", [
+            ("ClCompile", r"..\..\src\Foo.cpp"),
+            ("ClInclude", r"..\..\src\Foo.h"),
+        ])
+        self.write_project("FooTester.vcxproj", [
+            ("ClCompile", r"..\..\src\FooTester.cpp"),
+            ("ClInclude", r"..\..\src\Foo.h"),
+        ])
+
+        index = ProjectIndex()
+        index.update([self.root])
+
+        self.assertTrue(index.get_vc_project(self.source("Foo.h"))
+                        .endswith("Foo.vcxproj"))
+        self.assertTrue(index.get_vc_test_project(self.source("Foo.h"))
+                        .endswith("FooTester.vcxproj"))
+        self.assertTrue(index.get_vc_project(self.source("FooTester.cpp"))
+                        .endswith("FooTester.vcxproj"))
+        self.assertIsNone(index.get_vc_project(self.source("Bar.cpp")))
+
+    def test_update_only_reparses_changed_projects(self):
+        project_file = self.write_project("Foo.vcxproj", [
+            ("ClCompile", r"..\..\src\Foo.cpp"),
+        ])
+        index = ProjectIndex()
+        index.update([self.root])
+        self.assertFalse(index.update([self.root]))
+
+        self.write_project("Foo.vcxproj", [
+            ("ClCompile", r"..\..\src\Bar.cpp"),
+        ])
+        mtime = time.time() + 10
+        os.utime(project_file, (mtime, mtime))
+
+        self.assertTrue(index.update([self.root]))
+        self.assertIsNone(index.get_vc_project(self.source("Foo.cpp")))
+        self.assertIsNotNone(index.get_vc_project(self.source("Bar.cpp")))
+
+    def test_removed_project_is_dropped(self):
+        project_file = self.write_project("Foo.vcxproj", [
+            ("ClCompile", r"..\..\src\Foo.cpp"),
+        ])
+        index = ProjectIndex()
+        index.update([self.root])
+
+        os.remove(project_file)
+        self.assertTrue(index.update([self.root]))
+        self.assertEqual([], index.get_projects(self.source("Foo.cpp")))
@@ -0,0 +1,93 @@
+import os
+import shutil
+import tempfile
+import time
+from unittest import TestCase, mock
+from Moog.helpers.result_cache import ResultCache
+
+
+class TestResultCache(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.root, "cache")
+        self.source = self.write("src/Foo.cpp", '#include "Foo.h"\n')
+        self.header = self.write("src/Foo.h", "class Foo {};\n")
+        self.args = ["clang-tidy.exe", "-checks=-*", "src/Foo.cpp", "--",
+                     "-std=c++17"]
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def write(self, name, text):
+        filename = os.path.join(self.root, name)
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        with open(filename, "w") as f:
+            f.write(text)
+        stat = os.stat(filename)
+        os.utime(filename, (stat.st_atime, time.time() + len(text)))
+        return filename
+
+    def test_digest_memo_holds_one_entry_per_existing_file(self):
+        cache = ResultCache(self.cache_dir)
+        first = cache.file_digest(self.source)
+        self.write("src/Foo.cpp", "int changed;\n")
+        self.assertNotEqual(first, cache.file_digest(self.source))
+        cache.file_digest(self.header)
+        self.assertEqual(2, len(cache._files))
+
+        os.remove(self.header)
+        with self.assertRaises(OSError):
+            cache.file_digest(self.header)
+        self.assertEqual([self.source], list(cache._files))
+
+    def test_key_depends_on_included_files(self):
+        cache = ResultCache(self.cache_dir)
+        key = cache.key(self.source, self.args, self.root)
+        self.assertEqual(key, cache.key(self.source, self.args, self.root))
+
+        self.write("src/Foo.h", "class Foo { int bar; };\n")
+        self.assertNotEqual(key, cache.key(self.source, self.args, self.root))
+
+    def test_unchanged_files_are_not_read_again(self):
+        cache = ResultCache(self.cache_dir)
+        key, stamps = cache.fingerprint(self.source, self.args, self.root)
+        self.assertEqual([self.source, self.header],
+                         [path for path, _ in stamps])
+        with mock.patch("Moog.helpers.result_cache.open", create=True,
+                        side_effect=AssertionError("read again")):
+            self.assertEqual(key, cache.key(self.source, self.args,
+                                            self.root))
+
+    def test_fingerprint_tells_whether_files_changed(self):
+        cache = ResultCache(self.cache_dir)
+        _, stamps = cache.fingerprint(self.source, self.args, self.root)
+        self.assertTrue(cache.unchanged(stamps))
+        self.write("src/Foo.h", "class Foo { int fixed; };\n")
+        self.assertFalse(cache.unchanged(stamps))
+
+    def test_key_depends_on_arguments(self):
+        cache = ResultCache(self.cache_dir)
+        other_args = self.args[:1] + ["-checks=*"] + self.args[2:]
+        self.assertNotEqual(cache.key(self.source, self.args, self.root),
+                            cache.key(self.source, other_args, self.root))
+
+    def test_hit_and_miss(self):
+        cache = ResultCache(self.cache_dir)
+        self.assertIsNone(cache.get("abc"))
+        cache.put("abc", {"returncode": 0, "output": "ok"})
+        self.assertEqual("ok", cache.get("abc")["output"])
+        self.assertEqual(0.5, cache.hit_rate())
+
+    def test_entries_survive_reload(self):
+        ResultCache(self.cache_dir).put("abc", {"output": "ok"})
+        self.assertEqual("ok", ResultCache(self.cache_dir).get("abc")["output"])
+
+    def test_least_recently_used_entries_are_evicted(self):
+        cache = ResultCache(self.cache_dir, max_bytes=100)
+        cache.put("old", {"output": "x" * 40})
+        os.utime(os.path.join(self.cache_dir, "old"), (0, 0))
+        cache.put("new", {"output": "y" * 40})
+        cache.put("newest", {"output": "z" * 40})
+
+        self.assertFalse(os.path.exists(os.path.join(self.cache_dir, "old")))
+        self.assertIsNotNone(cache.get("newest"))
@@ -1,4 +1,6 @@
+import json
 import os
+import threading
 from unittest import TestCase
 import unittest.mock as mock
 from Moog.helpers import settings
@@ -27,3 +29,127 @@ class TestSettings(TestCase):
 
         self.assertEqual("yeah", settings.get("foo", "brrr"))
         assert not mock_load_settings.called
+
+
+class TestSettingsService(TestCase):
+    def setUp(self):
+        self.window = mock.MagicMock()
+        self.window.project_data.return_value = {"moog": {"build_jobs": 4}}
+        self.package = mock.MagicMock()
+        self.package.get.side_effect = lambda key, default: default
+        self.discover = mock.MagicMock(return_value={})
+        self.isfile = mock.MagicMock(return_value=False)
+        self.service = settings.SettingsService(self.discover, self.isfile)
+
+    def value(self, key):
+        with mock.patch("Moog.helpers.settings.sublime.load_settings",
+                        return_value=self.package):
+            return self.service.value(key, self.window)
+
+    def test_values_are_cached_until_invalidated(self):
+        self.assertEqual(4, self.value("build_jobs"))
+        self.assertEqual(4, self.value("build_jobs"))
+        self.assertEqual(0, self.value("test_shards"))
+        self.window.project_data.assert_called_once_with()
+
+        self.window.project_data.return_value = {"moog": {"build_jobs": 1}}
+        self.service.invalidate()
+        self.assertEqual(1, self.value("build_jobs"))
+
+    def test_package_settings_change_invalidates(self):
+        self.value("test_shards")
+        self.package.add_on_change.assert_called_once_with(
+            "moog", self.service.invalidate)
+
+    def test_value_of_wrong_type_falls_back_to_default(self):
+        self.window.project_data.return_value = {
+            "moog": {"build_jobs": "many", "test_shards": True}}
+        self.assertEqual(2, self.value("build_jobs"))
+        self.assertEqual(0, self.value("test_shards"))
+
+    def test_value_without_project(self):
+        self.window.project_data.return_value = None
+        self.assertFalse(self.value("compile_on_save"))
+
+    def test_msbuild_is_discovered_once(self):
+        self.discover.return_value = {"VS2019": "discovered.exe"}
+        self.window.project_data.return_value = {
+            "moog": {"msbuild": {"VS2017": "configured.exe"}}}
+        with mock.patch("Moog.helpers.settings.sublime.load_settings",
+                        return_value=self.package):
+            paths = self.service.msbuild(self.window)
+            self.service.msbuild(self.window)
+
+        self.assertEqual("discovered.exe", paths["VS2019"])
+        self.assertEqual("configured.exe", paths["VS2017"])
+        self.assertNotIn("VS2015", paths)
+        self.discover.assert_called_once_with()
+
+    def test_msbuild_defaults_that_exist_rank_below_discovered(self):
+        self.isfile.side_effect = lambda path: path in (
+            settings.DEFAULT_MSBUILD["VS2015"],
+            settings.DEFAULT_MSBUILD["VS2017"])
+        self.discover.return_value = {"VS2017": "discovered.exe"}
+        self.window.project_data.return_value = None
+        with mock.patch("Moog.helpers.settings.sublime.load_settings",
+                        return_value=self.package):
+            paths = self.service.msbuild(self.window)
+
+        self.assertEqual({"VS2015": settings.DEFAULT_MSBUILD["VS2015"],
+                          "VS2017": "discovered.exe"}, paths)
+
+    def test_msbuild_concurrent_discovery_runs_once(self):
+        started = threading.Event()
+        release = threading.Event()
+
+        def discover():
+            started.set()
+            release.wait(5)
+            return {"VS2019": "discovered.exe"}
+
+        self.discover.side_effect = discover
+        self.window.project_data.return_value = None
+        results = []
+        with mock.patch("Moog.helpers.settings.sublime.load_settings",
+                        return_value=self.package):
+            threads = [threading.Thread(
+                target=lambda: results.append(self.service.msbuild(self.window)))
+                for _ in range(2)]
+            threads[0].start()
+            started.wait(5)
+            threads[1].start()
+            release.set()
+            for thread in threads:
+                thread.join(5)
+
+        self.assertEqual([{"VS2019": "discovered.exe"}] * 2, results)
+        self.discover.assert_called_once_with()
+
+
+class TestDiscoverMsBuild(TestCase):
+    def test_vswhere_instances(self):
+        instances = [
+            {"installationPath": os.path.join("vs", "2019"),
+             "installationVersion": "16.11.3"},
+            {"installationPath": os.path.join("vs", "2017"),
+             "installationVersion": "15.9.1"},
+            {"installationPath": os.path.join("vs", "next"),
+             "installationVersion": "99.0"},
+        ]
+        msbuild_2019 = os.path.join("vs", "2019", "MSBuild", "Current", "Bin",
+                                    "MSBuild.exe")
+        msbuild_2017 = os.path.join("vs", "2017", "MSBuild", "15.0", "Bin",
+                                    "MSBuild.exe")
+        existing = (msbuild_2019, msbuild_2017)
+
+        def isfile(path):
+            return path.endswith("vswhere.exe") or path in existing
+
+        run = mock.MagicMock(return_value=json.dumps(instances).encode())
+        self.assertEqual({"VS2019": msbuild_2019, "VS2017": msbuild_2017},
+                         settings.discover_msbuild(run, isfile))
+
+    def test_without_vswhere(self):
+        run = mock.MagicMock()
+        self.assertEqual({}, settings.discover_msbuild(run, lambda _: False))
+        run.assert_not_called()
@@ -0,0 +1,80 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+import Moog.helpers.sibling_index as sibling_index
+
+
+class TestSiblingIndex(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.index = sibling_index.SiblingIndex()
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def create(self, *parts):
+        path = os.path.join(self.root, *parts)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        open(path, "w").close()
+        return path
+
+    def test_classify(self):
+        self.assertEqual(("Foo", sibling_index.HEADER),
+                         sibling_index.classify("a/Foo.hpp"))
+        self.assertEqual(("Foo", sibling_index.TESTER),
+                         sibling_index.classify("FooTester.cpp"))
+        self.assertEqual(("Tester", sibling_index.SOURCE),
+                         sibling_index.classify("Tester.cpp"))
+        self.assertIsNone(sibling_index.classify("Foo.vcxproj"))
+
+    def test_siblings(self):
+        header = self.create("Foo", "src", "Bar.h")
+        source = self.create("Foo", "src", "Bar.cpp")
+        tester = self.create("Foo", "test", "BarTester.cpp")
+        self.index.update([self.root])
+
+        self.assertEqual({sibling_index.HEADER: header,
+                          sibling_index.SOURCE: source,
+                          sibling_index.TESTER: tester},
+                         self.index.siblings(source))
+        self.assertEqual(source, self.index.next_sibling(header))
+        self.assertEqual(tester, self.index.next_sibling(source))
+        self.assertEqual(header, self.index.next_sibling(tester))
+
+    def test_nearest_sibling_wins(self):
+        self.create("A", "Bar.h")
+        near = self.create("B", "Bar.h")
+        source = self.create("B", "Bar.cpp")
+        self.index.update([self.root])
+        self.assertEqual(near, self.index.sibling(source,
+                                                  sibling_index.HEADER))
+
+    def test_update_picks_up_added_and_removed_files(self):
+        source = self.create("Foo", "Bar.cpp")
+        self.index.update([self.root])
+        self.assertIsNone(self.index.next_sibling(source))
+
+        header = self.create("Foo", "Bar.h")
+        # Make sure the directory mtime differs on coarse file systems
+        directory = os.path.dirname(header)
+        stat = os.stat(directory)
+        os.utime(directory, (stat.st_atime, stat.st_mtime + 10))
+        self.assertTrue(self.index.update([self.root]))
+        self.assertEqual(header, self.index.next_sibling(source))
+
+        shutil.rmtree(os.path.join(self.root, "Foo"))
+        self.assertTrue(self.index.update([self.root]))
+        self.assertEqual([], self.index.classes())
+
+    def test_unchanged_tree_is_not_listed_again(self):
+        self.create("Foo", "Bar.cpp")
+        self.index.update([self.root])
+        self.assertFalse(self.index.update([self.root]))
+
+    def test_classes(self):
+        header = self.create("Bar.h")
+        self.create(".git", "Baz.h")
+        self.index.update([self.root])
+        self.assertEqual([("Bar", {sibling_index.HEADER: [header]})],
+                         self.index.classes())
@@ -0,0 +1,113 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase, mock
+from Moog.helpers import cpp_lexer
+from Moog.helpers import standardizer
+
+
+class TestStandardizer(TestCase):
+    def test_standardize(self):
+        test_cases = [
+            ("std::string name;", "string name;"),
+            ("std::vector<int> values;", "std::vector<int> values;"),
+            ("std::map <int, int> lookup;", "map <int, int> lookup;"),
+            ("std::cout << std::endl << x;", "std::cout << endl << x;"),
+            ("int offset = reset();", "int offset = reset();"),
+            ("void Set(std::unique_ptr<Foo> foo) {",
+             "void Set(unique_ptr<Foo> foo) {"),
+            ("// a string without terminator", "// a string without terminator"),
+        ]
+
+        for expected, source in test_cases:
+            self.assertEqual(expected, standardizer.standardize(source))
+
+    def test_every_line_is_processed(self):
+        source = "int a;\nstring b;\r\n" * 5000
+        expected = "int a;\nstd::string b;\r\n" * 5000
+        self.assertEqual(expected, standardizer.standardize(source))
+
+    def test_all_identifiers_on_a_line(self):
+        self.assertEqual("std::string a; std::vector<int> b;",
+                         standardizer.standardize("string a; vector<int> b;"))
+
+    def test_comments_strings_and_qualified_names_are_skipped(self):
+        test_cases = [
+            "// string name;",
+            "/* string name;\n string other; */",
+            'Log("string name;");',
+            "foo::string name;",
+            "foo.string = 1;",
+            "#include <string>",
+            "std::map<int, vector> lookup;",
+        ]
+        for source in test_cases:
+            self.assertEqual(source, standardizer.standardize(source))
+
+    def test_uses_cached_lexer(self):
+        source = "/* x */ string name;"
+        lexer = cpp_lexer.CppLexer(source)
+        self.assertEqual([8], list(standardizer.find_insertions(source,
+                                                                lexer)))
+
+
+class TestStandardizeTree(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.foo = self.write("src/Foo.cpp", "string foo;\n")
+        self.bar = self.write("src/Bar.h", "std::string bar;\n")
+        self.manifest_file = os.path.join(self.root, "cache", "manifest.json")
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def write(self, name, text):
+        filename = os.path.join(self.root, name)
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        with open(filename, "w") as f:
+            f.write(text)
+        return filename
+
+    def read(self, filename):
+        with open(filename) as f:
+            return f.read()
+
+    def run_tree(self, dry_run=False):
+        manifest = standardizer.Manifest(self.manifest_file)
+        return standardizer.standardize_tree([self.root], manifest, dry_run,
+                                             jobs=1)
+
+    def test_dry_run_reports_diff_only(self):
+        result = self.run_tree(dry_run=True)
+        self.assertEqual([(self.foo, 1)], result.changed)
+        self.assertIn("+std::string foo;", result.diff)
+        self.assertEqual("string foo;\n", self.read(self.foo))
+
+        # Files that still need changes are not recorded as clean
+        self.assertEqual(1, self.run_tree(dry_run=True).scanned)
+
+    def test_changed_files_are_written_and_skipped_next_run(self):
+        result = self.run_tree()
+        self.assertEqual(2, result.scanned)
+        self.assertEqual("std::string foo;\n", self.read(self.foo))
+
+        result = self.run_tree()
+        self.assertEqual((0, 2), (result.scanned, result.skipped))
+
+        self.write("src/Bar.h", "string bar;\n")
+        os.utime(self.bar, (0, 0))
+        result = self.run_tree()
+        self.assertEqual([(self.bar, 1)], result.changed)
+
+    def test_manifest_is_saved_when_a_file_fails(self):
+        def fail_after_first(func, tasks, jobs, processes):
+            yield func(tasks[0])
+            raise OSError("read-only file")
+
+        with mock.patch.object(standardizer.batch, "map_unordered",
+                               fail_after_first):
+            with self.assertRaises(OSError):
+                self.run_tree()
+
+        result = self.run_tree()
+        self.assertEqual((1, 1), (result.scanned, result.skipped))
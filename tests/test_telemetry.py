@@ -0,0 +1,52 @@
+import os
+import pstats
+import shutil
+import tempfile
+from unittest import TestCase
+from Moog.helpers.telemetry import Telemetry, percentile
+
+
+class TestTelemetry(TestCase):
+    def setUp(self):
+        self.telemetry = Telemetry()
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(51, percentile(values, 50))
+        self.assertEqual(100, percentile(values, 100))
+        self.assertEqual(0.0, percentile([], 50))
+
+    def test_report_is_sorted_by_p90(self):
+        for seconds in (0.1, 0.2, 0.3):
+            self.telemetry.record("slow", seconds)
+        self.telemetry.record("fast", 0.01)
+
+        rows = self.telemetry.report()
+        self.assertEqual(["slow", "fast"], [row[0] for row in rows])
+        self.assertEqual(("slow", 3, 0.2), rows[0][:3])
+        self.assertEqual(0.3, rows[0][5])
+
+    def test_call_records_timing_and_returns(self):
+        self.assertEqual(3, self.telemetry.call("add", lambda a, b: a + b,
+                                                1, 2))
+        self.assertEqual(1, self.telemetry.report()[0][1])
+
+    def test_profile_next_calls(self):
+        profile_dir = tempfile.mkdtemp()
+        try:
+            self.telemetry.profile_next(2, profile_dir)
+
+            def outer():
+                return self.telemetry.call("inner", sum, [1, 2])
+
+            for _ in range(3):
+                self.telemetry.call("outer", outer)
+
+            self.assertFalse(self.telemetry.profiling)
+            self.assertEqual(2, len(self.telemetry.profiles))
+            for filename in self.telemetry.profiles:
+                self.assertTrue(os.path.basename(filename)
+                                .startswith("outer-"))
+                pstats.Stats(filename)
+        finally:
+            shutil.rmtree(profile_dir)
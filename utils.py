@@ -1,8 +1,15 @@
 import os
-import re
 import logging
+import threading
 import sublime
 import sublime_plugin
+from .helpers import cpp_lexer
+from .helpers import lazy
+from .helpers import settings
+from .helpers.telemetry import timed
+
+mock_updater = lazy.import_module(".helpers.mock_updater", __package__)
+standardizer = lazy.import_module(".helpers.standardizer", __package__)
 
 
 HEADER_TEMPLATE = """\
@@ -47,6 +54,35 @@ TEST_F ({namespace_name}{class_name}Tester, Test) {{
 }}
 """
 
+lexer_cache = cpp_lexer.LexerCache()
+
+
+@timed("get_lexer")
+def get_lexer(view):
+    # Shared by the rewriting commands, the buffer is only tokenized again
+    # after it changed
+    return lexer_cache.get(
+        view.id(), view.change_count(),
+        lambda: view.substr(sublime.Region(0, view.size())))
+
+
+class LexerCacheListener(sublime_plugin.EventListener):
+    def on_close(self, view):
+        lexer_cache.discard(view.id())
+
+
+class MoogSettingsListener(sublime_plugin.EventListener):
+    # Project settings are cached, the package settings notify on change
+    def on_load_project(self, window):
+        settings.invalidate()
+
+    def on_post_save_project(self, window):
+        settings.invalidate()
+
+    def on_post_save(self, view):
+        if (view.file_name() or "").endswith(".sublime-project"):
+            settings.invalidate()
+
 
 class NewFileBase(sublime_plugin.WindowCommand):
     def get_name(self, prompt, callback):
@@ -137,6 +173,7 @@ class NewFileBase(sublime_plugin.WindowCommand):
 
 
 class NewClassCommand(NewFileBase):
+    @timed("new_class")
     def run(self):
         prompt = "Class name (prepend namespace if any, e.g.: Foo::Bar)"
         self.get_name(prompt, self.create_and_open)
@@ -154,6 +191,7 @@ class NewClassCommand(NewFileBase):
 
 
 class NewTesterCommand(NewFileBase):
+    @timed("new_tester")
     def run(self):
         prompt = "Class name to test"
         prompt += "(prepend namespace if any, e.g.: Foo::Bar)"
@@ -174,6 +212,7 @@ class NewTesterCommand(NewFileBase):
 
 
 class NewHeaderCommand(NewFileBase):
+    @timed("new_header")
     def run(self):
         prompt = "Header file name"
         self.get_name(prompt, self.create_and_open)
@@ -192,94 +231,31 @@ class NewHeaderCommand(NewFileBase):
 
 
 class UpdateMockCommand(sublime_plugin.TextCommand):
+    @timed("update_mock")
     def run(self, edit):
-        region = self.replace_next_mock(edit, sublime.Region(0, 1))
-        prev_end = -1
-        while region is not None and prev_end < region.a:
-            prev_end = region.b
-            region = self.replace_next_mock(edit, region)
-
-    def replace_next_mock(self, edit, region):
-        start_mock = self.view.find(r"MOCK_(CONST_)?METHOD\d*", region.a)
-        if start_mock is not None:
-            end_mock = self.view.find(";", start_mock.b)
-            if end_mock is not None:
-                self.update_mock_method_in_view(edit, sublime.Region(start_mock.a, end_mock.b))
-                return sublime.Region(end_mock.b, end_mock.b + 1)
-
-        return None
+        lexer = get_lexer(self.view)
+        replacements = mock_updater.compute_replacements(lexer.text, lexer)
+
+        # Replace back to front, so earlier offsets remain valid. All
+        # replacements share a single edit and thus a single undo step.
+        for begin, end, replacement in reversed(replacements):
+            self.view.replace(edit, sublime.Region(begin, end), replacement)
 
     @staticmethod
     def cleanup_declaration(mock_declaration):
-        mock_declaration = mock_declaration.replace("\n", "")
-        mock_declaration = mock_declaration.replace("\r", "")
-        mock_declaration = re.sub(r"\s+", " ", mock_declaration)
-
-        return mock_declaration
+        return mock_updater.cleanup_declaration(mock_declaration)
 
     @staticmethod
     def parenthesize_arguments(arguments):
-        args = arguments.split(",")
-        parenthesized = []
-        this_arg = ""
-
-        def append_this_arg(arg):
-            parenthesized.append(arg.strip())
-            return ""
-
-        lt_count = 0  # '<' count (nested templates)
-        for a in args:
-            if lt_count == 0 and "<" in a and ">" not in a:
-                this_arg += "(" + a.strip()
-                lt_count += 1
-            else:
-                if this_arg:
-                    this_arg += ", "
-
-                this_arg += a.strip()
-                if lt_count != 0 and ">" in a:
-                    lt_count -= 1
-                    if lt_count == 0:
-                        this_arg += ")"
-                        this_arg = append_this_arg(this_arg)
-                else:
-                    this_arg = append_this_arg(this_arg)
-
-        if this_arg:
-            append_this_arg(this_arg)
-
-        return ", ".join(parenthesized)
-
-    def update_mock_method_in_view(self, edit, region):
-        mock_declaration = self.view.substr(region)
-        new_mock_declaration = self.update_mock_method(mock_declaration)
-        if new_mock_declaration is not None:
-            self.view.replace(edit, region, new_mock_declaration)
+        return mock_updater.parenthesize_arguments(arguments)
 
     @staticmethod
     def update_mock_method(mock_declaration):
-        mock_declaration = UpdateMockCommand.cleanup_declaration(mock_declaration)
-
-        pattern = r".+\("
-        pattern += r"([A-Za-z0-9_]+)\s*"  # function name
-        pattern += r"\s*,\s*"
-        pattern += r"([A-Za-z0-9_:&\*\s<>]+)\("  # function return type
-        pattern += r"(.*)\s*\)\s*\);"  # function arguments
-
-        m = re.match(pattern, mock_declaration)
-        if m is not None:
-            name = m.group(1)
-            ret = m.group(2)
-            args = UpdateMockCommand.parenthesize_arguments(m.group(3))
-            qualifiers = "const, override" if "_CONST_" in mock_declaration else "override"
-            replacement_mock = "MOCK_METHOD ({}, {}, ({}), ({}));".format(
-                ret.strip(), name.strip(), args.strip(), qualifiers.strip())
-            return replacement_mock
-
-        return None
+        return mock_updater.update_mock_method(mock_declaration)
 
 
 class InsertShellTraceCommand(sublime_plugin.TextCommand):
+    @timed("insert_shell_trace")
     def run(self, edit):
         sel = self.view.sel()
         line_number, _ = self.view.rowcol(sel[0].begin())
@@ -290,52 +266,62 @@ class InsertShellTraceCommand(sublime_plugin.TextCommand):
         self.view.replace(edit, line_region, trace_msg)
 
 class StandardizeCommand(sublime_plugin.TextCommand):
-    def __init__(self, view):
-        super(StandardizeCommand, self).__init__(view)
-        classes = "|".join([
-            "string",
-            "string_view",
-            r"vector\s*<",
-            r"map\s*<",
-            r"list\s*<",
-            r"set\s*<",
-            r"pair\s*<",
-            "endl",
-            "fstream",
-            "ifstream",
-            "ofstream",
-            "unique_ptr",
-            "shared_ptr",
-        ])
-
-        self._std_re = re.compile(
-            r"(?<!std::)\b(" + classes + r")\b(.+[;{])"
-        )
-
+    @timed("standardize")
     def run(self, edit):
-        region = self.process_next_line(edit, sublime.Region(0, 1))
-        count = 0
-        while region is not None and region.a < self.view.size():
-            region = self.process_next_line(edit, region)
-
-            count += 1
-            if count > 1000:
-                logging.error("whoops {}, {}".format(region.a, region.b))
-                break
-
-    def process_next_line(self, edit, region):
-        region = self.view.full_line(region)
-        org_line = self.view.substr(region)
-        line = self._std_re.sub(r"std::\1\2", org_line)
-        if line != org_line:
-            logging.info("< " + org_line.strip())
-            logging.info("> " + line.strip())
+        lexer = get_lexer(self.view)
+        insertions = list(standardizer.find_insertions(lexer.text, lexer))
+
+        # Insert back to front, so earlier offsets remain valid
+        for point in reversed(insertions):
+            self.view.insert(edit, point, "std::")
+
+        if insertions:
+            logging.info("Standardized {} identifier(s) in {}".format(
+                len(insertions), self.view.file_name()))
+
+
+class StandardizeProjectCommand(sublime_plugin.WindowCommand):
+    @timed("standardize_project")
+    def run(self, dry_run=False):
+        manifest_file = os.path.join(sublime.cache_path(), "Moog",
+                                     "standardize_manifest.json")
+        folders = self.window.folders()
+        sublime.status_message("Standardizing {}".format(", ".join(folders)))
+
+        def standardize():
+            try:
+                manifest = standardizer.Manifest(manifest_file)
+                result = standardizer.standardize_tree(folders, manifest,
+                                                       dry_run,
+                                                       processes=False)
+            except Exception:
+                # Nothing else would report what went wrong on this thread
+                logging.exception("Standardizing the project failed")
+                sublime.set_timeout(lambda: sublime.status_message(
+                    "Standardizing failed, see the console"), 0)
+                return
+            sublime.set_timeout(lambda: self.show_summary(result, dry_run), 0)
+
+        threading.Thread(target=standardize).start()
+
+    def show_summary(self, result, dry_run):
+        summary = "{} file(s) {}, {} scanned, {} unchanged since last run\n" \
+            .format(len(result.changed),
+                    "to change" if dry_run else "changed",
+                    result.scanned, result.skipped)
+        sublime.status_message(summary.strip())
+        if not result.changed:
+            return
 
-        self.view.replace(edit, region, line)
-        return sublime.Region(region.b + 1, region.b + 2)
+        view = self.window.new_file()
+        view.set_name("Standardize summary")
+        view.set_scratch(True)
+        view.assign_syntax("Packages/Diff/Diff.sublime-syntax")
+        view.run_command("append", {"characters": summary + "\n" + result.diff})
 
 
 class FooCommand(sublime_plugin.WindowCommand):
+    @timed("foo")
     def run(self):
         settings = sublime.load_settings("Moog.sublime-settings")
         logging.error(self.window.project_data())